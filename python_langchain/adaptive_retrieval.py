@@ -0,0 +1,178 @@
+"""
+점수 기반 가변 k 검색 + 관련 문서가 없을 때 조기 응답
+
+ragmenu2.create_rag_chain 은 항상 k=3 개를 검색해서 LLM 에 넘겼다.
+메뉴와 상관없는 질문에도 관련 없는 청크 3개로 LLM 을 호출한 뒤에야
+'해당 정보 추적 불가' 답변을 받았다.
+
+1. 후보를 max_k 개 가져와 유사도 분포를 보고 k 를 정함
+   - 최고 점수가 threshold 미만 → 관련 문서 없음 (0개)
+   - 최고 점수에서 margin 이상 떨어지거나, 바로 앞 문서와 gap 이상 벌어지면 거기서 자름
+2. 0개면 LLM 을 호출하지 않고 정해진 답변(no_answer)을 바로 반환
+3. threshold 는 calibrate_from_queries() 로 관련/무관 질문 예시에서 정할 수 있음
+4. 재정렬(reranker.RerankingRetriever)의 1단계로 쓸 때는 gate_search() 사용
+   - 최고 점수만 확인하고 후보 fetch_k 개를 그대로 넘김 (몇 개 쓸지는 재정렬이 정함)
+
+사용 예시:
+    retriever = AdaptiveRetriever(vector_score_search(vector_store), threshold=0.25)
+    docs = retriever.retrieve(query)   # [] 이면 생성 생략
+"""
+
+import asyncio
+
+from langchain_core.runnables import RunnableLambda
+
+
+def vector_score_search(vectorstore):
+    """벡터스토어를 (query, k) → [(doc, 코사인 유사도)] 검색 함수로 감싸기"""
+    return lambda query, k: vectorstore.similarity_search_with_score(query, k=k)
+
+
+def choose_k(scores, threshold, min_k=1, max_k=5, margin=0.1, gap=0.05):
+    """
+    유사도 분포로 사용할 문서 수 결정
+
+    Args:
+        scores (list): 내림차순 유사도 점수
+        threshold (float): 최고 점수가 이보다 낮으면 0 반환
+        min_k (int): 최고 점수가 threshold 이상일 때 최소 문서 수
+        max_k (int): 최대 문서 수
+        margin (float): 최고 점수와의 차이가 이보다 크면 제외
+        gap (float): 바로 앞 문서와의 점수 차이가 이보다 크면 거기서 자름
+
+    Returns:
+        int: 사용할 문서 수
+    """
+    if not scores or scores[0] < threshold:
+        return 0
+
+    k = 1
+    while k < min(len(scores), max_k):
+        score = scores[k]
+        if score < threshold or scores[0] - score > margin or scores[k - 1] - score > gap:
+            break
+        k += 1
+    return max(k, min(min_k, len(scores), max_k))
+
+
+def calibrate_threshold(on_topic_scores, off_topic_scores):
+    """
+    관련 질문 / 무관 질문의 최고 유사도 점수로 threshold 계산
+
+    두 집합을 가장 잘 나누는 값(균형 정확도 최대)을 고르고,
+    같은 정확도라면 두 점수 사이의 중간값을 사용한다.
+
+    Args:
+        on_topic_scores (list): 답할 수 있는 질문들의 최고 유사도
+        off_topic_scores (list): 답할 수 없는 질문들의 최고 유사도
+
+    Returns:
+        float: threshold
+    """
+    points = sorted(set(on_topic_scores) | set(off_topic_scores))
+    candidates = [(a + b) / 2 for a, b in zip(points, points[1:])] or points
+
+    def balanced_accuracy(t):
+        on = sum(s >= t for s in on_topic_scores) / max(len(on_topic_scores), 1)
+        off = sum(s < t for s in off_topic_scores) / max(len(off_topic_scores), 1)
+        return (on + off) / 2
+
+    return max(candidates, key=balanced_accuracy)
+
+
+def calibrate_from_queries(search, on_topic_queries, off_topic_queries):
+    """
+    예시 질문들을 실제로 검색해 최고 유사도를 모은 뒤 calibrate_threshold 로 threshold 계산
+
+    Args:
+        search: (query, k) → [(doc, score)] 검색 함수
+        on_topic_queries (list): 문서로 답할 수 있는 질문 예시
+        off_topic_queries (list): 문서와 상관없는 질문 예시
+
+    Returns:
+        float: threshold
+    """
+    def top_score(query):
+        return max((float(score) for _, score in search(query, 1)), default=0.0)
+
+    return calibrate_threshold([top_score(q) for q in on_topic_queries],
+                               [top_score(q) for q in off_topic_queries])
+
+
+class AdaptiveRetriever:
+    """
+    유사도 분포로 k 를 정하고, 관련 문서가 없으면 빈 리스트를 반환하는 검색기
+
+    Args:
+        search: (query, k) → [(doc, score)] 검색 함수 (score 는 높을수록 관련)
+        threshold (float): 최고 점수 하한
+        min_k, max_k, margin, gap: choose_k 참고
+    """
+
+    def __init__(self, search, threshold=0.25, min_k=1, max_k=5, margin=0.1, gap=0.05):
+        self.search = search
+        self.threshold = threshold
+        self.min_k = min_k
+        self.max_k = max_k
+        self.margin = margin
+        self.gap = gap
+        self.stats = {"queries": 0, "no_answer": 0, "docs": 0}
+
+    def search_with_scores(self, query, k=None):
+        """(query, k) 형태 검색 함수 (k 개 후보를 점수 분포로 다시 줄임)"""
+        candidates = self.search(query, k or self.max_k)
+        candidates = sorted(candidates, key=lambda pair: pair[1], reverse=True)
+        n = choose_k([float(s) for _, s in candidates], self.threshold,
+                     self.min_k, k or self.max_k, self.margin, self.gap)
+        self.stats["queries"] += 1
+        self.stats["docs"] += n
+        if n == 0:
+            self.stats["no_answer"] += 1
+        return candidates[:n]
+
+    def gate_search(self, query, k):
+        """
+        (query, k) 형태 검색 함수 - 재정렬 1단계용
+
+        최고 점수가 threshold 미만이면 빈 리스트, 아니면 후보 k 개를 자르지 않고 그대로 반환
+        """
+        candidates = sorted(self.search(query, k), key=lambda pair: pair[1], reverse=True)
+        self.stats["queries"] += 1
+        if not candidates or float(candidates[0][1]) < self.threshold:
+            self.stats["no_answer"] += 1
+            return []
+        self.stats["docs"] += len(candidates)
+        return candidates
+
+    def retrieve_with_scores(self, query):
+        return self.search_with_scores(query)
+
+    def retrieve(self, query):
+        return [doc for doc, _ in self.retrieve_with_scores(query)]
+
+    async def aretrieve(self, query):
+        """rag_streaming.astream_rag 용 retrieve 함수 → (docs, scores)"""
+        pairs = await asyncio.get_running_loop().run_in_executor(None, self.retrieve_with_scores, query)
+        return [doc for doc, _ in pairs], [float(score) for _, score in pairs]
+
+
+def create_gated_chain(retriever, generate_chain, build_inputs, no_answer):
+    """
+    검색 결과가 없으면 LLM 호출 없이 no_answer 를 반환하는 체인
+
+    Args:
+        retriever: retrieve(query) → docs 를 가진 검색기
+        generate_chain: 프롬프트 | LLM | 문자열 파서
+        build_inputs: (docs, query) → generate_chain 입력 딕셔너리
+        no_answer (str): 관련 문서가 없을 때의 고정 답변
+
+    Returns:
+        Runnable: invoke(query) → 답변 문자열
+    """
+    def run(query):
+        docs = retriever.retrieve(query)
+        if not docs:
+            return no_answer
+        return generate_chain.invoke(build_inputs(docs, query))
+
+    return RunnableLambda(run)
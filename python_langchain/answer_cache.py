@@ -0,0 +1,221 @@
+"""
+의미 기반 답변 캐시 (Semantic Answer Cache)
+
+"스테이크 가격" / "스테이크 얼마예요?" 처럼 표현만 다른 질문이 반복될 때
+검색 + gpt-4o-mini 생성 비용을 매번 내지 않도록 이전 답변을 재사용한다.
+
+동작 방식:
+1. 질문을 임베딩
+2. 캐시된 질문 벡터들과 코사인 유사도 계산 (행렬곱 한 번)
+3. 가장 가까운 항목이 임계값 이상이면 저장된 답변 + 출처 문서 반환
+4. 인덱스 버전(문서 내용 해시)이 바뀌면 캐시 전체 무효화
+5. 최대 개수를 넘으면 가장 오래 사용하지 않은 항목부터 삭제 (LRU)
+6. 파일 저장은 JSONL 로그에 새 항목 한 줄만 추가 (캐시 크기와 상관없이 저장 비용 일정)
+   - 첫 줄은 {"index_version": ...} 헤더, 이후 한 줄에 항목 하나
+   - 줄 수가 max_size 의 2배를 넘으면 현재 항목만으로 파일을 다시 씀 (가끔 한 번)
+
+사용 예시:
+    cache = SemanticAnswerCache(embeddings, index_version=corpus_version(splits))
+    hit = cache.lookup(query)
+    if hit is None:
+        answer = rag_chain.invoke(query)
+        cache.store(query, answer, source_docs)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+def corpus_version(documents):
+    """문서(청크) 내용과 출처로 인덱스 버전 해시 생성 - 데이터가 바뀌면 값이 바뀜"""
+    h = hashlib.sha256()
+    for doc in documents:
+        h.update(str(doc.metadata.get("source", "")).encode("utf-8"))
+        h.update(doc.page_content.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class SemanticAnswerCache:
+    """
+    질문 임베딩 유사도 기반 LRU 답변 캐시
+
+    Args:
+        embeddings: LangChain 임베딩 모델 (embed_query 사용)
+        threshold (float): 캐시 적중으로 볼 최소 코사인 유사도
+        max_size (int): 최대 저장 항목 수 (초과 시 LRU 삭제)
+        index_version (str): 현재 벡터 인덱스 버전 (다르면 기존 캐시 폐기)
+        path (str): 캐시를 저장할 JSONL 파일 (None 이면 메모리에만 유지)
+    """
+
+    def __init__(self, embeddings, threshold=0.9, max_size=256, index_version=None, path=None):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_size = max_size
+        self.index_version = index_version
+        self.path = path
+        self.entries = OrderedDict()  # 질문 → {vector, answer, sources, created}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._matrix = None  # 캐시된 질문 벡터 행렬 (변경 시 다시 만듦)
+        self._keys = []
+        self._log_lines = 0  # 파일에 적힌 항목 줄 수 (압축 시점 판단용)
+        self._load()
+
+    # ---------------- 저장/불러오기 ----------------
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except json.JSONDecodeError:
+            header = {}
+        if header.get("index_version") != self.index_version or "query" in header:
+            print("✓ 인덱스 버전 변경: 답변 캐시 초기화")
+            self._rewrite()
+            return
+        for line in lines[1:]:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 쓰다가 끊긴 마지막 줄 등은 무시
+            self.entries[item["query"]] = item
+            self.entries.move_to_end(item["query"])
+            self._log_lines += 1
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        print(f"✓ 답변 캐시 로드: {len(self.entries)}개")
+
+    def _append(self, entry):
+        """새 항목 한 줄만 파일 끝에 추가, 로그가 너무 길어지면 현재 항목으로 다시 씀"""
+        if not self.path:
+            return
+        if self._log_lines >= 2 * self.max_size:
+            self._rewrite()
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._log_lines += 1
+
+    def _rewrite(self):
+        """헤더 + 현재 항목만으로 파일 새로 쓰기 (버전 변경 / 초기화 / 로그 압축)"""
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"index_version": self.index_version}) + "\n")
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        self._log_lines = len(self.entries)
+
+    # ---------------- 버전 관리 ----------------
+    def set_index_version(self, version):
+        """인덱스 버전이 바뀌면 캐시를 비운다"""
+        with self._lock:
+            if version != self.index_version:
+                self.index_version = version
+                self.entries.clear()
+                self._matrix = None
+                self._rewrite()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._matrix = None
+            self._rewrite()
+
+    # ---------------- 조회/저장 ----------------
+    def _vectors(self):
+        """정규화된 질문 벡터 행렬과 키 순서"""
+        if self._matrix is None:
+            self._keys = list(self.entries)
+            if self._keys:
+                m = np.asarray([self.entries[k]["vector"] for k in self._keys], dtype=np.float32)
+                self._matrix = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+        return self._matrix, self._keys
+
+    def embed(self, query):
+        return self.embeddings.embed_query(query)
+
+    def lookup(self, query, vector=None):
+        """
+        비슷한 질문의 캐시된 답변 찾기
+
+        Args:
+            query (str): 질문
+            vector (list): 미리 계산한 질문 임베딩 (없으면 여기서 계산)
+
+        Returns:
+            dict: {'answer', 'sources', 'similarity', 'cached_query'} 또는 None
+        """
+        if vector is None:
+            vector = self.embed(query)
+
+        with self._lock:
+            matrix, keys = self._vectors()
+            if len(keys) == 0:
+                self.misses += 1
+                return None
+
+            q = np.asarray(vector, dtype=np.float32)
+            q = q / max(np.linalg.norm(q), 1e-12)
+            scores = matrix @ q
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            key = keys[best]
+            self.entries.move_to_end(key)  # 최근 사용으로 표시 (LRU)
+            self.hits += 1
+            entry = self.entries[key]
+
+        return {
+            "answer": entry["answer"],
+            "sources": [Document(page_content=s["page_content"], metadata=s["metadata"]) for s in entry["sources"]],
+            "similarity": similarity,
+            "cached_query": key,
+        }
+
+    def store(self, query, answer, sources=None, vector=None):
+        """질문-답변-출처 저장 (용량 초과 시 가장 오래 안 쓴 항목 삭제)"""
+        if vector is None:
+            vector = self.embed(query)
+
+        entry = {
+            "query": query,
+            "vector": [float(x) for x in vector],
+            "answer": answer,
+            "sources": [{"page_content": d.page_content, "metadata": d.metadata} for d in (sources or [])],
+            "created": time.time(),
+        }
+        with self._lock:
+            self.entries[query] = entry
+            self.entries.move_to_end(query)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)  # 파일에는 남지만 다음 압축/로드 때 정리됨
+            self._matrix = None
+            self._append(entry)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,181 @@
+"""
+RAG 체인 일괄 질의응답 CLI (결과는 JSONL)
+
+ragmenu2.main 은 example_queries + input() 반복, rag4_multimodal.main 은 예제 질문을 하나씩
+순서대로 실행한다. 이 스크립트는 파일에 적힌 질문들을 chain.batch / abatch 로 동시에 실행하고
+질문별 답변, 출처, 토큰 수, 단계별 지연시간을 JSONL 로 저장한다.
+
+입력 파일 형식:
+    - .txt   : 한 줄에 질문 하나 (빈 줄, # 주석 무시)
+    - .jsonl : {"question": "..."} 한 줄에 하나
+
+실행 예시:
+    python batch_qa.py questions.txt --out answers.jsonl --concurrency 8
+    python batch_qa.py questions.txt --chain multimodal --async
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from stats_utils import percentile
+
+
+# =================================================================
+# 체인 구성
+# =================================================================
+def load_chain_parts(name):
+    """
+    체인 종류별 벡터스토어/프롬프트/컨텍스트 포맷/LLM 준비
+
+    Returns:
+        tuple: (vectorstore, prompt, format_docs, llm, k)
+    """
+    if name == "menu":
+        import ragmenu2
+        from langchain_openai import ChatOpenAI
+        vectorstore = ragmenu2.create_or_load_vectorstore(document=None, force_recreate=False)
+        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+        return vectorstore, ChatPromptTemplate.from_template(ragmenu2.RAG_TEMPLATE), ragmenu2.format_docs, llm, 3
+
+    import rag4_multimodal
+    vectorstore = rag4_multimodal.create_or_load_vectorstore(documents=None, force_recreate=False)
+    return (
+        vectorstore,
+        ChatPromptTemplate.from_template(rag4_multimodal.MULTIMODAL_TEMPLATE),
+        rag4_multimodal.format_docs,
+        rag4_multimodal.create_multimodal_llm(),
+        5,
+    )
+
+
+def create_batch_chain(vectorstore, prompt, format_docs, llm, k):
+    """
+    질문 → 구조화된 결과를 돌려주는 체인 (sync/async 모두 지원)
+
+    StrOutputParser 를 쓰지 않고 AIMessage 를 직접 받아 usage_metadata 로 토큰 수를 기록한다.
+    """
+    def finish(question, docs_and_scores, message, t0, t1, t2):
+        usage = getattr(message, "usage_metadata", None) or {}
+        return {
+            "question": question,
+            "answer": message.content,
+            "sources": [
+                {"source": doc.metadata.get("source", "unknown"), "type": doc.metadata.get("type"), "score": float(score)}
+                for doc, score in docs_and_scores
+            ],
+            "tokens": {
+                "prompt": usage.get("input_tokens", 0),
+                "completion": usage.get("output_tokens", 0),
+                "total": usage.get("total_tokens", 0),
+            },
+            "latency": {"retrieval": t1 - t0, "generation": t2 - t1, "total": t2 - t0},
+        }
+
+    def inputs(question, docs_and_scores):
+        return {"context": format_docs([doc for doc, _ in docs_and_scores]), "question": question}
+
+    def run(question):
+        t0 = time.perf_counter()
+        docs_and_scores = vectorstore.similarity_search_with_score(question, k=k)
+        t1 = time.perf_counter()
+        message = (prompt | llm).invoke(inputs(question, docs_and_scores))
+        return finish(question, docs_and_scores, message, t0, t1, time.perf_counter())
+
+    async def arun(question):
+        t0 = time.perf_counter()
+        docs_and_scores = await vectorstore.asimilarity_search_with_score(question, k=k)
+        t1 = time.perf_counter()
+        message = await (prompt | llm).ainvoke(inputs(question, docs_and_scores))
+        return finish(question, docs_and_scores, message, t0, t1, time.perf_counter())
+
+    return RunnableLambda(run, afunc=arun)
+
+
+# =================================================================
+# 입출력
+# =================================================================
+def read_questions(path):
+    """질문 파일 읽기 (.txt 또는 .jsonl)"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            questions.append(json.loads(line)["question"] if path.endswith(".jsonl") else line)
+    return questions
+
+
+def summarize(records, wall_sec):
+    """전체 처리량/지연시간/토큰 요약"""
+    ok = [r for r in records if "error" not in r]
+    totals = [r["latency"]["total"] for r in ok]
+    tokens = sum(r["tokens"]["total"] for r in ok)
+    return {
+        "questions": len(records),
+        "succeeded": len(ok),
+        "failed": len(records) - len(ok),
+        "wall_sec": wall_sec,
+        "questions_per_sec": len(records) / wall_sec if wall_sec else 0.0,
+        "tokens_total": tokens,
+        "tokens_per_sec": tokens / wall_sec if wall_sec else 0.0,
+        "latency_p50": percentile(totals, 50),
+        "latency_p95": percentile(totals, 95),
+        "retrieval_p50": percentile([r["latency"]["retrieval"] for r in ok], 50),
+        "generation_p50": percentile([r["latency"]["generation"] for r in ok], 50),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 체인 일괄 질의응답 (JSONL 출력)")
+    parser.add_argument("questions", help="질문 파일 (.txt 한 줄 하나 / .jsonl {'question': ...})")
+    parser.add_argument("--chain", choices=["menu", "multimodal"], default="menu",
+                        help="menu: ragmenu2 체인, multimodal: rag4_multimodal 체인")
+    parser.add_argument("--out", default="answers.jsonl", help="결과 JSONL 경로")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 실행할 최대 질문 수")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="abatch 사용")
+    args = parser.parse_args()
+
+    questions = read_questions(args.questions)
+    if not questions:
+        print("❌ 질문이 없습니다.")
+        return
+    print(f"✓ 질문 {len(questions)}개 로드 (동시 실행 {args.concurrency})")
+
+    chain = create_batch_chain(*load_chain_parts(args.chain))
+    config = {"max_concurrency": args.concurrency}
+
+    t0 = time.perf_counter()
+    if args.use_async:
+        results = asyncio.run(chain.abatch(questions, config=config, return_exceptions=True))
+    else:
+        results = chain.batch(questions, config=config, return_exceptions=True)
+    wall_sec = time.perf_counter() - t0
+
+    # 실패한 질문도 기록 (오류 메시지 포함)
+    records = [
+        {"question": q, "error": f"{type(r).__name__}: {r}"} if isinstance(r, Exception) else r
+        for q, r in zip(questions, results)
+    ]
+    with open(args.out, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    summary = summarize(records, wall_sec)
+    print(f"\n{'='*60}")
+    print(f"완료: {summary['succeeded']}/{summary['questions']} 성공, {summary['wall_sec']:.1f}s")
+    print(f"처리량: {summary['questions_per_sec']:.2f} 질문/s, {summary['tokens_per_sec']:.0f} 토큰/s "
+          f"(총 {summary['tokens_total']} 토큰)")
+    print(f"지연시간: p50 {summary['latency_p50']:.2f}s / p95 {summary['latency_p95']:.2f}s "
+          f"(검색 p50 {summary['retrieval_p50']:.2f}s, 생성 p50 {summary['generation_p50']:.2f}s)")
+    print(f"결과 저장: {args.out}")
+    print(f"{'='*60}")
+
+
+if __name__ == "__main__":
+    main()
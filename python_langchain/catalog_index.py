@@ -0,0 +1,356 @@
+"""
+메뉴/와인 카탈로그 구조화 인덱스 (가격·속성 필터 질문용)
+
+"30만원 이상의 와인을 추천해주세요" 같은 질문을 벡터 검색 + LLM 이 본문에서 가격을 읽어 답하면
+느리고 자주 틀린다 (검색된 3개 청크 밖의 와인은 아예 못 봄).
+
+1. 적재 시 restaurant_menu.txt / restaurant_wine.txt 의 항목을 필드로 추출
+       1. 시그니처 스테이크
+          • 가격: ₩35,000
+          • 주요 식재료: ...        (와인은 '주요 품종')
+          • 설명: ...
+   → 이름 / 가격(원) / 분류(menu, wine) / 재료·품종 / 설명 을 열(column) 단위로 보관
+2. 질문에서 가격 범위·분류·재료 조건을 뽑아 Pinecone 메타데이터 필터와 같은 형식의 dict 로 만듦
+       {"category": "wine", "price": {"$gte": 300000}}
+   (레드/화이트, 디저트/파스타 같은 세부 종류는 열이 없으므로 필터 대신 일반 RAG 로 보냄)
+3. 표에서 numpy 마스크로 바로 걸러서 정확한 결과를 얻고, LLM 은 문장 다듬기에만 사용
+   (같은 필터를 item_documents() 로 올린 Pinecone 인덱스의 filter 인자로 그대로 넘길 수도 있음)
+
+사용 예시:
+    catalog = CatalogTable.from_documents(documents)
+    flt = parse_filter_query("30만원 이상의 와인을 추천해주세요", catalog)
+    rows = catalog.query(flt)
+"""
+
+import re
+
+import numpy as np
+from langchain_core.documents import Document
+
+_item_re = re.compile(r"^\s*(\d+)\.\s*(.+?)\s*$")
+_field_re = re.compile(r"^\s*•\s*([^:]+):\s*(.+?)\s*$")
+_won_re = re.compile(r"[\d,]+")
+
+# 필드 이름 (원문 표기 → 열 이름)
+FIELD_NAMES = {"가격": "price", "주요 식재료": "ingredients", "주요 품종": "ingredients", "설명": "description"}
+
+# 질문 속 분류 표현 (표의 category 열은 menu / wine 두 가지뿐)
+CATEGORY_WORDS = {
+    "wine": ["와인", "wine"],
+    "menu": ["메뉴", "요리", "음식", "식사"],
+}
+# 표에 열이 없는 세부 종류 (레드/화이트, 디저트/파스타 …)
+# menu/wine 으로 뭉개면 "2만원 미만 디저트" 에 샐러드·수프까지 나오므로, 이런 질문은 일반 RAG 로 보냄
+SUBTYPE_WORDS = ["레드", "화이트", "샴페인", "스파클링", "로제", "red", "white", "champagne",
+                 "디저트", "파스타", "스테이크", "리조또", "샐러드", "수프", "dessert", "pasta", "steak"]
+
+
+def catalog_category(source):
+    """파일 이름으로 분류 결정 (restaurant_wine.txt → wine)"""
+    return "wine" if "wine" in source.lower() else "menu"
+
+
+def parse_price(text):
+    """'₩35,000' → 35000 (숫자가 없으면 None)"""
+    match = _won_re.search(text)
+    return int(match.group().replace(",", "")) if match and match.group().strip(",") else None
+
+
+def parse_catalog(text, category, source=None):
+    """
+    카탈로그 본문을 항목 dict 리스트로 변환
+
+    Returns:
+        list: {'name', 'price', 'category', 'ingredients', 'description', 'source', 'text'} 리스트
+    """
+    items, current, lines = [], None, []
+    for line in text.splitlines():
+        item = _item_re.match(line)
+        if item and not line.lstrip().startswith("•"):
+            if current:
+                current["text"] = "\n".join(lines).strip()
+                items.append(current)
+            current = {"name": item.group(2), "price": None, "category": category,
+                       "ingredients": [], "description": "", "source": source}
+            lines = [line]
+            continue
+        if current is None:
+            continue
+        lines.append(line)
+        field = _field_re.match(line)
+        if not field or field.group(1).strip() not in FIELD_NAMES:
+            continue
+        column, value = FIELD_NAMES[field.group(1).strip()], field.group(2)
+        if column == "price":
+            current["price"] = parse_price(value)
+        elif column == "ingredients":
+            current["ingredients"] = [part.strip() for part in value.split(",") if part.strip()]
+        else:
+            current["description"] = value
+    if current:
+        current["text"] = "\n".join(lines).strip()
+        items.append(current)
+    return [item for item in items if item["price"] is not None]
+
+
+# =================================================================
+# 열 단위 표
+# =================================================================
+class CatalogTable:
+    """
+    항목을 열 단위로 보관하는 인메모리 표
+
+    - price: int64 배열 (범위 조건은 배열 비교 한 번)
+    - category: 문자열 배열
+    - ingredients: 항목별 재료/품종 집합 (포함 조건)
+    """
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.names = [item["name"] for item in self.items]
+        self.price = np.array([item["price"] for item in self.items], dtype=np.int64)
+        self.category = np.array([item["category"] for item in self.items], dtype=object)
+        self.ingredients = [set(item["ingredients"]) for item in self.items]
+        # 질문에서 찾을 재료/품종 단어 ("블랙 트러플" → "블랙", "트러플")
+        self.vocabulary = sorted(
+            {token for words in self.ingredients for word in words for token in word.split() if len(token) >= 2},
+            key=len, reverse=True,
+        )
+
+    @classmethod
+    def from_documents(cls, documents):
+        """load_documents() 결과에서 카탈로그 형식 문서만 골라 표 생성"""
+        items = []
+        for doc in documents:
+            source = doc.metadata.get("source", "")
+            items.extend(parse_catalog(doc.page_content, catalog_category(source), source))
+        return cls(items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _mask(self, column, condition):
+        """열 하나에 대한 조건 마스크 ($eq/$ne/$gt/$gte/$lt/$lte/$in/$nin, 값만 주면 $eq)"""
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        if column == "ingredients":
+            mask = np.ones(len(self), dtype=bool)
+            for op, value in condition.items():
+                values = value if isinstance(value, list) else [value]
+                hit = np.array([any(v in word for v in values for word in words) for words in self.ingredients],
+                               dtype=bool)
+                mask &= ~hit if op in ("$ne", "$nin") else hit
+            return mask
+
+        data = {"price": self.price, "category": self.category}[column]
+        mask = np.ones(len(self), dtype=bool)
+        for op, value in condition.items():
+            if op == "$eq":
+                mask &= data == value
+            elif op == "$ne":
+                mask &= data != value
+            elif op == "$gt":
+                mask &= data > value
+            elif op == "$gte":
+                mask &= data >= value
+            elif op == "$lt":
+                mask &= data < value
+            elif op == "$lte":
+                mask &= data <= value
+            elif op == "$in":
+                mask &= np.isin(data, value)
+            elif op == "$nin":
+                mask &= ~np.isin(data, value)
+            else:
+                raise ValueError(f"지원하지 않는 연산자: {op}")
+        return mask
+
+    def query(self, flt=None, order_by="price", descending=True, limit=None):
+        """
+        필터 조건에 맞는 항목 반환
+
+        Args:
+            flt (dict): Pinecone 메타데이터 필터 형식 조건 (열: price, category, ingredients)
+            order_by (str): 정렬 기준 열 ('price' 또는 None)
+            descending (bool): 내림차순 여부
+            limit (int): 최대 반환 개수
+
+        Returns:
+            list: 항목 dict 리스트
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, condition in (flt or {}).items():
+            mask &= self._mask(column, condition)
+
+        rows = np.flatnonzero(mask)
+        if order_by == "price":
+            rows = rows[np.argsort(self.price[rows], kind="stable")]
+            if descending:
+                rows = rows[::-1]
+        return [self.items[i] for i in rows[:limit]]
+
+
+def item_documents(table):
+    """
+    항목별 Document (메타데이터에 price/category/name/ingredients)
+
+    Pinecone 에 함께 올리면 같은 필터를 vectorstore.similarity_search(query, filter=flt) 로 쓸 수 있다.
+    (단, Pinecone 의 ingredients $in 조건은 부분 일치가 아니라 전체 문자열 일치)
+    """
+    return [
+        Document(
+            page_content=item["text"],
+            metadata={"source": item["source"], "category": item["category"], "name": item["name"],
+                      "price": item["price"], "ingredients": item["ingredients"]},
+        )
+        for item in table.items
+    ]
+
+
+# =================================================================
+# 질문 → 필터
+# =================================================================
+_amount = r"(\d+(?:,\d{3})*(?:\.\d+)?)\s*(만\s*원|만|천\s*원|원)"
+_range_re = re.compile(_amount + r"\s*(?:에서|~|-|부터)\s*" + _amount)
+_bound_re = re.compile(_amount + r"\s*(?:이\s*)?(이상|넘는|넘게|초과|이하|미만|이내|까지|아래|밑|안쪽)")
+# 재료·품종이 조건으로 쓰였는지 ("트러플이 들어간", "메를로로 만든", "새우가 없는")
+_include_re = r"\s*(?:이|가|을|를|으로|로)?\s*(?:들어간|들어가는|들어\s*있는|포함된|포함한|포함하는|넣은|사용한|만든)"
+_exclude_re = r"\s*(?:이|가|을|를|은|는)?\s*(?:없는|안\s*들어간|빠진|빼고|제외한|제외하고)"
+
+
+def _won(number, unit):
+    value = float(number.replace(",", ""))
+    unit = unit.replace(" ", "")
+    if unit.startswith("만"):
+        value *= 10000
+    elif unit.startswith("천"):
+        value *= 1000
+    return int(value)
+
+
+def parse_filter_query(query, table=None):
+    """
+    질문에서 가격 범위 / 분류 / 재료 조건 추출
+
+    Args:
+        query (str): 사용자 질문
+        table (CatalogTable): 주면 표에 있는 재료·품종 이름도 조건으로 인식
+
+    재료·품종 이름은 "…가 들어간 / …가 없는" 처럼 조건으로 쓰였을 때만 필터로 본다.
+    ("랍스터 비스크는 어떤 맛인가요?" 처럼 이름만 나온 설명 질문은 일반 RAG 로 보냄)
+    가격 조건이 있을 때는 이름만 나와도 포함 조건으로 함께 건다.
+    레드 와인·디저트처럼 표로 가를 수 없는 세부 종류가 나오면 필터를 만들지 않는다.
+
+    Returns:
+        dict: Pinecone 필터 형식 조건, 가격·재료 조건이 없거나 세부 종류 질문이면 None (일반 RAG 로 처리)
+    """
+    lowered = query.lower()
+    if any(word in lowered for word in SUBTYPE_WORDS):
+        return None
+
+    flt, price = {}, {}
+
+    match = _range_re.search(query)
+    if match:
+        price = {"$gte": _won(*match.group(1, 2)), "$lte": _won(*match.group(3, 4))}
+    else:
+        for number, unit, bound in _bound_re.findall(query):
+            value = _won(number, unit)
+            if bound in ("이상", "넘는", "넘게"):
+                price["$gte"] = value
+            elif bound == "초과":
+                price["$gt"] = value
+            elif bound == "미만":
+                price["$lt"] = value
+            else:
+                price["$lte"] = value
+    if price:
+        flt["price"] = price
+
+    if table is not None:
+        include, exclude = [], []
+        for word in table.vocabulary:
+            if word not in query:
+                continue
+            if re.search(re.escape(word) + _exclude_re, query):
+                exclude.append(word)
+            elif price or re.search(re.escape(word) + _include_re, query):
+                include.append(word)
+        condition = {}
+        if include:
+            condition["$in"] = include
+        if exclude:
+            condition["$nin"] = exclude
+        if condition:
+            flt["ingredients"] = condition
+
+    if not flt:
+        return None
+
+    for category, words in CATEGORY_WORDS.items():
+        if any(word in lowered for word in words):
+            flt["category"] = category
+            break
+    return flt
+
+
+def format_rows(rows):
+    """항목 리스트를 LLM/출력용 텍스트로 (설명 포함 - 답변에 특징도 쓸 수 있도록)"""
+    return "\n".join(
+        f"- {row['name']} (₩{row['price']:,}) : {', '.join(row['ingredients'])}"
+        + (f" / {row['description']}" if row.get("description") else "")
+        for row in rows
+    )
+
+
+def answer_from_catalog(query, table, phrase_chain=None, limit=10):
+    """
+    필터 질문이면 표에서 바로 답변
+
+    Args:
+        query (str): 사용자 질문
+        table (CatalogTable): 카탈로그 표
+        phrase_chain: {"question", "rows"} → 문자열 체인 (None 이면 목록 그대로 반환)
+        limit (int): 최대 항목 수
+
+    Returns:
+        tuple: (답변, 항목 리스트, 필터), 필터 질문이 아니면 None
+    """
+    flt = parse_filter_query(query, table)
+    if flt is None:
+        return None
+
+    rows = table.query(flt, limit=limit)
+    if not rows:
+        return "조건에 맞는 항목이 없습니다.", rows, flt
+    if phrase_chain is None:
+        return format_rows(rows), rows, flt
+    return phrase_chain.invoke({"question": query, "rows": format_rows(rows)}), rows, flt
+
+
+if __name__ == "__main__":
+    # 실제 data 폴더 카탈로그로 확인
+    import os
+
+    from doc_loader import load_documents
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    table = CatalogTable.from_documents(load_documents(data_dir))
+
+    def names(query):
+        flt = parse_filter_query(query, table)
+        return None if flt is None else [row["name"] for row in table.query(flt)]
+
+    # 세부 종류는 표로 가를 수 없음 → 엉뚱한 항목(샐러드·수프, 스테이크, 샴페인·화이트) 대신 일반 RAG
+    for query in ["2만원 미만 디저트", "새우가 없는 파스타", "30만 원 넘는 레드 와인"]:
+        assert names(query) is None, (query, names(query))
+
+    # 분류·가격·재료 조건은 그대로 표에서 답함
+    assert names("30만원 이상의 와인을 추천해주세요") == [
+        "클로 뒤 발 2016", "그랜지 2016", "샤토 디켐 2015", "오퍼스 원 2017", "샤토 마고 2015",
+        "사시카이아 2018", "돔 페리뇽 2012", "풀리니 몽라쉐 1er Cru 2018"]
+    assert "해산물 파스타" not in names("새우가 없는 메뉴")
+    assert names("트러플이 들어간 요리") == ["트러플 리조또", "버섯 크림 수프"]
+    assert names("랍스터 비스크는 어떤 맛인가요?") is None
+    print(f"✓ 카탈로그 {len(table)}개 항목, 필터 질문 확인")
@@ -2,14 +2,20 @@ import streamlit as st
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
+from prompt_cache import PromptCacheHandler, stable_prefix_prompt
+from rolling_memory import RollingMemory
 
 # 1. api key 로드
 load_dotenv()
 
-# 2. AI모델 생성
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+# 2. AI모델 생성 (호출별 프롬프트 캐시 적중 토큰 기록)
+@st.cache_resource
+def get_cache_stats():
+    return PromptCacheHandler()
+
+cache_stats = get_cache_stats()
+llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, callbacks=[cache_stats])
 
 # 3. 스트림릿 기본 설정
 st.set_page_config(page_title="AI챗봇1-Basic", layout="centered")
@@ -17,16 +23,20 @@ st.header("😻기본 챗봇 (langchain+streamlit)")
 st.caption("ChatPromptTemplate + 대화 기록 연동")
 
 # 4. 세션 상태 초기화 (메시지 저장 공간)
+# chat_history 는 화면 표시용 전체 기록, memory 는 프롬프트용 (최근 대화 원문 + 이전 대화 요약)
 if "chat_history" not in st.session_state:
     st.session_state["chat_history"] = []
+if "memory" not in st.session_state:
+    st.session_state["memory"] = RollingMemory(max_tokens=2000)
 
 # 5. PromptTemplate으로 템플릿 생성
 # 시스템에게 역할을 부여하고, 이전 대화 기록(history)을 포함하도록 구성합니다.
-prompt_template = ChatPromptTemplate.from_messages([
-    ("system", "너는 친절하고 유머러스한 AI 조수야. 사용자의 질문에 재치 있게 대답해줘."),
-    MessagesPlaceholder(variable_name="history"),
-    ("human", "{input}")
-])
+# 고정 시스템 → 대화 기록 → 새 입력 순서라 이전 요청이 다음 요청의 앞부분이 됨 (프롬프트 캐시)
+prompt_template = stable_prefix_prompt(
+    "너는 친절하고 유머러스한 AI 조수야. 사용자의 질문에 재치 있게 대답해줘.",
+    history_key="history",
+    human="{input}",
+)
 
 # 6. 세션 상태에 저장된 기존 메시지가 있으면 출력
 for message in st.session_state["chat_history"]:
@@ -43,18 +53,20 @@ if user_input := st.chat_input("메시지를 입력하세요..."):
     # 8. 모델 호출해서 응답 받기
     with st.chat_message("assistant"):
         with st.spinner("AI가 생각 중..."):
-            # 템플릿에 현재 입력과 전체 대화 기록을 주입
+            # 템플릿에 현재 입력과 토큰 예산 안의 대화 기록을 주입
             chain = prompt_template | llm
             response = chain.invoke({
                 "input": user_input,
-                "history": st.session_state["chat_history"]
+                "history": st.session_state["memory"].load(user_input)
             })
             
             ai_answer = response.content
             st.write(ai_answer)
+            st.caption(cache_stats.format_summary())
 
     # 9. 세션 상태에 내 질문과 응답 내용을 객체로 저장
     st.session_state["chat_history"].append(HumanMessage(content=user_input))
     st.session_state["chat_history"].append(AIMessage(content=ai_answer))
+    st.session_state["memory"].save(user_input, ai_answer)
 
     
\ No newline at end of file
@@ -4,7 +4,7 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
+from session_store import SQLiteHistoryStore
 
 # 1. 환경 변수 로드
 load_dotenv()
@@ -13,19 +13,23 @@ st.header("세션별 관리 챗봇")
 st.subheader("RunnableWithMessageHistory 방식")
 st.caption("사용자 세션 ID에 따라 대화를 기억합니다.")
 
-# 2. 세션 상태에 대화 기록 저장소(store) 초기화
-if "store" not in st.session_state:
-    st.session_state.store = {}
+HISTORY_DB = "chat_history.db"
+MAX_SESSIONS = 256  # 메모리에 둘 세션 수 (나머지는 DB 에만)
+MAX_MESSAGES = 40  # 세션마다 불러올 최근 메시지 수
+
+# 2. 대화 기록 저장소 (SQLite) 초기화
+# st.session_state 는 브라우저 탭마다 따로라서, 저장소는 프로세스에 하나만 만들어 모든 사용자가 공유
+@st.cache_resource
+def get_history_store():
+    return SQLiteHistoryStore(HISTORY_DB, max_sessions=MAX_SESSIONS, max_messages=MAX_MESSAGES)
 
 # 3. 세션 ID에 맞는 히스토리를 가져오는 함수
 def get_session_history(session_id: str):
-    if session_id not in st.session_state.store:
-        st.session_state.store[session_id] = ChatMessageHistory()
-    return st.session_state.store[session_id]
+    return get_history_store().get(session_id)
 
 # 현재 접속자의 세션 ID 설정 (나중에 로그인 정보로 대체 가능)
 user_id = st.sidebar.text_input("사용자 세션 id 입력", value="tbdl")
-SESSION_ID = "K"
+SESSION_ID = user_id.strip() or "guest"
 
 # 4. 모델 및 프롬프트 설정
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
@@ -0,0 +1,300 @@
+"""
+Chroma 영구 저장 폴더 정리(컴팩션) 도구
+
+from_documents 를 반복 실행하면 chroma_store/, chroma_db_new/ 같은 폴더에
+UUID 이름의 HNSW 세그먼트 폴더(link_lists.bin, index_metadata.pickle 등)가 계속 쌓인다.
+
+처리 순서:
+1. 중복 임베딩 제거: 같은 내용(해시)의 문서는 하나만 남기고 삭제
+2. HNSW 재구축: 컬렉션을 새로 만들어 삭제 표시된 빈 슬롯 없이 다시 적재
+3. 고아 세그먼트 삭제: chroma.sqlite3 의 segments 테이블에 없는 UUID 폴더 삭제
+4. sqlite VACUUM 으로 빈 페이지 반환
+
+결과로 회수한 바이트 수와 로드 시간 변화를 출력한다.
+
+실행 예시:
+    python chroma_compact.py ../chroma_store ../chroma_db_new          # 점검만 (dry-run)
+    python chroma_compact.py ../chroma_store --apply                    # 실제 정리
+    python chroma_compact.py ../chroma_store --apply --skip-rebuild     # 고아 세그먼트만 정리
+"""
+
+# pip install chromadb
+
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import uuid
+
+SQLITE_FILE = "chroma.sqlite3"
+PAGE_SIZE = 1000  # 컬렉션을 나눠서 읽을 때 한 번에 가져올 개수
+
+
+# =================================================================
+# 폴더/세그먼트 점검
+# =================================================================
+def dir_size(path):
+    """폴더(또는 파일) 전체 크기 (bytes)"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def is_uuid(name):
+    """세그먼트 폴더 이름(UUID) 여부"""
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def referenced_segments(persist_dir):
+    """chroma.sqlite3 에 등록된 세그먼트 id 집합 (sqlite 가 없으면 빈 집합 - 호출 전에 확인할 것)"""
+    db_path = os.path.join(persist_dir, SQLITE_FILE)
+    if not os.path.exists(db_path):
+        return set()
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT id FROM segments")}
+
+
+def find_orphan_segments(persist_dir):
+    """
+    sqlite 에서 참조하지 않는 UUID 세그먼트 폴더 찾기
+
+    Returns:
+        list: (폴더 경로, 크기 bytes) 리스트
+    """
+    referenced = referenced_segments(persist_dir)
+    orphans = []
+    for name in sorted(os.listdir(persist_dir)):
+        path = os.path.join(persist_dir, name)
+        if os.path.isdir(path) and is_uuid(name) and name not in referenced:
+            orphans.append((path, dir_size(path)))
+    return orphans
+
+
+def measure_load_time(persist_dir):
+    """
+    새 파이썬 프로세스에서 클라이언트 생성 + 모든 컬렉션 HNSW 로드에 걸리는 시간 (초)
+
+    같은 프로세스에서 재면 chromadb 내부 캐시 때문에 두 번째 측정이 빨라지므로 별도 프로세스를 쓴다.
+    """
+    if not os.path.exists(os.path.join(persist_dir, SQLITE_FILE)):
+        return None
+
+    script = (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        "import chromadb\n"
+        "client = chromadb.PersistentClient(path=sys.argv[1])\n"
+        "for c in client.list_collections():\n"
+        "    col = client.get_collection(getattr(c, 'name', c), embedding_function=None)\n"
+        "    if col.count():\n"
+        "        dim = len(col.peek(1)['embeddings'][0])\n"
+        "        col.query(query_embeddings=[[0.0] * dim], n_results=1)\n"
+        "print(time.perf_counter() - t0)\n"
+    )
+    try:
+        out = subprocess.run(
+            [sys.executable, "-c", script, persist_dir],
+            capture_output=True, text=True, check=True,
+        )
+        return float(out.stdout.strip().splitlines()[-1])
+    except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+        print(f"✗ 로드 시간 측정 실패: {e}")
+        return None
+
+
+# =================================================================
+# 컬렉션 정리 (중복 제거 + HNSW 재구축)
+# =================================================================
+def content_hash(document, metadata):
+    """문서 내용 + 출처 기준 해시 (같은 파일의 같은 청크를 중복으로 판단)"""
+    source = (metadata or {}).get("source", "")
+    return hashlib.sha256(f"{source}\x00{document or ''}".encode("utf-8")).hexdigest()
+
+
+def read_collection(collection):
+    """컬렉션 전체를 페이지 단위로 읽기"""
+    records = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=PAGE_SIZE,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        for key in records:
+            records[key].extend(page[key])
+        offset += len(page["ids"])
+    return records
+
+
+def compact_collection(client, name, apply):
+    """
+    컬렉션 하나의 중복 임베딩을 제거하고 HNSW 인덱스를 새로 구축
+
+    Args:
+        client: chromadb.PersistentClient
+        name (str): 컬렉션 이름
+        apply (bool): False 면 중복 개수만 보고
+
+    Returns:
+        tuple: (전체 개수, 중복 개수)
+    """
+    collection = client.get_collection(name, embedding_function=None)
+    records = read_collection(collection)
+
+    keep, seen = [], set()
+    for i, (document, metadata) in enumerate(zip(records["documents"], records["metadatas"])):
+        digest = content_hash(document, metadata)
+        if digest not in seen:
+            seen.add(digest)
+            keep.append(i)
+
+    total = len(records["ids"])
+    duplicates = total - len(keep)
+    print(f"  - 컬렉션 '{name}': {total}개 중 중복 {duplicates}개")
+
+    if not apply or total == 0:
+        return total, duplicates
+
+    # 같은 설정의 임시 컬렉션에 순서대로 적재한 뒤 이름을 바꿔 교체
+    # (HNSW 는 삭제된 노드 자리를 남겨두므로 새로 만드는 것이 가장 작다)
+    # 적재 중 오류(차원 불일치, 디스크 부족, Ctrl-C)가 나도 원본 컬렉션은 그대로 남는다
+    suffix = uuid.uuid4().hex[:8]
+    temp_name, backup_name = f"{name}_compact_{suffix}", f"{name}_backup_{suffix}"
+    rebuilt = client.create_collection(temp_name, metadata=collection.metadata, embedding_function=None)
+    try:
+        for start in range(0, len(keep), PAGE_SIZE):
+            batch = keep[start:start + PAGE_SIZE]
+            rebuilt.add(
+                ids=[records["ids"][i] for i in batch],
+                embeddings=[list(records["embeddings"][i]) for i in batch],
+                documents=[records["documents"][i] for i in batch],
+                metadatas=[records["metadatas"][i] for i in batch],
+            )
+        if rebuilt.count() != len(keep):
+            raise RuntimeError(f"재구축 개수 불일치: {rebuilt.count()} / {len(keep)}")
+    except BaseException:
+        client.delete_collection(temp_name)
+        print(f"  ✗ '{name}' 재구축 실패: 원본 컬렉션은 그대로 둡니다")
+        raise
+
+    # 원본 → 백업 이름, 임시 → 원래 이름 순서로 바꾸고, 성공한 뒤에만 백업 삭제
+    collection.modify(name=backup_name)
+    try:
+        rebuilt.modify(name=name)
+    except BaseException:
+        collection.modify(name=name)
+        raise
+    client.delete_collection(backup_name)
+    print(f"  ✓ '{name}' 재구축 완료 ({len(keep)}개)")
+    return total, duplicates
+
+
+def vacuum(persist_dir):
+    """sqlite 빈 페이지 반환"""
+    db_path = os.path.join(persist_dir, SQLITE_FILE)
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+
+# =================================================================
+# 메인 실행
+# =================================================================
+def compact(persist_dir, apply=False, rebuild=True):
+    """
+    영구 저장 폴더 하나를 정리
+
+    Returns:
+        dict: 정리 결과 (크기/로드 시간 전후, 삭제한 세그먼트 수, 중복 수)
+    """
+    print(f"\n{'='*60}")
+    print(f"정리 대상: {os.path.abspath(persist_dir)}{'' if apply else ' (dry-run)'}")
+    print(f"{'='*60}")
+
+    size_before = dir_size(persist_dir)
+    load_before = measure_load_time(persist_dir)
+    has_db = os.path.exists(os.path.join(persist_dir, SQLITE_FILE))
+    duplicates = 0
+
+    # 1~2. 중복 제거 + HNSW 재구축 (sqlite 가 있어야 컬렉션을 열 수 있음)
+    if rebuild and has_db:
+        import chromadb
+        client = chromadb.PersistentClient(path=persist_dir)
+        for c in client.list_collections():
+            _, dup = compact_collection(client, getattr(c, "name", c), apply)
+            duplicates += dup
+        del client
+
+    # 3. 고아 세그먼트 삭제 (재구축으로 생긴 이전 세그먼트 포함)
+    # sqlite 가 없으면 어떤 폴더가 쓰이는지 알 수 없으므로 아무것도 지우지 않음
+    if has_db:
+        orphans = find_orphan_segments(persist_dir)
+    else:
+        print(f"  - {SQLITE_FILE} 없음: 참조 여부를 알 수 없어 세그먼트 정리를 건너뜀")
+        orphans = []
+    for path, size in orphans:
+        print(f"  - 고아 세그먼트: {os.path.basename(path)} ({size / 1024:.1f} KB)")
+        if apply:
+            shutil.rmtree(path)
+
+    # 4. sqlite 정리
+    if apply:
+        vacuum(persist_dir)
+
+    size_after = dir_size(persist_dir) if apply else size_before - sum(size for _, size in orphans)
+    load_after = measure_load_time(persist_dir) if apply else None
+
+    print(f"\n  회수한 용량: {(size_before - size_after) / 1024:.1f} KB "
+          f"({size_before / 1024:.1f} KB → {size_after / 1024:.1f} KB){'' if apply else ' (예상)'}")
+    if load_before is not None and load_after is not None:
+        print(f"  로드 시간: {load_before * 1000:.0f} ms → {load_after * 1000:.0f} ms "
+              f"({(load_after - load_before) * 1000:+.0f} ms)")
+
+    return {
+        "path": persist_dir,
+        "orphans": len(orphans),
+        "duplicates": duplicates,
+        "bytes_before": size_before,
+        "bytes_after": size_after,
+        "load_before": load_before,
+        "load_after": load_after,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma 영구 저장 폴더 컴팩션")
+    parser.add_argument("paths", nargs="+", help="Chroma persist_directory 경로 (여러 개 가능)")
+    parser.add_argument("--apply", action="store_true", help="실제로 삭제/재구축 (기본은 점검만)")
+    parser.add_argument("--skip-rebuild", action="store_true", help="중복 제거/HNSW 재구축 생략")
+    args = parser.parse_args()
+
+    results = []
+    for path in args.paths:
+        if not os.path.isdir(path):
+            print(f"✗ 폴더가 없습니다: {path}")
+            continue
+        results.append(compact(path, apply=args.apply, rebuild=not args.skip_rebuild))
+
+    reclaimed = sum(r["bytes_before"] - r["bytes_after"] for r in results)
+    print(f"\n✓ 총 회수 용량: {reclaimed / 1024:.1f} KB{'' if args.apply else ' (예상, --apply 로 실행)'}")
+
+
+if __name__ == "__main__":
+    main()
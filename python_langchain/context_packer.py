@@ -0,0 +1,239 @@
+"""
+토큰 예산 기반 컨텍스트 패커
+
+format_docs 는 검색된 k 개 청크를 그대로 이어붙여서
+- 인접 청크 사이의 겹침(chunk_overlap=50) 부분이 두 번 들어가고
+- 같은 출처 머리말이 청크마다 반복되며
+- 프롬프트 길이에 상한이 없었다.
+
+여기서는
+1. 같은 출처의 인접 청크를 겹침 부분을 잘라내고 하나로 합치고
+   - 분할할 때 add_start_index=True 로 넣은 metadata['start_index'] 로 위치가 이어지는지 판단
+     (문단 단위로 나뉘어 겹치는 글자가 없어도 합쳐짐)
+   - start_index 가 없는 예전 인덱스는 글자 겹침(10자 이상)으로 판단
+2. 완전히 같은 청크는 한 번만 넣고
+3. 점수가 높은 묶음부터 토큰 예산(max_tokens)을 채운다 (마지막 묶음은 예산에 맞게 자름)
+
+토큰 수는 tiktoken 으로 측정하며 인코더와 청크별 토큰 수를 캐시한다.
+
+사용 예시:
+    context = pack_context(docs, scores, max_tokens=1500)
+    text, stats = pack_documents(docs, scores, max_tokens=1500)
+"""
+
+# pip install tiktoken
+
+from functools import lru_cache
+
+import tiktoken
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+# =================================================================
+# 토큰 계산 (캐시)
+# =================================================================
+@lru_cache(maxsize=8)
+def get_encoding(model=DEFAULT_MODEL):
+    """모델에 맞는 tiktoken 인코더 (처음 한 번만 로드)"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text, model=DEFAULT_MODEL):
+    """텍스트 토큰 수 (같은 청크가 반복 검색되므로 결과를 캐시)"""
+    return len(get_encoding(model).encode(text))
+
+
+def truncate_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """앞에서부터 max_tokens 토큰까지만 남기기"""
+    enc = get_encoding(model)
+    tokens = enc.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return enc.decode(tokens[:max_tokens])
+
+
+# =================================================================
+# 청크 병합
+# =================================================================
+def overlap_length(left, right, max_overlap=200, min_overlap=10):
+    """left 의 끝과 right 의 시작이 겹치는 길이 (없으면 0)"""
+    upper = min(len(left), len(right), max_overlap)
+    for size in range(upper, min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def default_header(doc):
+    """묶음 앞에 붙일 머리말 (rag4_multimodal 형식: [TYPE - source])"""
+    doc_type = doc.metadata.get('type')
+    source = doc.metadata.get('source', 'Unknown')
+    return f"[{doc_type.upper()} - {source}]" if doc_type else f"[{source}]"
+
+
+ADJACENT_GAP = 10  # start_index 기준으로 이 글자 수 이하만 떨어져 있으면 이어진 청크로 봄 (문단 사이 줄바꿈 등)
+
+
+def _span(doc, text):
+    """원문에서 청크 위치 (start, end), start_index 메타데이터가 없으면 None"""
+    start = doc.metadata.get('start_index')
+    if start is None or start < 0:
+        return None
+    return start, start + len(text)
+
+
+def _join_by_span(group, text, span):
+    """위치 정보로 묶음 앞/뒤에 청크 붙이기 (겹치는 부분은 잘라냄), 이어지지 않으면 False"""
+    start, end = group['span']
+    new_start, new_end = span
+    if start <= new_start and new_end <= end:
+        return True  # 이미 묶음 안에 있는 구간
+    if start <= new_start <= end + ADJACENT_GAP:
+        overlap = max(0, end - new_start)
+        group['text'] += ("\n" if new_start > end else "") + text[overlap:]
+    elif new_start <= start <= new_end + ADJACENT_GAP:
+        overlap = max(0, new_end - start)
+        group['text'] = text + ("\n" if start > new_end else "") + group['text'][overlap:]
+    else:
+        return False
+    group['span'] = (min(start, new_start), max(end, new_end))
+    return True
+
+
+def _join_by_overlap(group, text):
+    """글자 겹침으로 묶음 앞/뒤에 청크 붙이기 (위치 정보가 없을 때), 이어지지 않으면 False"""
+    size = overlap_length(group['text'], text)
+    if size:
+        group['text'] = group['text'] + text[size:]
+        return True
+    size = overlap_length(text, group['text'])
+    if size:
+        group['text'] = text + group['text'][size:]
+        return True
+    return False
+
+
+def merge_adjacent(docs, scores):
+    """
+    같은 출처에서 이어지는 청크를 하나의 묶음으로 합침
+
+    Returns:
+        list: {'doc', 'text', 'score', 'chunks', 'span'} 묶음 리스트 (첫 등장 순서)
+    """
+    groups = []
+    seen_texts = set()
+
+    for doc, score in zip(docs, scores):
+        text = doc.page_content.strip()
+        if not text or text in seen_texts:
+            continue  # 완전히 같은 청크는 한 번만
+        seen_texts.add(text)
+
+        source = doc.metadata.get('source')
+        span = _span(doc, doc.page_content)
+        if span is not None and doc.page_content != text:
+            # strip 으로 앞 공백이 빠졌으면 그만큼 시작 위치 보정
+            offset = len(doc.page_content) - len(doc.page_content.lstrip())
+            span = (span[0] + offset, span[0] + offset + len(text))
+
+        merged = False
+        for group in groups:
+            if group['doc'].metadata.get('source') != source:
+                continue
+            # 기존 묶음 뒤에 이어지는 청크 / 앞에 오는 청크 모두 확인
+            if span is not None and group['span'] is not None:
+                merged = _join_by_span(group, text, span)
+            else:
+                merged = _join_by_overlap(group, text)
+            if merged:
+                group['score'] = max(group['score'], score)
+                group['chunks'] += 1
+                break
+
+        if not merged:
+            groups.append({'doc': doc, 'text': text, 'score': score, 'chunks': 1, 'span': span})
+    return groups
+
+
+# =================================================================
+# 패킹
+# =================================================================
+def pack_documents(docs, scores=None, max_tokens=1500, header=default_header, model=DEFAULT_MODEL):
+    """
+    검색 문서를 토큰 예산 안에서 하나의 컨텍스트 문자열로 패킹
+
+    Args:
+        docs (list): 검색된 Document 리스트 (scores 가 없으면 이 순서가 중요도 순서)
+        scores (list): 문서별 유사도 점수 (높을수록 먼저 포함)
+        max_tokens (int): 컨텍스트 최대 토큰 수
+        header (callable): doc → 묶음 머리말 문자열 (None 이면 머리말 없음)
+        model (str): 토큰 계산 기준 모델
+
+    Returns:
+        tuple: (컨텍스트 문자열, 통계 dict)
+    """
+    if scores is None:
+        # 점수가 없으면 검색 순서를 점수로 사용 (앞쪽이 높음)
+        scores = [-i for i in range(len(docs))]
+
+    groups = merge_adjacent(docs, scores)
+    groups.sort(key=lambda g: g['score'], reverse=True)
+
+    parts, used = [], 0
+    separator_tokens = count_tokens("\n\n", model)
+    for group in groups:
+        block = f"{header(group['doc'])}\n{group['text']}" if header else group['text']
+        cost = count_tokens(block, model) + (separator_tokens if parts else 0)
+
+        if used + cost > max_tokens:
+            remaining = max_tokens - used - (separator_tokens if parts else 0)
+            if remaining >= 50:  # 의미 있는 길이가 남을 때만 잘라서 포함
+                block = truncate_tokens(block, remaining, model)
+                parts.append(block)
+                used += count_tokens(block, model) + (separator_tokens if len(parts) > 1 else 0)
+            break
+
+        parts.append(block)
+        used += cost
+
+    stats = {
+        "chunks_in": len(docs),
+        "groups": len(groups),
+        "blocks_out": len(parts),
+        "input_tokens": sum(count_tokens(d.page_content, model) for d in docs),
+        "packed_tokens": used,
+    }
+    return "\n\n".join(parts), stats
+
+
+def pack_context(docs, scores=None, max_tokens=1500, header=default_header, model=DEFAULT_MODEL):
+    """pack_documents 의 컨텍스트 문자열만 반환 (format_docs 대체용)"""
+    return pack_documents(docs, scores, max_tokens, header, model)[0]
+
+
+if __name__ == "__main__":
+    # 실제 data 폴더 문서로 확인: 이어진 청크 3개 → 머리말 1개
+    # (문단 단위로 나뉘어 글자 겹침이 없어도 start_index 로 합쳐져야 함)
+    import os
+
+    from doc_loader import load_documents, split_document
+
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    splits = [d for d in split_document(load_documents(data_dir)) if d.metadata["source"] == "restaurant_menu.txt"]
+    picked = splits[:3]
+    groups = merge_adjacent(picked, [1.0, 0.9, 0.8])
+    assert all(overlap_length(a.page_content, b.page_content) == 0 for a, b in zip(picked, picked[1:]))
+    assert len(groups) == 1 and groups[0]['chunks'] == 3, groups
+    assert groups[0]['text'].count("가격:") == sum(d.page_content.count("가격:") for d in picked)
+
+    # 떨어진 청크(0번, 2번)는 합치지 않음
+    assert len(merge_adjacent([splits[0], splits[2]], [1.0, 0.9])) == 2
+    # start_index 가 없으면 예전처럼 글자 겹침으로만 판단
+    no_index = [d.model_copy(update={"metadata": {"source": d.metadata["source"]}}) for d in picked]
+    assert len(merge_adjacent(no_index, [1.0, 0.9, 0.8])) == 3
+    print(f"✓ 머리말 {len(picked)}개 → {len(groups)}개")
@@ -0,0 +1,50 @@
+"""
+텍스트 문서 로드 / 청크 분할 헬퍼
+
+ragmenu2.py 에 있던 함수를 옮겨 온 모듈.
+ragmenu2 를 import 하면 Pinecone 등 설정이 함께 실행되므로,
+문서만 필요한 vector_bench.py 같은 스크립트는 이 모듈에서 가져다 쓴다.
+"""
+
+import os
+
+from langchain_community.document_loaders import TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def load_documents(path):
+    document = [] # 변수명 리스트
+    for filename in os.listdir(path):
+        if filename.endswith('.txt'):
+            file_path = os.path.join(path, filename)
+            try:
+                loader = TextLoader(file_path, encoding="utf-8")
+                docs = loader.load()
+                # 도큐먼트에 메타정보 추가 (파일명)
+                for doc in docs:
+                    # [수정] == 가 아니라 = 로 할당해야 하며, 딕셔너리 접근은 [] 입니다.
+                    doc.metadata['source'] = filename 
+
+                document.extend(docs)
+                print(f'load complete. {filename}=============')
+            except Exception as ex:
+                print(f"문서 로드 실패: {file_path} - {ex}")
+
+    # [수정] 함수 이름이 아니라 결과 리스트를 반환해야 함
+    return document
+
+
+
+
+
+def split_document(documents, chunk_size=500, overlap_size=50):
+    # [수정] 인자 이름을 documents로 맞춰줌
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size = chunk_size,
+        chunk_overlap = overlap_size, # [수정] 인자 이름은 chunk_overlap 입니다.
+        add_start_index = True # 원문 위치 (context_packer 가 이어진 청크를 합칠 때 사용)
+    )
+    splits = text_splitter.split_documents(documents)
+    # [수정] f-string 앞에 f가 빠지지 않았는지 확인
+    print(f"문서 분할 완료, {len(splits)}개 청크 생성 완료")
+    return splits
@@ -2,8 +2,9 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from prompt_cache import PromptCacheHandler, stable_prefix_prompt
+from singleflight import CoalescingChatModel
 
 # 1. 환경 변수 로드
 load_dotenv()
@@ -82,19 +83,33 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # 4. 랭체인 로직 설정
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7)
+# 호출별 프롬프트 캐시 적중 토큰 기록 (모든 방문자 공유)
+@st.cache_resource
+def get_cache_stats():
+    return PromptCacheHandler()
 
-prompt = ChatPromptTemplate.from_messages([
-    ("system", """당신은 게임 용어를 분석하고 설명하는 15년 차 시니어 게임 개발자입니다.
+cache_stats = get_cache_stats()
+llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, callbacks=[cache_stats])
+
+# 같은 질문이 동시에 들어오면 (여러 방문자가 같은 버튼 클릭) LLM 호출 한 번을 나눠 받음
+# st.cache_resource 로 모든 세션이 같은 객체를 공유해야 합쳐짐
+@st.cache_resource
+def get_coalesced_llm():
+    return CoalescingChatModel(llm)
+
+coalesced_llm = get_coalesced_llm()
+
+SYSTEM_PROMPT = """당신은 게임 용어를 분석하고 설명하는 15년 차 시니어 게임 개발자입니다.
     가벼운 농담이나 풍선 효과 같은 군더더기는 빼고, 아래 구조에 맞춰 전문적이고 명확하게 답변하세요:
     
     1. 핵심 요약: 해당 용어의 기술적/운영적 정의
     2. 메커니즘 분석: 실제 게임 로직이나 시스템에서 어떻게 작동하는지
-    3. 현업 사례: 실제 유명 게임에서의 구체적인 적용 예시"""),
-    ("user", "{question}")
-])
+    3. 현업 사례: 실제 유명 게임에서의 구체적인 적용 예시"""
+
+# 고정 시스템 지시문이 항상 맨 앞, 질문만 뒤에서 바뀜 (프롬프트 캐시)
+prompt = stable_prefix_prompt(SYSTEM_PROMPT, human="{question}")
 
-chain = prompt | llm | StrOutputParser()
+chain = prompt | coalesced_llm.as_runnable() | StrOutputParser()
 
 # 5. 사이드바 구성
 with st.sidebar:
@@ -141,6 +156,9 @@ user_input = st.text_input(
 if user_input:
     with st.status("용어 분석 중...", expanded=True) as status:
         st.markdown(f"### 🔍 '{user_input}' 분석 결과")
-        response = chain.invoke({"question": user_input})
-        st.markdown(response)
+        # 토큰이 생성되는 대로 표시 (합류한 요청도 같은 토큰을 받음)
+        response = st.write_stream(chain.stream({"question": user_input}))
+        st.caption(cache_stats.format_summary())
+        flight = coalesced_llm.flight.stats
+        st.caption(f"LLM 호출 {flight['upstream_calls']}회 · 진행 중 요청에 합류 {flight['coalesced']}회")
         status.update(label="분석 완료", state="complete")
\ No newline at end of file
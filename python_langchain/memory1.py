@@ -75,4 +75,73 @@ conversation = ConversationChain(
 print(conversation.predict(input="어제는 두바이 쿠키를 먹었고, 오늘은 마라탕을 먹었어."))
 print(conversation.predict(input="내일은 초밥을 먹을 예정이야."))
 # 메모리 안을 들여다보면 대화가 요약되어 저장된 걸 볼 수 있습니다.
-print(memory.load_memory_variables({}))
\ No newline at end of file
+print(memory.load_memory_variables({}))
+
+
+
+
+
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from vector_memory import VectorMemory
+from dotenv import load_dotenv
+
+load_dotenv()
+
+llm = ChatOpenAI(model="gpt-3.5-turbo")
+
+# 최근 1턴은 그대로, 그 이전 턴은 벡터 인덱스에 넣어두고 질문과 관련 있는 턴만 꺼내 씀
+# 버퍼 메모리처럼 길어지지도 않고, k=1 창처럼 이름을 잊어버리지도 않습니다.
+memory = VectorMemory(k=2, recent_turns=1)
+
+prompt = ChatPromptTemplate.from_messages([
+    ("system", "너는 친절한 요리사 AI야."),
+    MessagesPlaceholder(variable_name="history"),
+    ("human", "{input}")
+])
+chain = prompt | llm
+
+for q in ["내 이름은 홍길동이야.", "나는 서울에 살아.", "매운 음식을 좋아해.", "오늘 추천 메뉴가 뭐야?", "내 이름이 뭐야?"]:
+    res = chain.invoke({"input": q, "history": memory.load(q)})
+    memory.save(q, res.content)
+    print(res.content)
+
+# 마지막 질문에서 인덱스에서 꺼내 온 이전 턴 (이름을 말한 턴이 들어 있어야 함)
+print([doc.page_content for doc in memory.recalled])
+
+
+
+
+
+
+from langchain_openai import ChatOpenAI
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from rolling_memory import BackgroundSummaryMemory
+from dotenv import load_dotenv
+
+load_dotenv()
+
+llm = ChatOpenAI(model="gpt-3.5-turbo")
+
+# ConversationSummaryMemory 는 매 턴 요약 호출이 끝나야 다음으로 넘어갑니다.
+# 여기서는 오래된 턴이 2턴 쌓이면 백그라운드에서 요약하고, 답변은 바로 돌려줍니다.
+# (요약이 아직 안 끝났으면 그 턴들은 원문으로 보내고, 끝나면 다음 턴부터 요약본을 씀)
+memory = BackgroundSummaryMemory(llm=llm, every_turns=2, min_turns=1)
+
+prompt = ChatPromptTemplate.from_messages([
+    ("system", "너는 음식 일기를 함께 써 주는 친구야."),
+    MessagesPlaceholder(variable_name="history"),
+    ("human", "{input}")
+])
+chain = prompt | llm
+
+for q in ["어제는 두바이 쿠키를 먹었고, 오늘은 마라탕을 먹었어.", "내일은 초밥을 먹을 예정이야.",
+          "모레는 떡볶이를 먹을 거야.", "이번 주에 내가 먹었거나 먹을 음식을 정리해줘."]:
+    res = chain.invoke({"input": q, "history": memory.load(q)})
+    memory.save(q, res.content)
+    print(res.content)
+
+# 메모리 안을 들여다보면 (백그라운드 요약을 기다린 뒤) 대화가 요약되어 저장된 걸 볼 수 있습니다.
+print(memory.flush())
+print(memory.stats)
+memory.close()
@@ -2,7 +2,8 @@ import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from rolling_memory import BackgroundSummaryMemory
+from vector_memory import VectorMemory
 
 load_dotenv()
 
@@ -28,19 +29,24 @@ questions = [
 "방금 추천한 곡들 중에서 3번째 곡의 가사를 네가 독서 코치 버전으로 개사해봐."
 ]
 
-history = [] # 여기에 대화가 쌓임
+# 여기에 대화가 쌓임 (최근 1턴은 원문, 그 이전 턴은 벡터 인덱스에 넣고 질문과 관련 있는 턴만 꺼내 씀)
+# → 대화가 길어져도 프롬프트에는 관련 턴 3개 + 최근 1턴만 들어감
+# 인덱스로 옮긴 턴은 3턴(또는 3000 토큰)씩 모아서 백그라운드로 요약해 둠 (답변은 기다리지 않음)
+memory = VectorMemory(k=3, recent_turns=1, summary=BackgroundSummaryMemory(every_turns=3, every_tokens=3000, min_turns=0))
 
 for q in questions:
     print(f"질문: {q}")
     # 실행
-    res = chain.invoke({"input": q, "history": history})
+    res = chain.invoke({"input": q, "history": memory.load(q)})
     print(f"답변: {res.content}")
     print("-" * 30)
     
     # 기록 저장
-    history.append(HumanMessage(content=q))
-    history.append(AIMessage(content=res.content))
+    memory.save(q, res.content)
 
 # 5. 요약 (나중에 교수님이 물어보면 "직접 요약했습니다"라고 하세요!)
-summary_res = llm.invoke(f"다음 대화 내용을 한 문장으로 요약해줘: {history}")
-print(f"\n최종 요약: {summary_res.content}")
\ No newline at end of file
+# 메시지 객체 repr 대신 텍스트를 보냄: 백그라운드에서 이미 끝난 요약 + 아직 요약 안 된 턴 + 최근 대화
+# (대화가 짧아 요약이 한 번도 안 돌았으면 전체 대화 그대로 → 원래처럼 요약 호출 1번)
+summary_res = llm.invoke(f"다음 대화 내용을 한 문장으로 요약해줘:\n{memory.transcript()}")
+print(f"\n최종 요약: {summary_res.content}")
+memory.close()
@@ -1,13 +1,13 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from model_router import ModelRouter
+from rolling_memory import RollingMemory
 
 load_dotenv()
 
-# 1. 모델 설정
-llm = ChatOpenAI(model="gpt-4o", streaming=True)
+# 1. 모델 설정 (요청 난이도에 따라 gpt-4o-mini / gpt-4o 중 선택)
+router = ModelRouter(verbose=True)
 
 # 2. 프롬프트 설정 (기억 보관함 포함)
 prompt = ChatPromptTemplate.from_messages([
@@ -17,7 +17,7 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 # 3. 체인 생성
-chain = prompt | llm
+chain = prompt | router.as_runnable()
 
 # 4. 시뮬레이션할 질문 리스트
 questions = [
@@ -25,28 +25,28 @@ questions = [
     "서울의 인구는 2025년 기준 몇 명?"
 ]
 
-# 5. 대화 기록 저장소
-history = []
+# 5. 대화 기록 저장소 (최근 대화 원문 + 1500 토큰을 넘는 이전 대화는 요약)
+memory = RollingMemory(max_tokens=1500)
 
 print("=== 📖 독서 코치 연속 대화 시뮬레이션 시작 ===\n")
 
 for q in questions:
     print(f"나: {q}")
     
-    # AI 답변 생성 (지금까지의 기록 history를 같이 보냄)
+    # AI 답변 생성 (토큰 예산 안의 기록만 같이 보냄)
     response = chain.invoke({
         "input": q,
-        "chat_history": history
+        "chat_history": memory.load(q)
     })
     
     print(f"AI: {response.content}")
     print("-" * 30)
     
     # 대화 기록 업데이트 (이게 있어야 다음 질문에서 기억을 함!)
-    history.append(HumanMessage(content=q))
-    history.append(AIMessage(content=response.content))
+    memory.save(q, response.content)
  
 print("\n=== 시뮬레이션 종료 ===")
+print(router.format_summary())
 
 # k 값 = 최근 몇 턴의 대화를 유지할지 결정
 # k=3: 최근 3턴의 대화만 유지 (사용자 질문 + AI 응답을 1턴으로 계산)
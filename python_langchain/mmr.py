@@ -0,0 +1,154 @@
+"""
+행렬 연산 기반 MMR(Maximal Marginal Relevance) 검색
+
+create_multimodal_rag_chain 은 search_type="similarity", k=5 로 검색해서
+비슷한 이미지 설명 / 겹치는 텍스트 청크가 여러 자리를 차지했다.
+MMR 은 "질문과의 관련도 - 이미 고른 문서와의 유사도" 가 큰 문서를 하나씩 골라 중복을 줄인다.
+
+구현:
+1. 후보 fetch_k 개를 벡터와 함께 가져옴 (Pinecone include_values / Chroma embeddings / vector_backends)
+2. 후보-후보 유사도는 정규화 행렬 곱 한 번 (C @ C.T)으로 계산
+3. 선택 루프는 k 번만 돌고, 매번 "이미 고른 문서와의 최대 유사도" 배열을 np.maximum 으로 갱신
+   (후보마다 파이썬 루프를 돌지 않음)
+
+사용 예시:
+    retriever = MMRRetriever(vectorstore, k=3, fetch_k=20, lambda_mult=0.5)
+    docs = retriever.as_runnable().invoke(query)
+"""
+
+import asyncio
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from vector_backends import VectorBackend, normalize
+
+
+def mmr_select(query_vector, candidate_vectors, k, lambda_mult=0.5):
+    """
+    MMR 로 후보 중 k 개 선택
+
+    Args:
+        query_vector: 질문 벡터 (dim,)
+        candidate_vectors: 후보 벡터 행렬 (n, dim)
+        k (int): 고를 개수
+        lambda_mult (float): 1 이면 관련도만, 0 이면 다양성만 고려
+
+    Returns:
+        list: 선택된 후보 인덱스 (선택 순서)
+    """
+    candidates = normalize(candidate_vectors)
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+
+    relevance = candidates @ normalize(query_vector)
+    similarity = candidates @ candidates.T  # 후보-후보 유사도 (행렬 곱 한 번)
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()  # 후보별 "고른 문서와의 최대 유사도"
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def fetch_candidates(store, vector, fetch_k, filter=None):
+    """
+    후보 문서와 벡터를 함께 가져오기
+
+    Args:
+        store: PineconeVectorStore / langchain Chroma / vector_backends.VectorBackend
+        vector: 질문 벡터
+        fetch_k (int): 후보 수
+        filter (dict): 메타데이터 필터
+
+    Returns:
+        tuple: ((Document, score) 리스트, 후보 벡터 행렬)
+    """
+    if isinstance(store, VectorBackend):
+        return store.query_with_vectors(vector, k=fetch_k, filter=filter)
+
+    if hasattr(store, "_collection"):
+        # langchain_chroma.Chroma (점수는 1 - 거리)
+        result = store._collection.query(
+            query_embeddings=[list(vector)],
+            n_results=fetch_k,
+            where=filter,
+            include=["documents", "metadatas", "distances", "embeddings"],
+        )
+        docs_and_scores = [
+            (Document(page_content=text, metadata=metadata or {}), 1.0 - distance)
+            for text, metadata, distance in zip(
+                result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+        return docs_and_scores, np.asarray(result["embeddings"][0], dtype=np.float32)
+
+    # PineconeVectorStore: include_values 로 후보 벡터까지 한 번에 받음
+    index = getattr(store, "_index", None) or store.index
+    text_key = getattr(store, "_text_key", "text")
+    response = index.query(
+        vector=list(vector),
+        top_k=fetch_k,
+        include_values=True,
+        include_metadata=True,
+        namespace=getattr(store, "_namespace", None),
+        filter=filter,
+    )
+    docs_and_scores, vectors = [], []
+    for match in response["matches"]:
+        metadata = dict(match["metadata"] or {})
+        text = metadata.pop(text_key, "")
+        docs_and_scores.append((Document(page_content=text, metadata=metadata), match["score"]))
+        vectors.append(match["values"])
+    return docs_and_scores, np.asarray(vectors, dtype=np.float32)
+
+
+class MMRRetriever:
+    """
+    fetch_k 개 후보 중 MMR 로 k 개를 고르는 검색기
+
+    Args:
+        store: PineconeVectorStore / langchain Chroma / vector_backends.VectorBackend
+        k (int): 최종 반환 문서 수
+        fetch_k (int): 후보 수
+        lambda_mult (float): 관련도 비중 (0~1)
+        embeddings: 질문 임베딩 모델 (None 이면 store.embeddings 사용)
+        filter (dict): 메타데이터 필터
+    """
+
+    def __init__(self, store, k=3, fetch_k=20, lambda_mult=0.5, embeddings=None, filter=None):
+        self.store = store
+        self.k = k
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.embeddings = embeddings or store.embeddings
+        self.filter = filter
+
+    def retrieve_with_scores(self, query):
+        """MMR 로 고른 (doc, 관련도 점수) k 개"""
+        vector = self.embeddings.embed_query(query)
+        docs_and_scores, vectors = fetch_candidates(self.store, vector, self.fetch_k, self.filter)
+        chosen = mmr_select(vector, vectors, self.k, self.lambda_mult)
+        return [docs_and_scores[i] for i in chosen]
+
+    def retrieve(self, query):
+        return [doc for doc, _ in self.retrieve_with_scores(query)]
+
+    async def aretrieve(self, query):
+        """rag_streaming.astream_rag 용 retrieve 함수 → (docs, scores)"""
+        pairs = await asyncio.get_running_loop().run_in_executor(None, self.retrieve_with_scores, query)
+        return [doc for doc, _ in pairs], [float(score) for _, score in pairs]
+
+    def as_runnable(self):
+        """retriever.invoke(query) 형태로 쓸 수 있는 Runnable"""
+        return RunnableLambda(self.retrieve)
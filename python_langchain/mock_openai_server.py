@@ -0,0 +1,387 @@
+"""
+OpenAI 호환 로컬 모의(mock) 서버 (오프라인 부하 테스트용)
+
+basic.py, chatbot4.py, ragmenu2.py, tavily_multitool_agent.py 등은 모두 OpenAI API 를 직접 호출해서
+처리량/꼬리 지연시간 실험을 하려면 사용량(비용)이 들었다.
+이 서버는 표준 라이브러리만으로 같은 형식의 응답을 돌려준다.
+
+지원 엔드포인트:
+    POST /v1/chat/completions   일반 응답, 도구 호출(tool_calls), 스트리밍(SSE, stream_options.include_usage)
+    POST /v1/embeddings         입력 문자열 해시 기반 결정적 벡터 (dimensions 지원)
+    GET  /v1/models             모델 목록
+    GET  /stats                 요청 수 / 오류 수 / 생성 토큰 수
+
+설정 가능한 항목:
+    --latency      첫 토큰까지 지연 분포   fixed:200 | uniform:100,400 | normal:300,50 | lognormal:250,0.5 | exp:200 (ms)
+    --token-rate   초당 생성 토큰 수 (스트리밍/비스트리밍 모두 생성 시간에 반영)
+    --error-rate   오류 응답 비율 (0~1), --error-codes 로 상태 코드 선택 (429 는 Retry-After 포함)
+    --hang-rate    응답 없이 --hang-sec 초 동안 붙잡는 비율 (클라이언트 타임아웃 실험)
+    --prompt-cache 앞부분이 이전 요청과 같으면 cached_tokens 로 보고 (1024 토큰 이상, 128 토큰 단위)
+
+실행 예시:
+    python mock_openai_server.py --port 8000 --latency lognormal:300,0.6 --token-rate 60 --error-rate 0.02
+
+스크립트를 모의 서버로 향하게 하기 (코드 수정 없음):
+    export OPENAI_BASE_URL=http://127.0.0.1:8000/v1     # openai 클라이언트
+    export OPENAI_API_BASE=http://127.0.0.1:8000/v1     # langchain_openai (ChatOpenAI / OpenAIEmbeddings)
+    export OPENAI_API_KEY=mock
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELS = ["gpt-4o-mini", "gpt-4o", "text-embedding-3-small", "text-embedding-3-large"]
+CACHE_MIN_TOKENS = 1024  # OpenAI 프롬프트 캐시 최소 길이
+CACHE_BLOCK_TOKENS = 128  # 캐시 단위
+EMBEDDING_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+FILLER_WORDS = ["모의", "응답", "입니다.", "요청하신", "내용에", "대한", "테스트", "답변", "mock", "response"]
+
+
+# =================================================================
+# 지연시간 분포 / 토큰 계산
+# =================================================================
+def parse_distribution(spec):
+    """
+    'lognormal:250,0.5' 같은 문자열 → 밀리초 샘플 함수
+
+    - fixed:ms
+    - uniform:min,max
+    - normal:mean,std          (0 미만은 0)
+    - lognormal:median,sigma   (꼬리가 긴 실제 API 지연과 비슷)
+    - exp:mean
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1.0 / values[0])
+    raise ValueError(f"알 수 없는 분포: {spec}")
+
+
+def approx_tokens(text):
+    """토큰 수 근사 (tiktoken 없이 오프라인에서 동작하도록 약 4글자 = 1토큰)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def message_text(messages):
+    """메시지 리스트의 텍스트 내용을 하나로 합침 (멀티모달 content 리스트 포함)"""
+    parts = []
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def fake_completion(prompt, n_tokens):
+    """프롬프트 해시로 정해지는 결정적 가짜 답변 단어 리스트 (같은 요청 → 같은 답변)"""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    return [rng.choice(FILLER_WORDS) + " " for _ in range(n_tokens)]
+
+
+def fake_embedding(text, dimensions):
+    """입력 문자열 해시로 만든 결정적 단위 벡터"""
+    values, counter = [], 0
+    while len(values) < dimensions:
+        digest = hashlib.sha256(f"{counter}:{text}".encode("utf-8")).digest()
+        values.extend(v / 2**31 - 1.0 for v in struct.unpack("<8I", digest))
+        counter += 1
+    values = values[:dimensions]
+    norm = math.sqrt(sum(v * v for v in values)) or 1.0
+    return [v / norm for v in values]
+
+
+def fake_arguments(schema):
+    """도구 parameters 스키마의 필수 인자를 채운 가짜 인자"""
+    arguments = {}
+    properties = schema.get("properties", {})
+    for name in schema.get("required", list(properties)):
+        kind = properties.get(name, {}).get("type", "string")
+        arguments[name] = {"integer": 1, "number": 1.0, "boolean": True, "array": [], "object": {}}.get(kind, "mock")
+    return arguments
+
+
+# =================================================================
+# 서버
+# =================================================================
+class MockConfig:
+    """명령행 설정 + 통계 (모든 요청 스레드가 공유)"""
+
+    def __init__(self, args):
+        self.latency = parse_distribution(args.latency)
+        self.embedding_latency = parse_distribution(args.embedding_latency)
+        self.token_rate = args.token_rate
+        self.completion_tokens = args.completion_tokens
+        self.error_rate = args.error_rate
+        self.error_codes = [int(code) for code in args.error_codes.split(",")]
+        self.hang_rate = args.hang_rate
+        self.hang_sec = args.hang_sec
+        self.prompt_cache = args.prompt_cache
+        self.prefixes = OrderedDict()  # 본 적 있는 앞부분 해시 (LRU)
+        self.stats = {"requests": 0, "errors": 0, "hangs": 0, "streams": 0, "tool_calls": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "embeddings": 0}
+        self._lock = threading.Lock()
+
+    def cached_prefix_tokens(self, text, max_prefixes=100000):
+        """text 앞부분 중 이전 요청에서 본 가장 긴 블록 단위 길이(토큰), 이번 앞부분들도 등록"""
+        if not self.prompt_cache:
+            return 0
+        block = CACHE_BLOCK_TOKENS * 4  # approx_tokens 와 같은 4글자 = 1토큰 기준
+        cached, digest = 0, hashlib.sha1(text[:CACHE_MIN_TOKENS * 4 - block].encode("utf-8"))
+        with self._lock:
+            for end in range(CACHE_MIN_TOKENS * 4, len(text) + 1, block):
+                digest.update(text[end - block:end].encode("utf-8"))
+                key = digest.copy().digest()
+                if key in self.prefixes:
+                    self.prefixes.move_to_end(key)
+                    cached = end // 4
+                else:
+                    self.prefixes[key] = True
+            while len(self.prefixes) > max_prefixes:
+                self.prefixes.popitem(last=False)
+        return cached
+
+    def count(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self.stats[key] += value
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # main() 에서 MockConfig 지정
+
+    def log_message(self, format, *args):
+        pass  # 부하 테스트 중 콘솔 출력 비용 제거
+
+    # ---------- 공통 ----------
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def inject_failure(self):
+        """설정된 비율로 오류 응답 / 응답 지연(hang) 주입, 주입했으면 True"""
+        config = self.config
+        if random.random() < config.hang_rate:
+            config.count(hangs=1)
+            time.sleep(config.hang_sec)
+        if random.random() < config.error_rate:
+            status = random.choice(config.error_codes)
+            config.count(errors=1)
+            headers = {"Retry-After": "1"} if status == 429 else None
+            self.send_json(status, {"error": {"message": f"모의 오류 ({status})", "type": "mock_error",
+                                              "code": str(status)}}, headers)
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self.send_json(200, {"object": "list", "data": [
+                {"id": model, "object": "model", "created": 0, "owned_by": "mock"} for model in MODELS
+            ]})
+        elif self.path.rstrip("/") == "/stats":
+            self.send_json(200, self.config.stats)
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        self.config.count(requests=1)
+        if self.inject_failure():
+            return
+
+        path = self.path.rstrip("/")
+        if path == "/v1/chat/completions":
+            self.chat_completions(body)
+        elif path == "/v1/embeddings":
+            self.embeddings(body)
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    # ---------- 임베딩 ----------
+    def embeddings(self, body):
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        model = body.get("model", "text-embedding-3-small")
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS.get(model, 1536)
+
+        time.sleep(self.config.embedding_latency() / 1000)
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        prompt_tokens = sum(approx_tokens(text) for text in texts)
+        self.config.count(embeddings=len(texts), prompt_tokens=prompt_tokens)
+        self.send_json(200, {
+            "object": "list",
+            "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text, dimensions)}
+                     for i, text in enumerate(texts)],
+            "model": model,
+            "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+        })
+
+    # ---------- 채팅 ----------
+    def pick_tool(self, body):
+        """도구 호출로 답할지 결정 (도구가 있고 마지막 메시지가 도구 결과가 아니면 호출)"""
+        tools = body.get("tools") or []
+        messages = body.get("messages", [])
+        choice = body.get("tool_choice", "auto")
+        if not tools or choice == "none" or (messages and messages[-1].get("role") == "tool"):
+            return None
+        if isinstance(choice, dict):
+            name = choice.get("function", {}).get("name")
+            return next((t for t in tools if t["function"]["name"] == name), tools[0])
+        return tools[0]
+
+    def chat_completions(self, body):
+        config = self.config
+        model = body.get("model", "gpt-4o-mini")
+        prompt = message_text(body.get("messages", []))
+        prompt_tokens = approx_tokens(prompt)
+        n_tokens = min(body.get("max_completion_tokens") or body.get("max_tokens") or config.completion_tokens,
+                       config.completion_tokens)
+        tool = self.pick_tool(body)
+        words = [] if tool else fake_completion(prompt, n_tokens)
+        tool_call = None
+        if tool:
+            arguments = json.dumps(fake_arguments(tool["function"].get("parameters", {})), ensure_ascii=False)
+            tool_call = {"id": f"call_{uuid.uuid4().hex[:24]}", "type": "function",
+                         "function": {"name": tool["function"]["name"], "arguments": arguments}}
+            config.count(tool_calls=1)
+            n_tokens = approx_tokens(arguments)
+
+        # 도구 스키마 → 메시지 순서로 앞부분 비교 (실제 API 의 캐시 키 순서와 같음)
+        serialized = json.dumps(body.get("tools") or [], ensure_ascii=False) + json.dumps(
+            body.get("messages", []), ensure_ascii=False)
+        cached = min(config.cached_prefix_tokens(serialized), prompt_tokens)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens,
+                 "total_tokens": prompt_tokens + n_tokens,
+                 "prompt_tokens_details": {"cached_tokens": cached}}
+        config.count(prompt_tokens=prompt_tokens, completion_tokens=n_tokens, cached_tokens=cached)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        finish_reason = "tool_calls" if tool else "stop"
+
+        time.sleep(config.latency() / 1000)  # 첫 토큰까지 지연 (TTFT)
+        if body.get("stream"):
+            config.count(streams=1)
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self.stream_chat(completion_id, model, words, tool_call, finish_reason, usage if include_usage else None)
+            return
+
+        time.sleep(n_tokens / config.token_rate)  # 생성 시간
+        message = {"role": "assistant", "content": None if tool else "".join(words).strip()}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        self.send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": usage,
+        })
+
+    def stream_chat(self, completion_id, model, words, tool_call, finish_reason, usage):
+        """SSE 로 토큰 조각을 token_rate 속도로 전송"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        created = int(time.time())
+
+        def send(delta=None, finish=None, chunk_usage=None, choices=True):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta or {}, "finish_reason": finish, "logprobs": None}]
+                     if choices else []}
+            if chunk_usage is not None:
+                chunk["usage"] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        interval = 1.0 / self.config.token_rate
+        try:
+            send({"role": "assistant", "content": "" if not tool_call else None})
+            if tool_call:
+                send({"tool_calls": [{"index": 0, "id": tool_call["id"], "type": "function",
+                                      "function": {"name": tool_call["function"]["name"], "arguments": ""}}]})
+                arguments = tool_call["function"]["arguments"]
+                for start in range(0, len(arguments), 8):
+                    time.sleep(interval)
+                    send({"tool_calls": [{"index": 0, "function": {"arguments": arguments[start:start + 8]}}]})
+            else:
+                for word in words:
+                    time.sleep(interval)
+                    send({"content": word})
+            send(finish=finish_reason)
+            if usage is not None:
+                send(chunk_usage=usage, choices=False)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 클라이언트가 스트림을 끊음
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 호환 로컬 모의 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="lognormal:300,0.5", help="채팅 첫 토큰 지연 분포 (ms)")
+    parser.add_argument("--embedding-latency", default="lognormal:80,0.4", help="임베딩 지연 분포 (ms)")
+    parser.add_argument("--token-rate", type=float, default=80.0, help="초당 생성 토큰 수")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="응답 토큰 수 (max_tokens 가 더 작으면 그 값)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="오류 응답 비율 (0~1)")
+    parser.add_argument("--error-codes", default="429,500,503", help="주입할 HTTP 상태 코드")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="응답을 붙잡아 둘 비율 (0~1)")
+    parser.add_argument("--hang-sec", type=float, default=30.0, help="붙잡아 두는 시간 (초)")
+    parser.add_argument("--prompt-cache", action="store_true", help="프롬프트 앞부분 캐시 흉내 (cached_tokens 보고)")
+    parser.add_argument("--seed", type=int, default=None, help="난수 시드 (지연/오류 재현용)")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    MockHandler.config = MockConfig(args)
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+
+    print(f"✓ 모의 OpenAI 서버 시작: http://{args.host}:{args.port}/v1")
+    print(f"  지연 {args.latency} / 토큰 {args.token_rate}/s / 오류 {args.error_rate:.0%} / hang {args.hang_rate:.0%}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n종료. 통계: {json.dumps(MockHandler.config.stats, ensure_ascii=False)}")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
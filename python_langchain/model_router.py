@@ -0,0 +1,264 @@
+"""
+요청 난이도 기반 모델 라우터 (저가 모델 ↔ 고성능 모델)
+
+스크립트마다 모델을 고정해 두어서 (memory3.py/langchain2.py 는 gpt-4o,
+memory1.py/news.py 는 gpt-3.5-turbo, 나머지는 gpt-4o-mini)
+한 문장 설명 같은 쉬운 요청도 비싼 모델로 가고, 모델 이름을 바꾸려면 파일을 하나씩 고쳐야 했다.
+
+여기서는 요청마다
+1. 프롬프트 길이 / 도구 사용 여부 / 질문 키워드(가벼운 규칙 분류기)로 난이도 점수를 매기고
+2. 점수가 기준 미만이면 저가 모델, 이상이면 고성능 모델을 쓰고
+3. 저가 모델 답변의 토큰 확률(logprobs)이 낮으면 (자신 없는 답변) 고성능 모델로 다시 호출한다.
+모든 라우팅 결정과 등급별 지연시간 / 토큰 / 예상 비용을 기록한다.
+
+사용 예시:
+    router = ModelRouter(temperature=0.7)
+    chain = prompt | router.as_runnable()
+    response = chain.invoke({...})
+    print(router.format_summary())
+"""
+
+import math
+import re
+import threading
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+from context_packer import count_tokens
+from singleflight import to_messages
+
+# 등급 순서대로 (싼 것 → 비싼 것), 가격은 100만 토큰당 달러
+DEFAULT_TIERS = [
+    {"name": "cheap", "model": "gpt-4o-mini", "input_price": 0.15, "output_price": 0.60},
+    {"name": "strong", "model": "gpt-4o", "input_price": 2.50, "output_price": 10.00},
+]
+
+# 추론 / 다단계 작업을 암시하는 표현 (가중치)
+COMPLEX_PATTERNS = [
+    (r"비교|차이점|장단점|compare|versus|\bvs\b", 0.25),
+    (r"분석|평가|검토|analy[sz]e|evaluate", 0.2),
+    (r"왜|이유|원인|근거|why", 0.15),
+    (r"계산|몇 퍼센트|비율|증가율|calculate|percent", 0.2),
+    (r"설계|아키텍처|전략|계획|design|strategy", 0.2),
+    (r"단계(별|적)|순서대로|step by step", 0.15),
+    (r"코드|구현|디버그|에러|오류|code|implement|debug", 0.2),
+    (r"증명|추론|논리|prove|reason", 0.25),
+]
+# 짧은 조회성 질문 (점수 깎기)
+SIMPLE_PATTERNS = [
+    (r"한 문장|간단히|짧게|요약|뜻이 뭐|무엇이었지|뭐였지|뭐라고 했지|briefly|summar", 0.15),
+    (r"^(안녕|고마워|감사|ㅎㅎ|ㅋㅋ|hi|hello|thanks)", 0.3),
+]
+
+
+def classify_complexity(text):
+    """
+    질문 하나의 난이도 점수 (0 ~ 1) 와 근거
+
+    Args:
+        text (str): 사용자 질문
+
+    Returns:
+        (float, list): (점수, 적용된 규칙 목록)
+    """
+    lowered = text.lower()
+    score, reasons = 0.0, []
+    for pattern, weight in COMPLEX_PATTERNS:
+        match = re.search(pattern, lowered)
+        if match:
+            score += weight
+            reasons.append(f"+{match.group(0)}")
+    for pattern, weight in SIMPLE_PATTERNS:
+        match = re.search(pattern, lowered)
+        if match:
+            score -= weight
+            reasons.append(f"-{match.group(0)}")
+
+    # 질문이 여러 개 / 조건이 많으면 다단계 작업일 가능성
+    clauses = len(re.findall(r"[?？]|그리고|그 다음|하고 나서|, 그리고", text))
+    if clauses >= 2:
+        score += 0.1 * min(clauses - 1, 3)
+        reasons.append(f"+clauses={clauses}")
+    return min(max(score, 0.0), 1.0), reasons
+
+
+def message_text(message):
+    """메시지 content (문자열 / 멀티모달 리스트) → 텍스트"""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+def answer_confidence(message):
+    """
+    응답 토큰 logprob 평균을 확률로 바꾼 값 (0 ~ 1)
+
+    logprobs 가 없으면 (스트리밍, 도구 호출만 있는 응답 등) None
+    """
+    logprobs = (getattr(message, "response_metadata", None) or {}).get("logprobs") or {}
+    values = [token["logprob"] for token in logprobs.get("content") or [] if token.get("logprob") is not None]
+    if not values:
+        return None
+    return math.exp(sum(values) / len(values))
+
+
+class ModelRouter:
+    """
+    요청마다 충분한 가장 싼 모델을 고르고, 자신 없는 답변은 상위 모델로 올리는 라우터
+
+    Args:
+        tiers (list): [{'name', 'model', 'input_price', 'output_price'}] 싼 순서
+        threshold (float): 이 점수 이상이면 고성능 모델로 바로 보냄
+        min_confidence (float): 저가 모델 답변 확신도가 이보다 낮으면 상위 모델로 재호출
+        long_prompt_tokens (int): 프롬프트가 이보다 길면 난이도 가산
+        tools (list): 바인딩할 도구 (도구가 많을수록 난이도 가산)
+        verbose (bool): 라우팅 결정을 출력
+        **llm_kwargs: 모든 등급 ChatOpenAI 에 넘길 인자 (temperature 등)
+    """
+
+    def __init__(self, tiers=None, threshold=0.4, min_confidence=0.55, long_prompt_tokens=3000,
+                 tools=None, verbose=False, max_records=1000, **llm_kwargs):
+        self.tiers = tiers or DEFAULT_TIERS
+        self.threshold = threshold
+        self.min_confidence = min_confidence
+        self.long_prompt_tokens = long_prompt_tokens
+        self.tools = tools or []
+        self.verbose = verbose
+        self.max_records = max_records
+        self.llm_kwargs = llm_kwargs
+        self.records = []
+        self._llms = {}
+        self._lock = threading.Lock()
+
+    def bind_tools(self, tools):
+        """같은 설정에 도구만 바인딩한 새 라우터 (기록은 공유)"""
+        router = ModelRouter(self.tiers, self.threshold, self.min_confidence, self.long_prompt_tokens,
+                             tools, self.verbose, self.max_records, **self.llm_kwargs)
+        router.records, router._lock = self.records, self._lock
+        return router
+
+    def get_llm(self, index):
+        """등급별 모델 (처음 쓸 때 한 번만 생성)"""
+        if index not in self._llms:
+            from langchain_openai import ChatOpenAI
+
+            kwargs = dict(self.llm_kwargs)
+            # 최상위 등급이 아니면 확신도 측정을 위해 logprobs 요청
+            if index < len(self.tiers) - 1:
+                kwargs.setdefault("logprobs", True)
+            llm = ChatOpenAI(model=self.tiers[index]["model"], **kwargs)
+            self._llms[index] = llm.bind_tools(self.tools) if self.tools else llm
+        return self._llms[index]
+
+    def route(self, messages):
+        """
+        메시지 목록 → 라우팅 결정
+
+        Returns:
+            dict: {'tier', 'score', 'reasons', 'prompt_tokens'} (tier 는 등급 인덱스)
+        """
+        prompt_tokens = sum(count_tokens(message_text(m)) for m in messages)
+        question = next((message_text(m) for m in reversed(messages) if m.type == "human"), "")
+
+        score, reasons = classify_complexity(question)
+        if prompt_tokens > self.long_prompt_tokens:
+            score += 0.2
+            reasons.append(f"+prompt_tokens={prompt_tokens}")
+        if self.tools:
+            score += 0.1 * min(len(self.tools), 3)
+            reasons.append(f"+tools={len(self.tools)}")
+
+        tier = len(self.tiers) - 1 if score >= self.threshold else 0
+        return {"tier": tier, "score": round(score, 3), "reasons": reasons, "prompt_tokens": prompt_tokens}
+
+    def invoke(self, value, config=None):
+        """
+        라우팅 후 호출, 저가 모델 답변 확신도가 낮으면 한 등급씩 올려 재호출
+
+        Args:
+            value: PromptValue / 문자열 / 메시지 리스트
+
+        Returns:
+            AIMessage: 마지막으로 채택된 응답
+        """
+        messages = to_messages(value)
+        decision = self.route(messages)
+        tier = decision["tier"]
+        escalated_from = None
+
+        while True:
+            started = time.perf_counter()
+            response = self.get_llm(tier).invoke(messages, config=config)
+            latency = time.perf_counter() - started
+            confidence = answer_confidence(response)
+            self._record(decision, tier, response, latency, confidence, escalated_from)
+
+            low = confidence is not None and confidence < self.min_confidence
+            if not low or tier >= len(self.tiers) - 1:
+                return response
+            escalated_from, tier = tier, tier + 1
+
+    def as_runnable(self):
+        """prompt | router.as_runnable() 로 쓸 수 있는 Runnable"""
+        return RunnableLambda(self.invoke)
+
+    def _record(self, decision, tier, response, latency, confidence, escalated_from):
+        spec = self.tiers[tier]
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        record = {
+            "tier": spec["name"],
+            "model": spec["model"],
+            "score": decision["score"],
+            "reasons": decision["reasons"],
+            "prompt_tokens": decision["prompt_tokens"],
+            "escalated_from": self.tiers[escalated_from]["name"] if escalated_from is not None else None,
+            "confidence": round(confidence, 3) if confidence is not None else None,
+            "latency": latency,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": (input_tokens * spec["input_price"] + output_tokens * spec["output_price"]) / 1_000_000,
+        }
+        with self._lock:
+            self.records.append(record)
+            del self.records[:-self.max_records]
+
+        if self.verbose:
+            via = f" (← {record['escalated_from']} 확신도 낮음)" if record["escalated_from"] else ""
+            conf = f", 확신도 {record['confidence']}" if record["confidence"] is not None else ""
+            print(f"  [router] {record['tier']}={record['model']}{via} · 점수 {record['score']} "
+                  f"{record['reasons']} · {latency:.2f}s{conf}")
+
+    def summary(self):
+        """등급별 호출 수, 평균 지연시간, 토큰, 예상 비용 + 재호출(escalation) 수"""
+        with self._lock:
+            records = list(self.records)
+        tiers = {}
+        for spec in self.tiers:
+            rows = [r for r in records if r["tier"] == spec["name"]]
+            tiers[spec["name"]] = {
+                "model": spec["model"],
+                "calls": len(rows),
+                "avg_latency": sum(r["latency"] for r in rows) / len(rows) if rows else 0.0,
+                "input_tokens": sum(r["input_tokens"] for r in rows),
+                "output_tokens": sum(r["output_tokens"] for r in rows),
+                "cost": sum(r["cost"] for r in rows),
+            }
+        return {
+            "calls": len(records),
+            "escalations": sum(1 for r in records if r["escalated_from"]),
+            "cost": sum(r["cost"] for r in records),
+            "tiers": tiers,
+        }
+
+    def format_summary(self):
+        """한 줄 요약 문자열"""
+        s = self.summary()
+        parts = [f"{name}({t['model']}) {t['calls']}회 평균 {t['avg_latency']:.2f}s"
+                 for name, t in s["tiers"].items()]
+        return (f"모델 라우팅: {' · '.join(parts)} · 재호출 {s['escalations']}회 · "
+                f"예상 비용 ${s['cost']:.5f}")
+
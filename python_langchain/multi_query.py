@@ -0,0 +1,137 @@
+"""
+병렬 다중 질의 검색 + RRF(Reciprocal Rank Fusion) 융합
+
+"메뉴에 대한 모든 정보를 알려주세요" 같은 넓은 질문은 임베딩 하나로 5개 청크만 가져와서
+메뉴 대부분이 빠졌다. 여기서는
+
+1. 원래 질문으로 검색을 바로 시작하고, 동시에 하위 질문을 만듦
+   - LLM 생성 (llm_subquery_generator) 또는 고정 관점 덧붙이기 (facet_subquery_generator)
+2. 하위 질문 검색을 스레드 풀에서 동시에 실행 (직렬 검색 지연 없음)
+3. 각 결과 목록의 순위로 RRF 점수 Σ 1 / (rrf_k + rank) 를 계산해 합치고,
+   같은 내용의 청크는 한 번만 남긴 뒤 패킹 단계로 넘김
+
+사용 예시:
+    retriever = MultiQueryRetriever(search, llm_subquery_generator(llm, n=3), max_docs=10)
+    docs = retriever.retrieve(query)
+"""
+
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="multi-query")
+# 줄 앞의 목록 표시만 제거 ("1. ", "2) ", "- ", "• "), 검색어 안의 숫자는 유지 ("2만원 이하 와인")
+_bullet_re = re.compile(r"^\s*(?:\d+[.)]|[-•*])\s*")
+
+SUBQUERY_TEMPLATE = """다음 질문에 답하려면 어떤 정보를 찾아야 하는지 생각해서,
+서로 다른 관점의 검색어를 {n}개 만들어 주세요.
+한 줄에 검색어 하나씩, 번호나 설명 없이 검색어만 쓰세요.
+
+질문: {question}"""
+
+
+# =================================================================
+# 하위 질문 생성
+# =================================================================
+def llm_subquery_generator(llm, n=3):
+    """LLM 으로 하위 질문 n 개를 만드는 함수 (query → list)"""
+    chain = (ChatPromptTemplate.from_template(SUBQUERY_TEMPLATE) | llm | StrOutputParser()).with_config(metadata={"step": "subquery"})
+
+    def generate(query):
+        lines = (_bullet_re.sub("", line).strip() for line in chain.invoke({"question": query, "n": n}).splitlines())
+        return [line for line in lines if line][:n]
+
+    return generate
+
+
+def facet_subquery_generator(facets):
+    """LLM 없이 고정 관점을 덧붙여 하위 질문을 만드는 함수 (예: ['가격', '재료', '와인'])"""
+    return lambda query: [f"{query} {facet}" for facet in facets]
+
+
+# =================================================================
+# 융합
+# =================================================================
+def rrf_fuse(result_lists, rrf_k=60, max_docs=None):
+    """
+    여러 검색 결과를 RRF 로 합치고 같은 내용의 청크는 한 번만 남김
+
+    Args:
+        result_lists (list): [(doc, score)] 리스트들 (각각 관련도 순)
+        rrf_k (int): 순위 완화 상수 (클수록 하위 순위 영향이 커짐)
+        max_docs (int): 최대 반환 문서 수
+
+    Returns:
+        list: (doc, RRF 점수) 리스트, 점수 내림차순
+    """
+    fused, docs = {}, {}
+    for results in result_lists:
+        seen = set()
+        for rank, (doc, _) in enumerate(results, 1):
+            key = doc.page_content
+            if key in seen:
+                continue  # 한 목록 안의 중복은 첫 순위만
+            seen.add(key)
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+
+    order = sorted(fused, key=fused.get, reverse=True)[:max_docs]
+    return [(docs[key], fused[key]) for key in order]
+
+
+# =================================================================
+# 다중 질의 검색기
+# =================================================================
+class MultiQueryRetriever:
+    """
+    원래 질문 + 하위 질문을 동시에 검색해서 RRF 로 합치는 검색기
+
+    Args:
+        search: (query, k) → [(doc, score)] 검색 함수
+        generator: query → 하위 질문 리스트
+        k_per_query (int): 질문 하나당 검색 문서 수
+        max_docs (int): 합친 뒤 최대 문서 수
+        rrf_k (int): RRF 상수
+    """
+
+    def __init__(self, search, generator, k_per_query=5, max_docs=10, rrf_k=60):
+        self.search = search
+        self.generator = generator
+        self.k_per_query = k_per_query
+        self.max_docs = max_docs
+        self.rrf_k = rrf_k
+        self.stats = {"queries": 0, "subqueries": 0, "generator_errors": 0}
+
+    def retrieve_with_scores(self, query):
+        """(doc, RRF 점수) 최대 max_docs 개"""
+        # 원래 질문 검색은 하위 질문 생성을 기다리지 않고 바로 시작
+        futures = [_pool.submit(self.search, query, self.k_per_query)]
+        try:
+            subqueries = self.generator(query)
+        except Exception:
+            # 하위 질문 생성 실패 시 원래 질문 결과만 사용
+            self.stats["generator_errors"] += 1
+            subqueries = []
+
+        unique = list(dict.fromkeys(q for q in subqueries if q and q != query))
+        futures += [_pool.submit(self.search, q, self.k_per_query) for q in unique]
+        self.stats["queries"] += 1
+        self.stats["subqueries"] += len(unique)
+
+        return rrf_fuse([future.result() for future in futures], self.rrf_k, self.max_docs)
+
+    def retrieve(self, query):
+        return [doc for doc, _ in self.retrieve_with_scores(query)]
+
+    async def aretrieve(self, query):
+        """rag_streaming.astream_rag 용 retrieve 함수 → (docs, scores)"""
+        pairs = await asyncio.get_running_loop().run_in_executor(None, self.retrieve_with_scores, query)
+        return [doc for doc, _ in pairs], [score for _, score in pairs]
+
+    def as_runnable(self):
+        """retriever.invoke(query) 형태로 쓸 수 있는 Runnable"""
+        return RunnableLambda(self.retrieve)
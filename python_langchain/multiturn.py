@@ -1,13 +1,13 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from model_router import ModelRouter
+from rolling_memory import RollingMemory
 
 load_dotenv()
 
-# 1. 모델 설정
-llm = ChatOpenAI(model="gpt-4.0", temperature=0.8)
+# 1. 모델 설정 (요청 난이도에 따라 gpt-4o-mini / gpt-4o 중 선택, 자신 없는 답변은 gpt-4o 로 재호출)
+router = ModelRouter(temperature=0.8, verbose=True)
 
 # 2. 멀티턴용 프롬프트 설정 (MessagesPlaceholder가 핵심!)
 prompt = ChatPromptTemplate.from_messages([
@@ -17,28 +17,28 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 # 3. 체인 생성
-chain = prompt | llm   
+chain = prompt | router.as_runnable()
 
 # 4. 대화 기록을 담을 바구니 (메모리)
-history = []
+# 최근 대화는 원문, 2000 토큰을 넘는 오래된 대화는 요약으로 접어서 프롬프트 길이를 고정
+memory = RollingMemory(max_tokens=2000)
 
 print("=== 👨‍🍳 셰프와의 1:1 대화 (종료하려면 'exit' 입력) ===")
 
 while True:
     user_input = input("나: ")
     if user_input.lower() == 'exit':
+        print(router.format_summary())
         break
 
     # AI의 답변 생성 (기존 대화 기록인 history를 함께 전달)
     response = chain.invoke({
         "input": user_input,
-        "chat_history": history
+        "chat_history": memory.load(user_input)  # 호출 직전에 토큰 예산 확인
     })
 
     print(f"셰프: {response.content}")
 
     # 5. 대화 기록 업데이트 (나의 질문과 AI의 답변을 저장)
-    history.append(HumanMessage(content=user_input))
-    history.append(AIMessage(content=response.content))
-
-    # (선택) 기록이 너무 길어지면 앞부분을 자르기도 하지만, 일단은 다 저장합니다!
\ No newline at end of file
+    # 예산을 넘으면 다음 load() 때 오래된 턴부터 요약에 합쳐짐
+    memory.save(user_input, response.content)
\ No newline at end of file
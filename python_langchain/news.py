@@ -1,6 +1,6 @@
 import requests
 from bs4 import BeautifulSoup
-from langchain_openai import ChatOpenAI
+from model_router import ModelRouter
 from langchain_core.prompts import ChatPromptTemplate
 from dotenv import load_dotenv
 
@@ -24,8 +24,8 @@ def get_naver_news(query):
     
     return "\n".join(results)
 
-# 1. 모델 설정
-llm = ChatOpenAI(model="gpt-3.5-turbo")
+# 1. 모델 설정 (뉴스 목록 길이 / 질문 난이도에 따라 gpt-4o-mini / gpt-4o 중 선택)
+router = ModelRouter()
 
 # 2. 템플릿 설정
 template = ChatPromptTemplate.from_messages([
@@ -42,13 +42,14 @@ news_data = get_naver_news(keyword)
 
 if news_data:
     # 4. GPT에게 요약 시키기
-    chain = template | llm
+    chain = template | router.as_runnable()
     response = chain.invoke({"keyword": keyword, "news_list": news_data})
     
     print("\n" + "="*50)
     print(response.content)
     print("\n🔗 참고한 뉴스 출처:")
     print(news_data)
+    print(router.format_summary())
     print("="*50)
 else:
     print("❌ 뉴스를 가져오지 못했습니다.")
\ No newline at end of file
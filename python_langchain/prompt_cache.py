@@ -0,0 +1,118 @@
+"""
+프롬프트 캐시 친화적인 프롬프트 배치 + 캐시 적중 기록
+
+OpenAI 는 요청 앞부분(1024 토큰 이상)이 이전 요청과 완전히 같으면 그 부분을 캐시해서
+지연시간과 입력 토큰 비용을 줄여 준다 (응답 usage 의 prompt_tokens_details.cached_tokens).
+ragChat.py 는 매 요청 달라지는 {context} 를 시스템 메시지 안에 넣어서
+바로 첫 메시지부터 내용이 달라져 캐시가 한 번도 맞지 않았다.
+
+1. stable_prefix_prompt: 고정 부분(시스템 지시문, 도구 스키마) → 대화 기록(뒤에만 추가됨)
+   → 요청마다 바뀌는 내용(검색 문맥, 현재 질문) 순서로 프롬프트 구성
+2. PromptCacheHandler: LLM 호출마다 입력 토큰 중 캐시된/안 된 토큰 수를 기록하는 콜백
+
+사용 예시:
+    cache_stats = PromptCacheHandler()
+    llm = ChatOpenAI(model="gpt-4o-mini", callbacks=[cache_stats], stream_usage=True)
+    ...
+    print(cache_stats.summary())
+"""
+
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+
+def stable_prefix_prompt(system, history_key=None, context=None, human=None):
+    """
+    캐시 가능한 앞부분이 유지되도록 메시지 순서를 고정한 프롬프트
+
+    Args:
+        system (str): 고정 시스템 지시문 (변수 없이 작성)
+        history_key (str): 대화 기록 MessagesPlaceholder 변수 이름
+        context (str): 요청마다 바뀌는 문맥 메시지 템플릿 (예: "참고 문서:\\n{context}")
+        human (str): 현재 사용자 입력 템플릿 (예: "{question}")
+
+    Returns:
+        ChatPromptTemplate: [system] + [history] + [context] + [human]
+    """
+    messages = [("system", system.replace("{", "{{").replace("}", "}}"))]
+    if history_key:
+        messages.append(MessagesPlaceholder(variable_name=history_key))
+    if context:
+        messages.append(("system", context))
+    if human:
+        messages.append(("human", human))
+    return ChatPromptTemplate.from_messages(messages)
+
+
+def cached_tokens(message, llm_output=None):
+    """AIMessage / llm_output 에서 (입력 토큰, 캐시된 입력 토큰) 꺼내기"""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        details = usage.get("input_token_details") or {}
+        return usage.get("input_tokens", 0), details.get("cache_read", 0) or 0
+
+    token_usage = (llm_output or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or {}
+    return token_usage.get("prompt_tokens", 0), details.get("cached_tokens", 0) or 0
+
+
+class PromptCacheHandler(BaseCallbackHandler):
+    """
+    LLM 호출별 캐시 적중 입력 토큰 기록
+
+    records: {'name', 'prompt_tokens', 'cached_tokens', 'uncached_tokens', 'latency'} 리스트
+    (스트리밍 호출은 ChatOpenAI(stream_usage=True) 여야 usage 가 들어옴)
+    """
+
+    def __init__(self, max_records=1000):
+        self.max_records = max_records
+        self.records = []
+        self._starts = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, metadata=None, **kwargs):
+        self._starts[run_id] = (time.perf_counter(), (metadata or {}).get("ls_model_name") or
+                                (serialized or {}).get("name", "llm"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, name = self._starts.pop(run_id, (None, "llm"))
+        for generations in response.generations:
+            for generation in generations:
+                prompt, cached = cached_tokens(getattr(generation, "message", None), response.llm_output)
+                record = {
+                    "name": name,
+                    "prompt_tokens": prompt,
+                    "cached_tokens": cached,
+                    "uncached_tokens": prompt - cached,
+                    "latency": time.perf_counter() - started if started else None,
+                }
+                with self._lock:
+                    self.records.append(record)
+                    del self.records[:-self.max_records]
+                break  # 후보가 여러 개여도 입력 토큰은 한 번만
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._starts.pop(run_id, None)
+
+    def summary(self):
+        """전체 호출 수, 입력 토큰, 캐시 적중 토큰 비율, 캐시 적중 호출 비율"""
+        with self._lock:
+            records = list(self.records)
+        prompt = sum(r["prompt_tokens"] for r in records)
+        cached = sum(r["cached_tokens"] for r in records)
+        return {
+            "calls": len(records),
+            "prompt_tokens": prompt,
+            "cached_tokens": cached,
+            "cached_ratio": cached / prompt if prompt else 0.0,
+            "calls_with_cache_hit": sum(1 for r in records if r["cached_tokens"]),
+        }
+
+    def format_summary(self):
+        """한 줄 요약 문자열"""
+        s = self.summary()
+        return (f"LLM 호출 {s['calls']}회 · 입력 {s['prompt_tokens']} 토큰 중 캐시 {s['cached_tokens']} "
+                f"({s['cached_ratio']:.0%}) · 캐시 적중 호출 {s['calls_with_cache_hit']}회")
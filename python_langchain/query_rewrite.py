@@ -0,0 +1,192 @@
+"""
+질문 보정(rewrite) 게이트 + 메모이제이션
+
+ragChat.py 는 매 턴마다 q_augment_chain 으로 LLM 을 한 번 더 호출한 뒤 검색했다.
+하지만 첫 질문(대화 기록 없음)이나 이미 완결된 질문은 보정할 필요가 없다.
+
+1. 게이트: 값싼 규칙으로 보정이 필요한지 판단
+   - 대화 기록이 없으면 → 보정 안 함
+   - 지시어/대명사(그거, 거기, 아까, it, that ...)가 있으면 → 보정
+   - 너무 짧거나 "뉴욕은?" 처럼 생략된 질문이면 → 보정
+   - 그 외 충분히 긴 완결 질문 → 보정 안 함
+2. 메모: (최근 대화 해시, 질문) 이 같으면 이전 보정 결과 재사용 (LRU)
+3. 투기적 검색: 보정이 필요한 경우에도 원래 질문으로 검색을 먼저 시작하고,
+   보정 결과가 원래 질문과 실질적으로 다를 때만 한 번 더 검색해서 합침
+   (보정 LLM 호출이 검색을 막지 않도록 임계 경로에서 뺌)
+
+사용 예시:
+    rewriter = QueryRewriter(q_augment_chain)
+    query, info = rewriter.rewrite(prompt, chat_history)
+    docs, info = await aspeculative_retrieve(prompt, chat_history, rewriter, retriever.invoke)
+"""
+
+import asyncio
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from reranker import lexical_terms
+
+# 앞선 대화를 가리키는 표현 (있으면 맥락 없이는 검색어로 쓸 수 없음)
+REFERRING_WORDS_KO = [
+    "그거", "그것", "그건", "그게", "그걸", "이거", "이것", "이건", "이게", "저거", "저것",
+    "거기", "그곳", "여기", "그때", "아까", "방금", "위에서", "앞에서", "그중", "그 중",
+    "그분", "그들", "걔", "그쪽", "해당", "다른 건", "나머지",
+]
+REFERRING_WORDS_EN = ["it", "that", "this", "they", "them", "those", "these", "there", "he", "she", "its"]
+# 앞 질문에 이어서 묻는 시작 표현
+CONTINUATION_PREFIXES = ["그럼", "그러면", "그리고", "또", "그래서", "그렇다면", "and ", "what about", "how about"]
+
+_en_word_re = re.compile(r"[a-z]+")
+
+
+def needs_rewrite(query, history, min_length=12):
+    """
+    보정 LLM 호출이 필요한지 판단
+
+    Args:
+        query (str): 사용자 질문
+        history (list): 이전 대화 메시지 리스트
+        min_length (int): 이보다 짧은 질문은 생략이 있다고 봄
+
+    Returns:
+        tuple: (보정 필요 여부, 이유)
+    """
+    if not history:
+        return False, "no-history"
+
+    q = query.strip().lower()
+    if any(q.startswith(p) for p in CONTINUATION_PREFIXES):
+        return True, "continuation"
+    if any(word in q for word in REFERRING_WORDS_KO):
+        return True, "pronoun"
+    if set(_en_word_re.findall(q)) & set(REFERRING_WORDS_EN):
+        return True, "pronoun"
+    if q.endswith(("...", "…")) or (re.search(r"[은는]\s*\?$", q) and len(q) < 2 * min_length):
+        return True, "ellipsis"  # 예: "뉴욕은?"
+    if len(q.replace(" ", "")) < min_length:
+        return True, "short"
+    return False, "self-contained"
+
+
+def history_key(history, window=4):
+    """최근 window 개 메시지의 해시 (메모 키)"""
+    h = hashlib.sha256()
+    for msg in history[-window:]:
+        h.update(getattr(msg, "type", "").encode("utf-8"))
+        h.update(str(getattr(msg, "content", msg)).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+
+class QueryRewriter:
+    """
+    게이트 + LRU 메모가 붙은 질문 보정기
+
+    Args:
+        chain: q_augment_chain ({"chat_history", "query"} → 보정된 질문 문자열)
+        window (int): 보정에 쓰고 메모 키로 삼을 최근 메시지 수
+        cache_size (int): 메모 최대 개수
+        gate (callable): (query, history) → (bool, reason)
+    """
+
+    def __init__(self, chain, window=4, cache_size=256, gate=needs_rewrite):
+        self.chain = chain
+        self.window = window
+        self.cache_size = cache_size
+        self.gate = gate
+        self.memo = OrderedDict()
+        self.stats = {"skipped": 0, "memo_hits": 0, "llm_calls": 0}
+        self._lock = threading.Lock()
+
+    def rewrite(self, query, history):
+        """
+        필요할 때만 질문 보정
+
+        Returns:
+            tuple: (검색에 쓸 질문, {'rewritten': bool, 'reason': str})
+        """
+        needed, reason = self.gate(query, history)
+        if not needed:
+            self.stats["skipped"] += 1
+            return query, {"rewritten": False, "reason": reason}
+
+        key = (history_key(history, self.window), query.strip())
+        with self._lock:
+            if key in self.memo:
+                self.memo.move_to_end(key)
+                self.stats["memo_hits"] += 1
+                return self.memo[key], {"rewritten": True, "reason": "memo"}
+
+        rewritten = self.chain.invoke({"chat_history": history[-self.window:], "query": query}).strip()
+        self.stats["llm_calls"] += 1
+
+        with self._lock:
+            self.memo[key] = rewritten
+            self.memo.move_to_end(key)
+            while len(self.memo) > self.cache_size:
+                self.memo.popitem(last=False)
+        return rewritten, {"rewritten": True, "reason": reason}
+
+
+# =================================================================
+# 투기적 검색 (보정과 검색을 동시에)
+# =================================================================
+def materially_different(original, rewritten, threshold=0.6):
+    """두 질문의 단어/2글자 조각 자카드 유사도가 threshold 미만이면 실질적으로 다른 질문"""
+    a, b = set(lexical_terms(original)), set(lexical_terms(rewritten))
+    if not a or not b:
+        return a != b
+    return len(a & b) / len(a | b) < threshold
+
+
+def union_docs(primary, secondary, max_docs=None):
+    """두 검색 결과를 내용 기준으로 중복 제거하며 합침 (primary 순서 우선)"""
+    merged, seen = [], set()
+    for doc in list(primary) + list(secondary):
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        merged.append(doc)
+    return merged[:max_docs] if max_docs else merged
+
+
+async def aspeculative_retrieve(query, history, rewriter, retrieve, max_docs=None):
+    """
+    원래 질문 검색과 질문 보정을 동시에 실행
+
+    - 보정이 필요 없으면: 원래 질문 검색 결과만 사용
+    - 보정 결과가 원래 질문과 비슷하면: 이미 끝난 원래 질문 검색 결과 사용 (추가 검색 없음)
+    - 실질적으로 다르면: 보정된 질문으로 한 번 더 검색해서 합집합 사용
+
+    Args:
+        query (str): 사용자 질문 원문
+        history (list): 이전 대화 메시지
+        rewriter (QueryRewriter): 게이트/메모가 있는 보정기
+        retrieve (callable): 동기 검색 함수, query → docs
+        max_docs (int): 합친 결과 최대 문서 수 (None 이면 제한 없음)
+
+    Returns:
+        tuple: (docs, {'query', 'rewritten', 'reason', 'second_search'})
+    """
+    loop = asyncio.get_running_loop()
+    raw_search = loop.run_in_executor(None, retrieve, query)  # 원래 질문으로 바로 검색 시작
+
+    needed, reason = rewriter.gate(query, history)
+    if not needed:
+        rewriter.stats["skipped"] += 1
+        docs = await raw_search
+        return docs, {"query": query, "rewritten": False, "reason": reason, "second_search": False}
+
+    rewrite = loop.run_in_executor(None, rewriter.rewrite, query, history)
+    raw_docs, (rewritten, info) = await asyncio.gather(raw_search, rewrite)
+
+    if not materially_different(query, rewritten):
+        return raw_docs, {"query": rewritten, "rewritten": True, "reason": info["reason"], "second_search": False}
+
+    rewritten_docs = await loop.run_in_executor(None, retrieve, rewritten)
+    return (
+        union_docs(rewritten_docs, raw_docs, max_docs),
+        {"query": rewritten, "rewritten": True, "reason": info["reason"], "second_search": True},
+    )
@@ -16,6 +16,8 @@
 # pip install pinecone-client python-dotenv
 
 import os
+import time
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -34,7 +36,7 @@ from langchain_community.document_loaders import (
 
 # LangChain 체인 구성 요소
 from langchain_core.prompts import ChatPromptTemplate  # 프롬프트 템플릿
-from langchain_core.runnables import RunnablePassthrough  # 체인 연결
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda  # 체인 연결
 from langchain_core.output_parsers import StrOutputParser  # 출력 파싱
 from langchain_core.documents import Document  # 문서 객체
 from langchain_core.messages import HumanMessage  # Vision API용 메시지
@@ -45,6 +47,23 @@ from PIL import Image  # 이미지 처리 (리사이징, 포맷 변환)
 import base64  # 이미지 base64 인코딩
 from io import BytesIO  # 메모리 버퍼
 
+# 의미 기반 답변 캐시
+from answer_cache import SemanticAnswerCache, corpus_version
+# 토큰 스트리밍
+from rag_streaming import astream_rag, vectorstore_retriever, print_stream
+# 토큰 예산 기반 컨텍스트 패킹
+from context_packer import pack_context
+# 2단계 검색 (후보 재정렬)
+from reranker import RerankingRetriever, vectorstore_search
+# 다양성 검색 (MMR)
+from mmr import MMRRetriever
+# 넓은 질문용 다중 질의 검색 (RRF 융합)
+from multi_query import MultiQueryRetriever, llm_subquery_generator
+# LLM 호출 마감시간 + 재시도 + 헤징
+from resilience import ResilientLLM, DeadlineExceeded, deadline_scope
+# 호출별 토큰 / 지연 / 재시도 기록
+from telemetry import TelemetryHandler, open_sink
+
 # =================================================================
 # 환경 변수 로드 (.env 파일에서 API 키 읽기)
 # =================================================================
@@ -55,6 +74,32 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")  # Pinecone API 키
 PINECONE_ENVIRONMENT = os.getenv("PINECONE_ENVIRONMENT")  # Pinecone 리전 (예: us-east-1)
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "restaurant-multimodal")  # 인덱스 이름
 
+# 재정렬(rerank) 설정: 후보를 넉넉히 가져와 CPU 에서 다시 정렬 후 상위 k 개만 사용
+USE_RERANK = False  # True 로 바꾸면 2단계 검색 사용
+RERANK_FETCH_K = 30  # 1단계 후보 수
+RERANK_BUDGET_MS = 150  # 재정렬 허용 시간 (넘기면 벡터 순서 사용)
+
+# MMR 설정: 비슷한 이미지 설명/겹치는 청크 대신 서로 다른 문서로 k 자리를 채움
+USE_MMR = False  # True 로 바꾸면 MMR 검색 사용 (USE_RERANK 보다 우선)
+MMR_K = 3  # 중복이 줄어드니 적은 k 로도 충분
+MMR_FETCH_K = 20  # MMR 후보 수
+MMR_LAMBDA = 0.5  # 1 이면 관련도만, 0 이면 다양성만
+
+# 다중 질의 설정: 하위 질문을 만들어 동시에 검색 후 RRF 로 합침 (넓은 질문의 재현율 향상)
+USE_MULTI_QUERY = False  # True 로 바꾸면 다중 질의 검색 사용 (USE_MMR, USE_RERANK 보다 우선)
+MULTI_QUERY_COUNT = 3  # 하위 질문 수
+MULTI_QUERY_MAX_DOCS = 10  # 합친 뒤 최대 문서 수 (이후 토큰 예산 안에서 패킹)
+
+# 답변 생성 LLM 마감시간 / 재시도 설정 (느린 응답 하나가 질문 전체를 붙잡지 않도록)
+ANSWER_DEADLINE = 30  # 질문 하나(검색 + 생성 + 재시도)의 전체 마감시간 (초)
+LLM_TIMEOUT = 20  # LLM 호출 한 번의 최대 시간 (초)
+LLM_MAX_RETRIES = 3  # 429 / 5xx / 타임아웃 재시도 횟수 (지수 백오프)
+USE_HEDGING = True  # p95 지연이 지나도 응답이 없으면 같은 요청을 하나 더 보냄
+
+# LLM 호출 기록 (python telemetry.py telemetry.jsonl 로 단계/모델별 p50/p95/p99 확인)
+TELEMETRY_PATH = os.path.join(os.path.dirname(__file__), 'telemetry.jsonl')
+TELEMETRY = TelemetryHandler(open_sink(TELEMETRY_PATH))
+
 
 # =================================================================
 # 멀티모달 문서 로더 클래스
@@ -220,6 +265,7 @@ class MultiModalDocumentLoader:
             llm = ChatOpenAI(
                 model="gpt-4o-mini",  # Vision 지원 모델
                 # max_tokens=500  # 최대 응답 길이
+                callbacks=[TELEMETRY]
             )
             
             # ========== Step 3: Vision API 호출 메시지 구성 ==========
@@ -253,7 +299,7 @@ class MultiModalDocumentLoader:
             )
             
             # ========== Step 4: Vision API 실행 ==========
-            response = llm.invoke([message])  # GPT-4 Vision 호출
+            response = llm.invoke([message], config={"metadata": {"step": "vision"}})  # GPT-4 Vision 호출
             description = response.content  # 이미지 분석 결과 텍스트
             
             # ========== Step 5: Document 객체 생성 ==========
@@ -314,6 +360,7 @@ def split_documents(documents, chunk_size=500, chunk_overlap=50):
         chunk_size=chunk_size,  # 청크 최대 길이
         chunk_overlap=chunk_overlap,  # 겹침는 문자 수
         length_function=len,  # 길이 계산 함수
+        add_start_index=True,  # 원문 위치 (context_packer 가 이어진 청크를 합칠 때 사용)
     )
     
     splits = text_splitter.split_documents(documents)  # 분할 실행
@@ -420,20 +467,7 @@ def create_or_load_vectorstore(documents=None, force_recreate=False):
     return vectorstore
 
 
-def create_multimodal_rag_chain(vectorstore):
-    """멀티모달 RAG 체인 생성"""
-    llm = ChatOpenAI(
-        openai_api_key=OPENAI_API_KEY,
-        model_name="gpt-4o-mini",
-        temperature=0
-    )
-    
-    retriever = vectorstore.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 5}  # 더 많은 문서 검색
-    )
-    
-    template = """당신은 레스토랑 정보를 제공하는 도우미입니다.
+MULTIMODAL_TEMPLATE = """당신은 레스토랑 정보를 제공하는 도우미입니다.
 다양한 형식의 문서(텍스트, PDF, 이미지)에서 정보를 가져왔습니다.
 각 문서의 출처 타입을 고려하여 답변해주세요.
 
@@ -444,51 +478,272 @@ def create_multimodal_rag_chain(vectorstore):
 
 답변:"""
 
-    prompt = ChatPromptTemplate.from_template(template)
+
+MAX_CONTEXT_TOKENS = 1500  # 프롬프트에 넣을 컨텍스트 최대 토큰 수
+
+
+def format_docs(docs, scores=None):
+    """
+    검색된 문서를 [타입 - 출처] 머리말과 함께 하나의 컨텍스트 문자열로 합침
     
-    def format_docs(docs):
-        formatted = []
-        for doc in docs:
-            doc_type = doc.metadata.get('type', 'unknown')
-            source = doc.metadata.get('source', 'Unknown')
-            formatted.append(f"[{doc_type.upper()} - {source}]\n{doc.page_content}")
-        return "\n\n".join(formatted)
+    같은 출처의 인접 청크는 겹침(overlap)을 제거하고 하나로 합치며,
+    점수가 높은 순서로 MAX_CONTEXT_TOKENS 까지만 채운다 (context_packer 참고).
+    """
+    return pack_context(docs, scores, max_tokens=MAX_CONTEXT_TOKENS)
+
+
+def create_multimodal_llm(max_retries=2):
+    """답변 생성용 LLM"""
+    return ChatOpenAI(
+        openai_api_key=OPENAI_API_KEY,
+        model_name="gpt-4o-mini",
+        temperature=0,
+        max_retries=max_retries,
+        callbacks=[TELEMETRY],
+        stream_usage=True  # 스트리밍 호출도 토큰 수 기록
+    )
+
+
+@lru_cache(maxsize=1)
+def create_answer_llm():
+    """
+    마감시간 / 재시도 / 헤징을 적용한 답변 생성 LLM (resilience 참고)
+    
+    재시도는 ResilientLLM 이 하므로 클라이언트 자체 재시도는 끈다.
+    모든 체인이 같은 객체를 써서 p95 지연 기록과 통계를 공유한다.
+    """
+    return ResilientLLM(
+        create_multimodal_llm(max_retries=0),
+        timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        hedge=USE_HEDGING,
+    )
+
+
+def create_reranking_retriever(vectorstore, k):
+    """후보 RERANK_FETCH_K 개를 재정렬해 상위 k 개를 돌려주는 검색기"""
+    return RerankingRetriever(
+        vectorstore_search(vectorstore),
+        fetch_k=RERANK_FETCH_K,
+        top_n=k,
+        budget_ms=RERANK_BUDGET_MS,
+    )
+
+
+def create_mmr_retriever(vectorstore, k=MMR_K):
+    """후보 MMR_FETCH_K 개 중 MMR 로 k 개를 고르는 검색기"""
+    return MMRRetriever(vectorstore, k=k, fetch_k=MMR_FETCH_K, lambda_mult=MMR_LAMBDA)
+
+
+def create_multi_query_retriever(vectorstore, k):
+    """원래 질문 + 하위 질문 MULTI_QUERY_COUNT 개를 동시에 검색해 RRF 로 합치는 검색기"""
+    return MultiQueryRetriever(
+        lambda query, n: vectorstore.similarity_search_with_score(query, k=n),
+        llm_subquery_generator(create_multimodal_llm(), n=MULTI_QUERY_COUNT),
+        k_per_query=k,
+        max_docs=MULTI_QUERY_MAX_DOCS,
+    )
+
+
+def create_retriever(vectorstore, k, rerank=False, mmr=False, multi_query=False):
+    """
+    옵션에 맞는 검색기 선택 (우선순위: 다중 질의 > MMR > 재정렬)
+    
+    Returns:
+        retrieve_with_scores / aretrieve / as_runnable 을 가진 검색기, 옵션이 모두 꺼져 있으면 None
+    """
+    if multi_query:
+        return create_multi_query_retriever(vectorstore, k)
+    if mmr:
+        return create_mmr_retriever(vectorstore, k)
+    if rerank:
+        return create_reranking_retriever(vectorstore, k)
+    return None
+
+
+def create_multimodal_rag_chain(vectorstore, rerank=False, mmr=False, multi_query=False):
+    """멀티모달 RAG 체인 생성 (rerank: 재정렬, mmr: MMR, multi_query: 다중 질의 검색기 사용)"""
+    llm = create_answer_llm().as_runnable()
+    
+    selected = create_retriever(vectorstore, MMR_K if mmr else 5, rerank, mmr, multi_query)
+    if selected is not None:
+        retriever = selected.as_runnable()
+    else:
+        retriever = vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": 5}  # 더 많은 문서 검색
+        )
+    
+    prompt = ChatPromptTemplate.from_template(MULTIMODAL_TEMPLATE)
     
     rag_chain = (
         {"context": retriever | format_docs, "question": RunnablePassthrough()}
         | prompt
         | llm
         | StrOutputParser()
-    )
+    ).with_config(metadata={"step": "answer"})
     
     print("✓ 멀티모달 RAG 체인 생성 완료")
     
     return rag_chain, retriever
 
 
-def search_and_answer(rag_chain, retriever, query):
-    """질문에 대한 답변 생성 (문서 타입 표시)"""
-    print(f"\n{'='*60}")
-    print(f"질문: {query}")
-    print(f"{'='*60}")
+def create_multimodal_rag_chain_with_sources(vectorstore, k=5, rerank=False, mmr=False, multi_query=False):
+    """
+    검색을 한 번만 하고 답변과 출처를 함께 돌려주는 멀티모달 RAG 체인
+    
+    기존 체인은 rag_chain.invoke() 안에서 검색하고, 출처 표시를 위해
+    retriever.invoke() 로 한 번 더 검색했다 (질문 임베딩 2번 + Pinecone 조회 2번).
+    이 체인은 검색 결과를 그대로 답변 생성과 출처 표시에 함께 사용한다.
+    
+    Args:
+        vectorstore: 벡터스토어 (similarity_search_with_score 지원)
+        k (int): 검색할 문서 수
+        rerank (bool): True 면 후보를 더 가져와 재정렬 후 상위 k 개 사용
+        mmr (bool): True 면 MMR 로 서로 다른 문서 k 개 선택 (rerank 보다 우선)
+        multi_query (bool): True 면 하위 질문까지 동시에 검색해 RRF 로 합침 (가장 우선)
+        
+    Returns:
+        Runnable: invoke(query) → {'answer', 'sources', 'scores', 'timings'}
+                  timings 는 단계별 소요 시간(초): retrieval, generation, total
+    """
+    prompt = ChatPromptTemplate.from_template(MULTIMODAL_TEMPLATE)
+    generate_chain = (prompt | create_answer_llm().as_runnable() | StrOutputParser()).with_config(metadata={"step": "answer"})
+    retriever = create_retriever(vectorstore, k, rerank, mmr, multi_query)
     
-    answer = rag_chain.invoke(query)
-    print(f"\n답변:\n{answer}")
+    def run(query):
+        t0 = time.perf_counter()
+        
+        # ========== 1회 검색: 문서 + 유사도 점수 ==========
+        if retriever is not None:
+            docs_and_scores = retriever.retrieve_with_scores(query)
+        else:
+            docs_and_scores = vectorstore.similarity_search_with_score(query, k=k)
+        t1 = time.perf_counter()
+        
+        docs = [doc for doc, _ in docs_and_scores]
+        
+        # ========== 같은 문서로 답변 생성 ==========
+        scores = [float(score) for _, score in docs_and_scores]
+        answer = generate_chain.invoke({"context": format_docs(docs, scores), "question": query})
+        t2 = time.perf_counter()
+        
+        return {
+            "answer": answer,
+            "sources": docs,
+            "scores": scores,
+            "timings": {"retrieval": t1 - t0, "generation": t2 - t1, "total": t2 - t0},
+        }
+    
+    print("✓ 멀티모달 RAG 체인 생성 완료 (단일 검색 + 출처 반환)")
+    
+    return RunnableLambda(run)
+
+
+def create_multimodal_streaming_chain(vectorstore, k=5, rerank=False, mmr=False, multi_query=False):
+    """
+    토큰 스트리밍 버전의 멀티모달 RAG 체인
     
-    source_docs = retriever.invoke(query)
+    검색 1회 후 prompt → LLM → parser 를 astream 으로 실행한다.
+    출처/점수/시간 정보는 마지막 'end' 이벤트로 전달된다 (rag_streaming.astream_rag 참고).
+    
+    Returns:
+        function: query → 비동기 이벤트 제너레이터
+    """
+    prompt = ChatPromptTemplate.from_template(MULTIMODAL_TEMPLATE)
+    generate_chain = (prompt | create_answer_llm().as_runnable() | StrOutputParser()).with_config(metadata={"step": "answer"})
+    retriever = create_retriever(vectorstore, k, rerank, mmr, multi_query)
+    if retriever is not None:
+        retrieve = retriever.aretrieve
+    else:
+        retrieve = vectorstore_retriever(vectorstore, k)
+    
+    def stream(query):
+        return astream_rag(
+            query,
+            retrieve,
+            generate_chain,
+            lambda docs: {"context": format_docs(docs), "question": query},
+        )
+    
+    return stream
+
+
+def print_sources(sources, scores=None):
+    """참조 문서 출력 (문서 타입 아이콘 + 유사도 점수)"""
     print(f"\n{'='*60}")
     print("참조 문서 (멀티모달):")
-    for i, doc in enumerate(source_docs, 1):
+    for i, doc in enumerate(sources, 1):
         doc_type = doc.metadata.get('type', 'unknown')
         source = doc.metadata.get('source', 'Unknown')
         icon = {'text': '📄', 'pdf': '📑', 'image': '🖼️'}.get(doc_type, '📎')
+        score = f" (유사도 {scores[i - 1]:.3f})" if scores else ""
         
-        print(f"\n[{i}] {icon} {doc_type.upper()} - {source}")
+        print(f"\n[{i}] {icon} {doc_type.upper()} - {source}{score}")
         print(f"    내용: {doc.page_content[:150]}...")
     
     print(f"{'='*60}\n")
+
+
+def search_and_answer(rag_chain, query, cache=None, stream_chain=None):
+    """
+    질문에 대한 답변 생성 (문서 타입 표시)
     
-    return answer
+    Args:
+        rag_chain: create_multimodal_rag_chain_with_sources() 로 만든 체인
+        query (str): 질문
+        cache (SemanticAnswerCache): 답변 캐시 (선택)
+        stream_chain: create_multimodal_streaming_chain() 결과, 주면 토큰 단위로 바로 출력
+        
+    Returns:
+        dict: {'answer', 'sources', 'scores', 'timings', 'cached'}
+              ANSWER_DEADLINE 안에 답을 못 받으면 answer 는 None
+    """
+    print(f"\n{'='*60}")
+    print(f"질문: {query}")
+    print(f"{'='*60}")
+    
+    # 비슷한 질문의 캐시된 답변이 있으면 검색/생성 없이 바로 사용
+    hit = cache.lookup(query) if cache is not None else None
+    try:
+        # 체인 안의 모든 LLM 호출(재시도 포함)이 이 마감시간을 나눠 씀
+        with deadline_scope(ANSWER_DEADLINE):
+            if hit is not None:
+                result = {
+                    "answer": hit['answer'],
+                    "sources": hit['sources'],
+                    "scores": None,
+                    "timings": {},
+                    "cached": True,
+                }
+                print(f"\n답변 (캐시, 유사도 {hit['similarity']:.2f}):\n{result['answer']}")
+            elif stream_chain is not None:
+                print("\n답변:")
+                end = print_stream(stream_chain(query))  # 토큰이 생성되는 대로 출력
+                result = {key: end[key] for key in ("answer", "sources", "scores", "timings")}
+                result["cached"] = False
+                if cache is not None:
+                    cache.store(query, result['answer'], result['sources'])
+            else:
+                result = dict(rag_chain.invoke(query), cached=False)
+                print(f"\n답변:\n{result['answer']}")
+                if cache is not None:
+                    cache.store(query, result['answer'], result['sources'])
+    except DeadlineExceeded:
+        print(f"\n⏱  {ANSWER_DEADLINE}초 안에 답변을 받지 못했습니다. 잠시 후 다시 시도해주세요.")
+        print(f"   ({create_answer_llm().format_stats()})\n")
+        return {"answer": None, "sources": [], "scores": None, "timings": {}, "cached": False}
+    
+    print_sources(result['sources'], result['scores'])
+    
+    if result['timings']:
+        t = result['timings']
+        first_token = f" / 첫 토큰 {t['first_token']:.2f}s" if 'first_token' in t else ""
+        print(f"⏱  검색 {t['retrieval']:.2f}s{first_token} / 생성 {t['generation']:.2f}s / 전체 {t['total']:.2f}s\n")
+        TELEMETRY.log("retrieval", t['retrieval'])
+        TELEMETRY.log("search_and_answer", t['total'], ttft=t.get('first_token'))
+    
+    return result
 
 
 def analyze_document_types(documents):
@@ -562,7 +817,19 @@ def main():
     
     # ========== 5단계: 멀티모달 RAG 체인 생성 ==========
     print("\n5단계: 멀티모달 RAG 체인 생성")
-    rag_chain, retriever = create_multimodal_rag_chain(vectorstore)
+    k = MMR_K if USE_MMR else 5
+    options = dict(rerank=USE_RERANK, mmr=USE_MMR, multi_query=USE_MULTI_QUERY)
+    rag_chain = create_multimodal_rag_chain_with_sources(vectorstore, k=k, **options)
+    stream_chain = create_multimodal_streaming_chain(vectorstore, k=k, **options)  # 토큰 스트리밍 출력용
+    
+    # 의미 기반 답변 캐시 (인덱스 버전 = 청크 내용 해시, 최대 256개 LRU)
+    cache = SemanticAnswerCache(
+        vectorstore.embeddings,
+        threshold=0.9,
+        max_size=256,
+        index_version=corpus_version(splits),
+        path=os.path.join(os.path.dirname(__file__), 'answer_cache.jsonl')
+    )
     
     # ========== 6단계: 질문 예제 ==========
     print("\n6단계: 멀티모달 검색 예제")
@@ -574,7 +841,7 @@ def main():
     ]
     
     for query in example_queries:
-        search_and_answer(rag_chain, retriever, query)
+        search_and_answer(rag_chain, query, cache, stream_chain)
     
     # ========== 7단계: 대화형 모드 ==========
     print("\n대화형 모드 (종료하려면 'quit' 또는 'exit' 입력)")
@@ -585,6 +852,7 @@ def main():
         
         # 종료 명령어 확인
         if user_query.lower() in ['quit', 'exit', '종료']:
+            print(f"\n# {create_answer_llm().format_stats()}")
             print("\n프로그램을 종료합니다.")
             break
         
@@ -593,7 +861,7 @@ def main():
             continue
         
         # 질문 처리
-        search_and_answer(rag_chain, retriever, user_query)
+        search_and_answer(rag_chain, user_query, cache, stream_chain)
 
 
 if __name__ == "__main__":
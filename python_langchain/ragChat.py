@@ -1,56 +1,77 @@
 import streamlit as st
 import os
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langchain.chains.combine_documents import create_stuff_documents_chain
+from sharded_index import CorpusShard, ShardedIndex
+from rag_streaming import astream_rag, iter_events, token_stream
+from reranker import RerankingRetriever
+from query_rewrite import QueryRewriter, aspeculative_retrieve
+from prompt_cache import PromptCacheHandler, stable_prefix_prompt
 
 # --- 1. API 키 설정 (보안상 직접 입력하거나 환경변수 사용) ---
 os.environ["OPENAI_API_KEY"] = " "
 
+# 재정렬(rerank): 후보 30개를 가져와 CPU 에서 다시 정렬 후 상위 3개만 사용
+# False 면 샤드 검색 상위 3개를 그대로 사용
+USE_RERANK = True
+RERANK_FETCH_K = 30
+RERANK_BUDGET_MS = 150  # 이 시간을 넘기면 벡터 점수 순서 그대로 사용
+TOP_K = 3
+
 st.set_page_config(page_title="City Plan RAG", page_icon="🏙️")
 st.title("🏙️ 서울 & 뉴욕 도시계획 Q&A")
 
-# --- 2. RAG 시스템 초기화 (피클 없이 직접 로드) ---
+# --- 2. RAG 시스템 초기화 (코퍼스별 샤드, 변경된 샤드만 재구축) ---
 @st.cache_resource
-def init_rag():
+def init_rag(use_rerank=USE_RERANK):
     # 실제 파일 경로 (이 부분이 정확해야 합니다!)
-    files = [
-        r'C:\Users\user\Desktop\0115\제외파일\g\data.pdf',
-        r'C:\Users\user\Desktop\0115\제외파일\g\/OneNYC_2050_Strategic_Plan.pdf'
+    shards = [
+        CorpusShard(
+            "seoul",
+            [r'C:\Users\user\Desktop\0115\제외파일\g\data.pdf'],
+            keywords=["서울", "seoul"],
+        ),
+        CorpusShard(
+            "nyc",
+            [r'C:\Users\user\Desktop\0115\제외파일\g\/OneNYC_2050_Strategic_Plan.pdf'],
+            keywords=["뉴욕", "new york", "nyc", "onenyc"],
+        ),
     ]
-    
-    docs = []
-    for f in files:
-        if os.path.exists(f):
-            # PyMuPDFLoader는 한글 인식률이 매우 높습니다
-            loader = PyMuPDFLoader(f)
-            docs.extend(loader.load())
-    
-    if not docs:
+    if not any(os.path.exists(f) for shard in shards for f in shard.files):
         st.error("⚠️ 파일을 찾을 수 없습니다. 경로를 다시 확인해주세요!")
         return None
 
-    # 텍스트 나누기
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    splits = text_splitter.split_documents(docs)
-
-    # 벡터 저장소 만들기
+    # 벡터 저장소 만들기 (샤드마다 ./chroma_shards/<이름> 폴더 사용)
     embeddings = OpenAIEmbeddings(model='text-embedding-3-large')
-    vector_store = Chroma.from_documents(
-        documents=splits, 
-        embedding=embeddings,
-        persist_directory="./chroma_db_new" # 아예 새로운 DB 폴더 사용
+    index = ShardedIndex(shards, embeddings, base_directory="./chroma_shards")
+    index.build()
+    if not use_rerank:
+        # 질문에 맞는 샤드만 병렬로 검색해서 상위 TOP_K 개 사용
+        return RunnableLambda(lambda query: [doc for doc, _ in index.search_with_scores(query, k=TOP_K)])
+    # 질문에 맞는 샤드만 병렬로 검색해서 후보 30개를 모은 뒤,
+    # CPU 재정렬로 상위 3개만 사용 (150ms 를 넘기거나 오류가 나면 벡터 점수 순서 그대로)
+    reranking = RerankingRetriever(
+        lambda query, k: index.search_with_scores(query, k=k),
+        fetch_k=RERANK_FETCH_K,
+        top_n=TOP_K,
+        budget_ms=RERANK_BUDGET_MS,
     )
-    return vector_store.as_retriever(k=3)
+    return reranking.as_runnable()
 
 # 리트리버 로드
 retriever = init_rag()
-llm = ChatOpenAI(model="gpt-4o-mini")
+
+# 호출별 캐시된/안 된 입력 토큰 기록 (재실행돼도 누적되도록 캐시)
+@st.cache_resource
+def get_cache_stats():
+    return PromptCacheHandler()
+
+cache_stats = get_cache_stats()
+llm = ChatOpenAI(model="gpt-4o-mini", callbacks=[cache_stats], stream_usage=True)
 
 # --- 3. 체인 설정 ---
 # 질문 보정용
@@ -61,11 +82,20 @@ q_augment_prompt = ChatPromptTemplate.from_messages([
 ])
 q_augment_chain = q_augment_prompt | llm | StrOutputParser()
 
+# 보정이 필요한 질문만 LLM 호출 + (최근 대화, 질문) 단위 메모 (재실행돼도 유지되도록 캐시)
+@st.cache_resource
+def get_rewriter():
+    return QueryRewriter(q_augment_chain, window=4, cache_size=256)
+
+rewriter = get_rewriter()
+
 # 답변용
-qna_prompt = ChatPromptTemplate.from_messages([
-    ("system", "아래의 컨텍스트를 참고해서 답변해:\n\n{context}"),
-    MessagesPlaceholder(variable_name="messages"),
-])
+# 고정 지시문 → 대화 기록 → 이번 검색 문맥 순서 (앞부분이 매 요청 같아야 프롬프트 캐시 적중)
+qna_prompt = stable_prefix_prompt(
+    "아래에 주어지는 컨텍스트를 참고해서 사용자의 마지막 질문에 답변해.",
+    history_key="messages",
+    context="컨텍스트:\n\n{context}",
+)
 document_chain = create_stuff_documents_chain(llm, qna_prompt)
 
 # --- 4. 채팅 UI ---
@@ -82,17 +112,44 @@ if prompt := st.chat_input("궁금한 점을 물어보세요!"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        # 1. 질문 보정
-        aug_query = q_augment_chain.invoke({
-            "chat_history": st.session_state.messages[:-1],
-            "query": prompt
-        })
-        # 2. 검색 및 답변
-        docs = retriever.invoke(aug_query)
-        res = document_chain.invoke({"messages": st.session_state.messages, "context": docs})
-        
-        st.markdown(res)
-        st.session_state.messages.append(AIMessage(content=res))
+        # 1. 질문 보정 + 검색
+        #    원래 질문으로 검색을 먼저 시작하고, 보정(필요할 때만)은 동시에 진행
+        #    보정된 질문이 실질적으로 다를 때만 한 번 더 검색해서 합침
+        rewrite_info = {}
+        # iter_events 는 별도 스레드에서 돌고, 그 스레드에서는 st.session_state 가 비어 있음
+        # → 대화 기록은 여기(스크립트 스레드)에서 복사해 두고 아래 함수들은 이 복사본만 사용
+        history = list(st.session_state.messages)
+
+        async def retrieve(query):
+            docs, info = await aspeculative_retrieve(
+                query, history[:-1], rewriter, retriever.invoke, max_docs=5
+            )
+            rewrite_info.update(info)
+            return docs, None
+
+        # 2. 답변 (토큰이 생성되는 대로 화면에 표시)
+        events = astream_rag(
+            prompt,
+            retrieve,
+            document_chain,
+            lambda docs: {"messages": history, "context": docs},
+        )
+        end = {}
+        res = st.write_stream(token_stream(iter_events(events), end))
+
+        # 3. 마지막 이벤트로 받은 출처와 시간 정보 표시
+        #    (검색 중 오류는 위 write_stream 에서 그대로 올라오고, 보정 정보가 비어 있어도 캡션은 깨지지 않게)
+        t = end["timings"]
+        st.caption(f"⏱ 검색 {t['retrieval']:.2f}s · 첫 토큰 {t['first_token']:.2f}s · 전체 {t['total']:.2f}s"
+                   f" · 질문 보정: {'예' if rewrite_info.get('rewritten') else '생략'}"
+                   f" ({rewrite_info.get('reason', '-')})"
+                   f"{' · 보정 질문 추가 검색' if rewrite_info.get('second_search') else ''}")
+        st.caption(f"🗄 {cache_stats.format_summary()}")
+        with st.expander("참고 문서 확인"):
+            for i, doc in enumerate(end["sources"]):
+                st.write(f"**Source {i+1}:** {doc.page_content[:200]}...")
+
+        st.session_state.messages.append(AIMessage(content=end["answer"]))
 
 
 
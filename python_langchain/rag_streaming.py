@@ -0,0 +1,151 @@
+"""
+RAG 체인 토큰 스트리밍 헬퍼
+
+기존 체인은 답변이 끝까지 생성된 뒤에야 화면에 출력되므로 체감 지연 = 전체 생성 시간이었다.
+여기서는 검색 → 프롬프트 → LLM → 파서를 astream 으로 흘려보내고,
+토큰 이벤트를 받는 즉시 CLI/스트림릿에 출력한다.
+
+이벤트 형식:
+    {"type": "token", "content": "..."}                       # 생성된 토큰 조각
+    {"type": "end", "answer": ..., "sources": [...],           # 마지막 이벤트 (출처 + 시간 정보)
+     "scores": [...], "timings": {"retrieval", "first_token", "generation", "total"}}
+
+사용 예시 (CLI):
+    events = astream_rag(query, retrieve, generate_chain, build_inputs)
+    result = print_stream(events)
+
+사용 예시 (스트림릿):
+    end = {}
+    answer = st.write_stream(token_stream(iter_events(events), end))
+"""
+
+import asyncio
+import queue
+import threading
+import time
+
+
+async def _single(text):
+    yield text
+
+
+async def astream_rag(query, retrieve, generate_chain, build_inputs, no_answer=None):
+    """
+    검색 후 답변을 토큰 단위로 스트리밍하는 비동기 제너레이터
+
+    Args:
+        query (str): 질문
+        retrieve: async 함수, query → (docs, scores)  (scores 는 None 가능)
+        generate_chain: 프롬프트 | LLM | 문자열 파서 Runnable (astream 지원)
+        build_inputs: docs → generate_chain 입력 딕셔너리
+        no_answer (str): 주면 검색 결과가 없을 때 LLM 호출 없이 이 답변을 바로 보냄
+
+    Yields:
+        dict: token 이벤트들, 마지막에 end 이벤트 하나
+    """
+    t0 = time.perf_counter()
+    docs, scores = await retrieve(query)
+    t1 = time.perf_counter()
+
+    parts = []
+    first_token = None
+    if not docs and no_answer is not None:
+        chunks = _single(no_answer)  # 관련 문서 없음: 생성 생략
+    else:
+        chunks = generate_chain.astream(build_inputs(docs))
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter()
+        parts.append(chunk)
+        yield {"type": "token", "content": chunk}
+    t2 = time.perf_counter()
+
+    yield {
+        "type": "end",
+        "answer": "".join(parts),
+        "sources": docs,
+        "scores": scores,
+        "timings": {
+            "retrieval": t1 - t0,
+            "first_token": (first_token or t2) - t0,  # 질문부터 첫 토큰까지 (TTFT)
+            "generation": t2 - t1,
+            "total": t2 - t0,
+        },
+    }
+
+
+def vectorstore_retriever(vectorstore, k):
+    """벡터스토어의 비동기 점수 검색을 astream_rag 용 retrieve 함수로 감싸기"""
+    async def retrieve(query):
+        docs_and_scores = await vectorstore.asimilarity_search_with_score(query, k=k)
+        return [doc for doc, _ in docs_and_scores], [float(score) for _, score in docs_and_scores]
+    return retrieve
+
+
+def print_stream(events):
+    """
+    이벤트 스트림을 CLI 에 바로바로 출력하고 end 이벤트를 반환
+
+    Args:
+        events: astream_rag() 가 만든 비동기 제너레이터
+
+    Returns:
+        dict: end 이벤트 (answer, sources, scores, timings)
+    """
+    async def consume():
+        end = None
+        async for event in events:
+            if event["type"] == "token":
+                print(event["content"], end="", flush=True)
+            else:
+                end = event
+        print()
+        return end
+
+    return asyncio.run(consume())
+
+
+def iter_events(events):
+    """
+    비동기 이벤트 스트림을 동기 제너레이터로 변환 (스트림릿처럼 동기 코드에서 사용)
+
+    별도 스레드에서 이벤트 루프를 돌리고 큐로 이벤트를 전달한다.
+    그 스레드에는 스트림릿 실행 문맥이 없으므로, events 안에서 실행되는 함수(검색, 입력 구성 등)는
+    st.session_state 같은 st.* 를 건드리면 안 된다 (필요한 값은 호출 전에 복사해서 넘길 것).
+    """
+    q = queue.Queue()
+    done = object()
+
+    def worker():
+        async def consume():
+            try:
+                async for event in events:
+                    q.put(event)
+            except Exception as e:  # 오류는 호출한 쪽에서 다시 발생시킴
+                q.put(e)
+            finally:
+                q.put(done)
+        asyncio.run(consume())
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def token_stream(events, end):
+    """
+    token 이벤트의 내용만 흘려보내고 end 이벤트는 end 딕셔너리에 채워 넣음
+    (st.write_stream 에 바로 넘길 수 있는 형태)
+    """
+    for event in events:
+        if event["type"] == "token":
+            yield event["content"]
+        else:
+            end.update(event)
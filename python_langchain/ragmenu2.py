@@ -6,14 +6,18 @@ data 폴더의 텍스트 파일들을 임베딩하여 Pinecone에 저장하고 
 # pip install pinecone langchain pinecone
 import os
 from dotenv import load_dotenv
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_pinecone import PineconeVectorStore
-from langchain_community.document_loaders import TextLoader
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
 from pinecone import Pinecone, ServerlessSpec
+from answer_cache import SemanticAnswerCache, corpus_version
+from rag_streaming import astream_rag, print_stream
+from context_packer import pack_context
+from reranker import RerankingRetriever
+from adaptive_retrieval import AdaptiveRetriever, vector_score_search, create_gated_chain, calibrate_from_queries
+from catalog_index import CatalogTable, answer_from_catalog
+from doc_loader import load_documents, split_document
 
 # 환경 변수 로드
 load_dotenv()
@@ -23,43 +27,29 @@ PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 PINECONE_INDEX_NAME=os.getenv('PINECONE_INDEX_NAME')
 PINECONE_ENVIRONMENT=os.getenv('PINECONE_ENVIRONMENT')
 
-
-def load_documents(path):
-    document = [] # 변수명 리스트
-    for filename in os.listdir(path):
-        if filename.endswith('.txt'):
-            file_path = os.path.join(path, filename)
-            try:
-                loader = TextLoader(file_path, encoding="utf-8")
-                docs = loader.load()
-                # 도큐먼트에 메타정보 추가 (파일명)
-                for doc in docs:
-                    # [수정] == 가 아니라 = 로 할당해야 하며, 딕셔너리 접근은 [] 입니다.
-                    doc.metadata['source'] = filename 
-
-                document.extend(docs)
-                print(f'load complete. {filename}=============')
-            except Exception as ex:
-                print(f"문서 로드 실패: {file_path} - {ex}")
-
-    # [수정] 함수 이름이 아니라 결과 리스트를 반환해야 함
-    return document
-
-
-
-
-
-def split_document(documents, chunk_size=500, overlap_size=50):
-    # [수정] 인자 이름을 documents로 맞춰줌
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size = chunk_size,
-        chunk_overlap = overlap_size # [수정] 인자 이름은 chunk_overlap 입니다.
-    )
-    splits = text_splitter.split_documents(documents)
-    # [수정] f-string 앞에 f가 빠지지 않았는지 확인
-    print(f"문서 분할 완료, {len(splits)}개 청크 생성 완료")
-    return splits
-
+# 재정렬(rerank): 후보 30개를 가져와 CPU 에서 다시 정렬 후 상위 3개만 사용
+USE_RERANK = False
+RERANK_FETCH_K = 30
+RERANK_BUDGET_MS = 150  # 이 시간을 넘기면 벡터 검색 순서 그대로 사용
+
+# 점수 기반 가변 k: 최고 유사도가 MIN_RELEVANCE 미만이면 LLM 호출 없이 NO_ANSWER 반환
+# main() 에서 아래 관련/무관 질문 예시를 실제로 검색해 MIN_RELEVANCE 를 다시 정함
+NO_ANSWER = '해당 정보 추적 불가'
+MIN_RELEVANCE = 0.25  # 보정 전 기본값 (text-embedding-3-small 코사인 유사도 기준)
+MAX_K = 5
+CALIBRATE_RELEVANCE = True
+ON_TOPIC_QUERIES = [
+    "스테이크 메뉴의 가격과 특징을 알려주세요.",
+    "해산물 요리는 어떤 것이 있나요?",
+    "디저트 메뉴가 있나요?",
+    "레드 와인 추천해 주세요.",
+]
+OFF_TOPIC_QUERIES = [
+    "오늘 서울 날씨 어때?",
+    "파이썬에서 리스트를 정렬하는 방법은?",
+    "다음 주 주식 시장 전망은?",
+    "비행기 표 예약하는 법 알려줘.",
+]
 
 
 #pinecone db reset
@@ -139,12 +129,7 @@ def create_or_load_vectorstore(document=None,force_recreate=False):
     
     return vectorstore
 
-def create_rag_chain(vector_store):
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
-
-    # 오타 수정: template
-    template = '''
+RAG_TEMPLATE = '''
     당신은 레스토랑 정보를 제공하는 도우미입니다.
     다음 컨텍스트를 참고하여 질문에 답하세요.
     컨텍스트 정보가 없다면 '해당 정보 추적 불가'라고 답변하세요.
@@ -152,19 +137,59 @@ def create_rag_chain(vector_store):
     컨텍스트 : {context}
     질문 : {question}
     답변: '''
-    
-    prompt = ChatPromptTemplate.from_template(template)
-
-    # [수정] 검색된 문서들을 하나의 문자열로 합쳐주는 함수
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
-
-    # RAG 체인 구성 (LCEL 문법)
-    chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+
+
+# 가격/재료 조건 질문: 카탈로그 표에서 걸러낸 목록만 주고 문장만 다듬게 함
+CATALOG_TEMPLATE = '''
+    당신은 레스토랑 정보를 제공하는 도우미입니다.
+    아래 목록은 질문 조건으로 이미 정확히 걸러낸 결과입니다.
+    목록에 있는 항목, 가격, 설명만 사용해서 자연스럽게 답변하세요. 항목을 추가하거나 빼지 마세요.
+
+    목록 : {rows}
+    질문 : {question}
+    답변: '''
+
+
+MAX_CONTEXT_TOKENS = 1000  # 프롬프트에 넣을 컨텍스트 최대 토큰 수
+
+
+# [수정] 검색된 문서들을 하나의 문자열로 합쳐주는 함수
+# 인접 청크의 겹침(overlap)은 제거하고, 토큰 예산 안에서만 채움
+def format_docs(docs):
+    return pack_context(docs, max_tokens=MAX_CONTEXT_TOKENS, header=None)
+
+
+def create_adaptive_retriever(vector_store):
+    # 유사도 분포를 보고 1~MAX_K 개 사용, 관련 문서가 없으면 0개
+    return AdaptiveRetriever(vector_score_search(vector_store), threshold=MIN_RELEVANCE, max_k=MAX_K)
+
+
+def create_reranking_retriever(vector_store, k=3):
+    # 1단계: 최고 점수만 확인해 무관한 질문이면 빈 결과, 아니면 후보 30개를 그대로 재정렬에 넘김
+    # (몇 개를 쓸지는 재정렬 결과 상위 k 개로 정함)
+    return RerankingRetriever(
+        create_adaptive_retriever(vector_store).gate_search,
+        fetch_k=RERANK_FETCH_K,
+        top_n=k,
+        budget_ms=RERANK_BUDGET_MS
+    )
+
+
+def create_rag_chain(vector_store, rerank=False):
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    if rerank:
+        retriever = create_reranking_retriever(vector_store, k=3)
+    else:
+        retriever = create_adaptive_retriever(vector_store)
+
+    prompt = ChatPromptTemplate.from_template(RAG_TEMPLATE)
+
+    # RAG 체인 구성: 검색 결과가 없으면 LLM 을 부르지 않고 NO_ANSWER
+    chain = create_gated_chain(
+        retriever,
+        prompt | llm | StrOutputParser(),
+        lambda docs, query: {"context": format_docs(docs), "question": query},
+        NO_ANSWER,
     )
     
     return chain
@@ -180,11 +205,68 @@ def create_rag_chain(vector_store):
     print("="*50)
     return response
 
-def search_answer(query, rag_chain):
-    # AI에게 질문 던지고 답변 받기
-    answer = rag_chain.invoke(query)
-    print(f"\n[AI 답변]: {answer}")
-    print("-" * 50)
+def create_streaming_rag_chain(vector_store, k=3, rerank=False):
+    # 토큰 스트리밍용 체인: 검색 1회 후 prompt → llm → parser 를 astream 으로 실행
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    generate_chain = ChatPromptTemplate.from_template(RAG_TEMPLATE) | llm | StrOutputParser()
+    if rerank:
+        retrieve = create_reranking_retriever(vector_store, k).aretrieve
+    else:
+        retrieve = create_adaptive_retriever(vector_store).aretrieve
+
+    def stream(query):
+        return astream_rag(
+            query,
+            retrieve,
+            generate_chain,
+            lambda docs: {"context": format_docs(docs), "question": query},
+            no_answer=NO_ANSWER,
+        )
+
+    return stream
+
+
+def create_catalog_chain():
+    # 카탈로그 결과 문장 다듬기용 체인
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    return ChatPromptTemplate.from_template(CATALOG_TEMPLATE) | llm | StrOutputParser()
+
+
+def search_answer(query, rag_chain, cache=None, stream_chain=None, catalog=None, catalog_chain=None):
+    # 가격/재료 조건 질문은 카탈로그 표에서 바로 걸러서 답변 (벡터 검색 생략)
+    if catalog is not None:
+        result = answer_from_catalog(query, catalog, catalog_chain)
+        if result is not None:
+            answer, rows, flt = result
+            print(f"\n[AI 답변 - 카탈로그 {len(rows)}건, 조건 {flt}]: {answer}")
+            print("-" * 50)
+            return answer
+
+    # 비슷한 질문을 이미 답했다면 캐시된 답변 사용 (검색 + LLM 호출 생략)
+    if cache is not None:
+        hit = cache.lookup(query)
+        if hit is not None:
+            print(f"\n[AI 답변 - 캐시, 유사도 {hit['similarity']:.2f}]: {hit['answer']}")
+            print("-" * 50)
+            return hit['answer']
+
+    if stream_chain is not None:
+        # 토큰이 생성되는 대로 바로 출력 (출처/시간 정보는 마지막 이벤트로 받음)
+        print("\n[AI 답변]: ", end="")
+        end = print_stream(stream_chain(query))
+        answer, sources = end['answer'], end['sources']
+        t = end['timings']
+        print(f"(첫 토큰 {t['first_token']:.2f}s / 전체 {t['total']:.2f}s)")
+        print("-" * 50)
+    else:
+        # AI에게 질문 던지고 답변 받기
+        answer, sources = rag_chain.invoke(query), []
+        print(f"\n[AI 답변]: {answer}")
+        print("-" * 50)
+
+    if cache is not None:
+        cache.store(query, answer, sources)
+    return answer
 
 def main():
     # 1. 데이터 로드 및 분할
@@ -197,8 +279,31 @@ def main():
     vector_store = create_or_load_vectorstore(document=splits, force_recreate=False)
     print("✓ 모든 준비가 완료되었습니다!")
 
+    # 관련/무관 질문 예시의 최고 유사도로 관련 문서 하한 보정 (체인 생성 전에)
+    if CALIBRATE_RELEVANCE:
+        global MIN_RELEVANCE
+        MIN_RELEVANCE = calibrate_from_queries(
+            vector_score_search(vector_store), ON_TOPIC_QUERIES, OFF_TOPIC_QUERIES
+        )
+        print(f"✓ 관련 문서 하한 보정: MIN_RELEVANCE={MIN_RELEVANCE:.3f}")
+
     # 3. RAG 체인 생성
-    rag_chain = create_rag_chain(vector_store)
+    rag_chain = create_rag_chain(vector_store, rerank=USE_RERANK)
+    stream_chain = create_streaming_rag_chain(vector_store, rerank=USE_RERANK)
+
+    # 메뉴/와인 카탈로그 구조화 표 (이름, 가격, 분류, 재료/품종)
+    catalog = CatalogTable.from_documents(document)
+    catalog_chain = create_catalog_chain()
+    print(f"✓ 카탈로그 표 생성 ({len(catalog)}개 항목)")
+
+    # 의미 기반 답변 캐시 (문서 내용이 바뀌면 버전 해시가 달라져 자동 초기화)
+    cache = SemanticAnswerCache(
+        vector_store.embeddings,
+        threshold=0.9,
+        max_size=256,
+        index_version=corpus_version(splits),
+        path='answer_cache.jsonl'
+    )
 
     # 4. 테스트 질문 리스트
     example_queries = [
@@ -226,7 +331,7 @@ def main():
             exit(0)
         if not user_query:
             continue
-        search_answer(user_query, rag_chain)
+        search_answer(user_query, rag_chain, cache, stream_chain, catalog, catalog_chain)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,182 @@
+"""
+로컬 재정렬(Rerank) 단계 + 지연시간 예산
+
+벡터 검색 순서를 그대로 LLM 에 넘기던 것을 2단계로 바꾼다.
+1. 후보를 넉넉히 가져옴 (fetch_k, 예: 30개)
+2. CPU 에서 가벼운 모델로 질문-문서 관련도를 다시 계산해 상위 top_n 만 사용
+   - LexicalReranker: 단어 + 한글 2글자 조각(bigram) BM25, 외부 모델 불필요
+   - CrossEncoderReranker: sentence-transformers 크로스 인코더 (설치된 경우)
+3. 재정렬이 질의당 예산(budget_ms)을 넘기거나 오류가 나면 벡터 순서로 대체
+   - 예산을 넘긴 재정렬도 스레드에서는 끝까지 돌기 때문에, 작업자가 모두 바쁘면
+     기다리지 않고 바로 벡터 순서를 쓴다 (버려진 작업 뒤에 새 질의가 줄 서지 않도록)
+
+사용 예시:
+    retriever = RerankingRetriever(vectorstore_search(vectorstore), fetch_k=30, top_n=3)
+    docs = retriever.as_runnable().invoke(query)
+"""
+
+import asyncio
+import math
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from langchain_core.runnables import RunnableLambda
+
+RERANK_WORKERS = 4
+_pool = ThreadPoolExecutor(max_workers=RERANK_WORKERS, thread_name_prefix="rerank")
+_slots = threading.BoundedSemaphore(RERANK_WORKERS)  # 실행 중(예산 초과로 버려진 것 포함)인 재정렬 수 제한
+_word_re = re.compile(r"\w+")
+
+
+def vectorstore_search(vectorstore):
+    """벡터스토어를 (query, k) → [(doc, score)] 검색 함수로 감싸기 (점수는 높을수록 관련)"""
+    return lambda query, k: vectorstore.similarity_search_with_relevance_scores(query, k=k)
+
+
+# =================================================================
+# 재정렬 모델
+# =================================================================
+def lexical_terms(text):
+    """단어 + 한글 단어의 2글자 조각 (조사/어미가 붙어도 겹치도록)"""
+    terms = []
+    for word in _word_re.findall(text.lower()):
+        terms.append(word)
+        if len(word) > 2:
+            terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return terms
+
+
+class LexicalReranker:
+    """
+    후보 집합 안에서 계산하는 BM25 + 벡터 점수 혼합 재정렬
+
+    Args:
+        alpha (float): 벡터 점수 비중 (0 이면 어휘 점수만 사용)
+        k1, b (float): BM25 파라미터
+    """
+
+    def __init__(self, alpha=0.5, k1=1.2, b=0.75):
+        self.alpha = alpha
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query, docs, vector_scores):
+        doc_terms = [Counter(lexical_terms(d.page_content)) for d in docs]
+        lengths = [sum(c.values()) for c in doc_terms]
+        avg_len = sum(lengths) / len(lengths) if lengths else 1.0
+        n = len(docs)
+
+        query_terms = set(lexical_terms(query))
+        idf = {}
+        for term in query_terms:
+            df = sum(1 for c in doc_terms if term in c)
+            idf[term] = math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+        bm25 = []
+        for counts, length in zip(doc_terms, lengths):
+            s = 0.0
+            for term in query_terms:
+                tf = counts.get(term, 0)
+                if not tf:
+                    continue
+                s += idf[term] * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_len))
+            bm25.append(s)
+
+        # 후보 안에서 0~1 로 정규화 후 벡터 점수와 섞기
+        top = max(bm25) if bm25 and max(bm25) > 0 else 1.0
+        return [self.alpha * v + (1 - self.alpha) * (s / top) for s, v in zip(bm25, vector_scores)]
+
+
+class CrossEncoderReranker:
+    """
+    sentence-transformers 크로스 인코더 재정렬 (다국어 MiniLM 기본)
+
+    pip install sentence-transformers
+    """
+
+    def __init__(self, model_name="cross-encoder/mmarco-mMiniLMv2-L12-H384-v1", max_length=256):
+        from sentence_transformers import CrossEncoder  # 사용할 때만 필요
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+    def score(self, query, docs, vector_scores):
+        return [float(s) for s in self.model.predict([(query, d.page_content) for d in docs])]
+
+
+# =================================================================
+# 예산이 있는 재정렬 검색기
+# =================================================================
+class RerankingRetriever:
+    """
+    후보를 fetch_k 개 가져와 재정렬 후 top_n 개 반환
+
+    Args:
+        search: (query, k) → [(doc, score)] 검색 함수
+        reranker: score(query, docs, vector_scores) 를 가진 재정렬 모델
+        fetch_k (int): 1단계 후보 수
+        top_n (int): 최종 반환 문서 수
+        budget_ms (float): 재정렬 허용 시간, 넘기면 벡터 순서 사용
+    """
+
+    def __init__(self, search, reranker=None, fetch_k=30, top_n=3, budget_ms=150):
+        self.search = search
+        self.reranker = reranker or LexicalReranker()
+        self.fetch_k = fetch_k
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.stats = {"queries": 0, "fallbacks": 0, "busy": 0, "rerank_ms": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, value=1):
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def retrieve_with_scores(self, query):
+        """재정렬된 (doc, score) 상위 top_n 개"""
+        candidates = self.search(query, self.fetch_k)
+        self._count("queries")
+        if len(candidates) <= 1:
+            return candidates[:self.top_n]
+
+        docs = [doc for doc, _ in candidates]
+        vector_scores = [float(score) for _, score in candidates]
+
+        # 작업자가 모두 바쁘면 (이전 질의의 재정렬이 아직 돌고 있으면) 줄 서지 않고 벡터 순서 사용
+        if not _slots.acquire(blocking=False):
+            self._count("busy")
+            return candidates[:self.top_n]
+
+        t0 = time.perf_counter()
+        future = _pool.submit(self.reranker.score, query, docs, vector_scores)
+        # 예산을 넘겨 결과를 버려도 실제 작업이 끝날 때 자리를 돌려줌
+        future.add_done_callback(lambda _: _slots.release())
+        try:
+            scores = future.result(timeout=self.budget_ms / 1000)
+        except TimeoutError:
+            # 예산 초과: 재정렬 결과를 기다리지 않고 벡터 순서 사용
+            self._count("fallbacks")
+            return candidates[:self.top_n]
+        except Exception as e:
+            # 재정렬 모델 오류(모델 로드 실패, 이상한 문서 등)로 답변 전체가 실패하지 않도록 벡터 순서 사용
+            print(f"⚠ 재정렬 실패, 벡터 순서 사용: {type(e).__name__}: {e}")
+            self._count("fallbacks")
+            return candidates[:self.top_n]
+        finally:
+            self._count("rerank_ms", (time.perf_counter() - t0) * 1000)
+
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [(docs[i], scores[i]) for i in order[:self.top_n]]
+
+    def retrieve(self, query):
+        return [doc for doc, _ in self.retrieve_with_scores(query)]
+
+    async def aretrieve(self, query):
+        """rag_streaming.astream_rag 용 retrieve 함수 → (docs, scores)"""
+        pairs = await asyncio.get_running_loop().run_in_executor(None, self.retrieve_with_scores, query)
+        return [doc for doc, _ in pairs], [score for _, score in pairs]
+
+    def as_runnable(self):
+        """retriever.invoke(query) 형태로 쓸 수 있는 Runnable"""
+        return RunnableLambda(self.retrieve)
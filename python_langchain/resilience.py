@@ -0,0 +1,393 @@
+"""
+LLM 호출 마감시간(deadline) + 재시도 + 헤징(hedged request)
+
+체인 어디에도 타임아웃/재시도가 없어서 느린 응답 하나가 search_and_answer / run_agent 를
+무한정 붙잡고, p99 지연은 업스트림의 느린 응답(straggler)이 결정했다.
+
+1. deadline_scope: 요청 하나(질문 하나, Agent 실행 한 번)의 전체 마감시간을 contextvar 로 설정
+   → 체인 안의 LLM 호출들은 남은 시간과 호출별 타임아웃 중 짧은 쪽을 요청 타임아웃으로 사용
+2. 재시도: 429 / 5xx / 타임아웃 / 연결 오류만 지수 백오프(+지터)로 재시도,
+   Retry-After 헤더가 있으면 따르고, 마감시간 안에 못 끝날 재시도는 하지 않음
+3. 헤징: 최근 지연시간 p95 가 지나도 응답(스트리밍은 첫 토큰)이 없으면 같은 요청을 하나 더 보내
+   먼저 온 응답을 사용 (스트리밍은 진 쪽을 취소)
+
+사용 예시:
+    llm = ResilientLLM(ChatOpenAI(model="gpt-4o-mini", max_retries=0), timeout=20)
+    chain = prompt | llm.as_runnable() | StrOutputParser()
+    with deadline_scope(30):
+        answer = chain.invoke({...})
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import math
+import operator
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from langchain_core.runnables import RunnableGenerator
+from langchain_core.runnables.config import merge_configs
+
+from singleflight import to_messages
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {"APITimeoutError", "APIConnectionError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """요청 마감시간 초과 (재시도하지 않음)"""
+
+
+# =================================================================
+# 마감시간
+# =================================================================
+class Deadline:
+    """절대 마감 시각 (time.monotonic 기준)"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    def check(self):
+        """이미 지났으면 DeadlineExceeded"""
+        if self.remaining() <= 0:
+            raise DeadlineExceeded("요청 마감시간 초과")
+
+
+_current_deadline = contextvars.ContextVar("llm_deadline", default=None)
+
+
+def current_deadline():
+    """지금 실행 중인 요청의 마감시간 (없으면 None)"""
+    return _current_deadline.get()
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds):
+    """
+    블록 안의 모든 LLM 호출이 공유하는 마감시간
+
+    바깥에 더 이른 마감시간이 이미 있으면 그쪽을 유지한다.
+    """
+    deadline = Deadline(seconds)
+    outer = _current_deadline.get()
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+# =================================================================
+# 재시도 판단
+# =================================================================
+def is_retryable(error):
+    """일시적인 오류인지 (429, 5xx, 타임아웃, 연결 오류)"""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # openai / httpx 를 직접 import 하지 않고 클래스 이름으로 판단 (하위 클래스 포함)
+    return any(cls.__name__ in RETRYABLE_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error):
+    """오류 응답의 Retry-After 헤더 (초), 없으면 None"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=0.5, max_delay=8.0):
+    """지수 백오프 + full jitter: 0 ~ min(max_delay, base * 2^attempt)"""
+    return random.uniform(0, min(max_delay, base * (2 ** attempt)))
+
+
+def tagged_config(config, **metadata):
+    """호출 config 에 metadata 추가 (시도 번호 / 헤징 여부 → telemetry 에서 재시도 집계)"""
+    return merge_configs(config, {"metadata": metadata})
+
+
+class LatencyWindow:
+    """최근 N 개 지연시간으로 p95 계산 (헤징 시점)"""
+
+    def __init__(self, size=200):
+        self.size = size
+        self.values = []
+        self._lock = threading.Lock()
+
+    def add(self, value):
+        with self._lock:
+            self.values.append(value)
+            del self.values[:-self.size]
+
+    def percentile(self, p):
+        with self._lock:
+            ordered = sorted(self.values)
+        if not ordered:
+            return None
+        rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[rank]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# =================================================================
+# LLM 래퍼
+# =================================================================
+class ResilientLLM:
+    """
+    마감시간 / 재시도 / 헤징을 적용한 채팅 모델 래퍼
+
+    감싸는 모델은 자체 재시도를 끄고(ChatOpenAI(max_retries=0)) 쓰는 것을 권장
+    (재시도가 두 겹이 되면 마감시간을 예측할 수 없음).
+
+    Args:
+        llm: 채팅 모델 (bind_tools 결과도 가능)
+        timeout (float): 호출 한 번의 최대 시간 (바깥 deadline_scope 가 더 짧으면 그쪽)
+        max_retries (int): 재시도 횟수
+        hedge (bool): p95 지연이 지나면 같은 요청을 하나 더 보낼지
+        hedge_min_samples (int): 이만큼 지연시간이 쌓여야 헤징 시작 (그 전엔 p95 를 모름)
+        hedge_floor (float): 헤징 대기 최소값 (너무 이른 중복 요청 방지)
+    """
+
+    def __init__(self, llm, timeout=30.0, max_retries=3, hedge=True, hedge_min_samples=20,
+                 hedge_floor=0.5, backoff_base=0.5, backoff_max=8.0):
+        self.llm = llm
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_floor = hedge_floor
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.latencies = LatencyWindow()
+        self.stats = {"calls": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0}
+        self._pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _deadline(self):
+        """바깥 마감시간과 호출별 타임아웃 중 이른 쪽"""
+        deadline = Deadline(self.timeout)
+        outer = current_deadline()
+        if outer is not None and outer.expires_at < deadline.expires_at:
+            return outer
+        return deadline
+
+    def _hedge_delay(self):
+        """헤징 대기 시간 (p95), 샘플이 모자라면 None"""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_floor, self.latencies.percentile(95))
+
+    def _wait_before_retry(self, error, attempt, deadline):
+        """재시도할 수 있으면 쉴 시간(초), 재시도하면 안 되면 None"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = retry_after(error)
+        if delay is None:
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        if delay >= deadline.remaining():
+            return None
+        self._count("retries")
+        return delay
+
+    def _expired(self):
+        self._count("deadline_exceeded")
+        return DeadlineExceeded("LLM 응답이 마감시간 안에 오지 않음")
+
+    # ---------- 동기 호출 (스레드 헤징) ----------
+    def _call_once(self, messages, timeout, config):
+        started = time.perf_counter()
+        response = self.llm.bind(timeout=timeout).invoke(messages, config=config)
+        self.latencies.add(time.perf_counter() - started)
+        return response
+
+    def _hedged_call(self, messages, deadline, config):
+        remaining = deadline.remaining()
+        primary = self._pool.submit(self._call_once, messages, remaining, config)
+        pending = {primary}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < remaining:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count("hedges")
+                pending.add(self._pool.submit(self._call_once, messages, deadline.remaining(),
+                                              tagged_config(config, hedge=True)))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline.remaining(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        if error is not None and deadline.remaining() > 0:
+            raise error
+        raise self._expired()
+
+    def invoke(self, value, config=None):
+        """
+        마감시간 안에서 재시도/헤징하며 호출
+
+        Returns:
+            AIMessage
+
+        Raises:
+            DeadlineExceeded: 마감시간 안에 응답을 못 받음
+        """
+        messages = to_messages(value)
+        deadline = self._deadline()
+        self._count("calls")
+        attempt = 0
+        while True:
+            if deadline.remaining() <= 0:
+                raise self._expired()
+            try:
+                return self._hedged_call(messages, deadline, tagged_config(config, attempt=attempt))
+            except DeadlineExceeded:
+                raise
+            except Exception as error:
+                delay = self._wait_before_retry(error, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    # ---------- 비동기 스트리밍 (첫 토큰 기준 헤징) ----------
+    async def _open_stream(self, messages, deadline, config):
+        """스트림을 열고 첫 조각까지 받음 → (첫 조각, 나머지 iterator)"""
+        started = time.perf_counter()
+        stream = self.llm.bind(timeout=deadline.remaining()).astream(messages, config=config)
+        first = await stream.__anext__()
+        self.latencies.add(time.perf_counter() - started)
+        return first, stream
+
+    async def _first_chunk(self, messages, deadline, config):
+        """첫 조각을 먼저 준 스트림 선택 (p95 가 지나면 두 번째 스트림 시작, 진 쪽은 취소)"""
+        primary = asyncio.ensure_future(self._open_stream(messages, deadline, config))
+        started = [primary]
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < deadline.remaining():
+            done, _ = await asyncio.wait(started, timeout=hedge_delay)
+            if not done:
+                self._count("hedges")
+                hedge_config = tagged_config(config, hedge=True)
+                started.append(asyncio.ensure_future(self._open_stream(messages, deadline, hedge_config)))
+
+        winner, error, pending = None, None, set(started)
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, timeout=max(deadline.remaining(), 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None and winner is None:
+                        winner = task
+                    elif task.exception() is not None:
+                        error = task.exception()
+        finally:
+            losers = [task for task in started if task is not winner]
+            for task in losers:
+                task.cancel()
+            # 취소가 끝날 때까지 기다려 예외를 회수하고, 이미 열린 스트림은 닫음
+            for result in await asyncio.gather(*losers, return_exceptions=True):
+                if isinstance(result, tuple):
+                    await result[1].aclose()
+
+        if winner is not None:
+            if winner is not primary:
+                self._count("hedge_wins")
+            return winner.result()
+        if error is not None and deadline.remaining() > 0:
+            raise error
+        raise self._expired()
+
+    async def astream(self, value, config=None):
+        """
+        첫 조각이 오기 전까지의 오류만 재시도/헤징하고, 이후 조각은 그대로 전달
+        (이미 출력한 토큰은 되돌릴 수 없으므로). 조각 사이 대기도 마감시간으로 제한.
+        """
+        messages = to_messages(value)
+        deadline = self._deadline()
+        self._count("calls")
+        attempt = 0
+        while True:
+            if deadline.remaining() <= 0:
+                raise self._expired()
+            try:
+                first, stream = await self._first_chunk(messages, deadline, tagged_config(config, attempt=attempt))
+                break
+            except DeadlineExceeded:
+                raise
+            except Exception as error:
+                delay = self._wait_before_retry(error, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        yield first
+        while True:
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline.remaining(), 0))
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                await stream.aclose()
+                raise self._expired()
+            yield chunk
+
+    async def ainvoke(self, value, config=None):
+        chunks = [chunk async for chunk in self.astream(value, config)]
+        return functools.reduce(operator.add, chunks)
+
+    # ---------- Runnable ----------
+    def _transform(self, inputs, config):
+        value = None
+        for value in inputs:
+            pass
+        yield self.invoke(value, config)
+
+    async def _atransform(self, inputs, config):
+        value = None
+        async for value in inputs:
+            pass
+        async for chunk in self.astream(value, config):
+            yield chunk
+
+    def as_runnable(self):
+        """prompt | llm.as_runnable() | parser 로 쓸 수 있는 Runnable (동기: invoke, 비동기: astream)"""
+        return RunnableGenerator(self._transform, self._atransform)
+
+    def format_stats(self):
+        """한 줄 요약 문자열"""
+        s = self.stats
+        p95 = self.latencies.percentile(95)
+        p95_text = f"{p95:.2f}s" if p95 is not None else "-"
+        return (f"LLM 호출 {s['calls']}회 · 재시도 {s['retries']}회 · 헤징 {s['hedges']}회"
+                f"(중복 요청이 이김 {s['hedge_wins']}회) · 마감 초과 {s['deadline_exceeded']}회 · p95 {p95_text}")
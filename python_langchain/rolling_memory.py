@@ -0,0 +1,274 @@
+"""
+토큰 예산 기반 대화 메모리 (최근 대화 원문 + 이전 대화 요약)
+
+multiturn.py / test.py / memory3.py / memory3-1.py / chatbot4.py 는 모든 질문/답변을
+history 리스트에 계속 붙이고 매 턴 전부 다시 보냈다.
+턴이 쌓일수록 프롬프트 길이, 지연시간, 비용이 선형으로 늘고 결국 컨텍스트 한도를 넘는다.
+
+여기서는
+1. 최근 대화는 원문 그대로 max_tokens 토큰까지만 유지하고
+2. 예산을 넘는 오래된 턴은 (질문, 답변) 단위로 떼어서 기존 요약에 덧붙여 요약을 갱신하며
+3. 예산 확인은 LLM 호출 직전마다 tiktoken 으로 센다 (이번 질문 길이 포함).
+
+BackgroundSummaryMemory 는 같은 요약을 백그라운드 스레드에서 묶어서 갱신해,
+사용자 턴이 요약 호출을 기다리지 않는다.
+
+사용 예시:
+    memory = RollingMemory(max_tokens=1500)
+    history = memory.load(user_input)           # [요약] + 최근 대화 (예산 이내)
+    response = chain.invoke({"input": user_input, "chat_history": history})
+    memory.save(user_input, response.content)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from context_packer import DEFAULT_MODEL, count_tokens, truncate_tokens
+
+MESSAGE_OVERHEAD = 4  # 메시지마다 붙는 역할/구분 토큰 (대략값)
+SUMMARY_HEADER = "이전 대화 요약:\n"
+
+SUMMARY_TEMPLATE = """아래는 지금까지의 대화 요약과, 요약에 새로 합쳐야 할 이전 대화입니다.
+두 내용을 합쳐 갱신된 요약을 작성하세요.
+
+규칙:
+- 사용자의 이름, 취향, 요청, 결정된 사항, 추천받은 항목 같은 사실은 빠짐없이 남기세요.
+- 인사말이나 반복되는 설명은 빼세요.
+- {max_tokens} 토큰 이내의 한국어 문단으로 작성하세요.
+
+기존 요약:
+{summary}
+
+새로 합칠 대화:
+{transcript}
+
+갱신된 요약:"""
+
+
+def message_tokens(message, model=DEFAULT_MODEL):
+    """메시지 하나의 토큰 수 (내용 + 메시지 구분 토큰)"""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content, model) + MESSAGE_OVERHEAD
+
+
+def format_transcript(messages):
+    """메시지 목록 → '사용자: ... / AI: ...' 텍스트"""
+    names = {"human": "사용자", "ai": "AI", "system": "시스템"}
+    return "\n".join(f"{names.get(m.type, m.type)}: {m.content}" for m in messages)
+
+
+class RollingMemory:
+    """
+    최근 max_tokens 토큰은 원문, 그 이전 대화는 요약 하나로 접는 대화 메모리
+
+    Args:
+        llm: 요약용 채팅 모델 (None 이면 처음 요약할 때 gpt-4o-mini 생성)
+        max_tokens (int): 요약 + 최근 대화 + 이번 질문이 넘지 않을 토큰 예산
+        summary_max_tokens (int): 요약 길이 상한 (넘으면 잘라냄)
+        min_turns (int): 예산을 넘어도 원문으로 남길 최근 턴 수
+        model (str): 토큰 계산용 모델 이름
+    """
+
+    def __init__(self, llm=None, max_tokens=2000, summary_max_tokens=300, min_turns=1, model=DEFAULT_MODEL):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.min_turns = min_turns
+        self.model = model
+        self.summary = ""
+        self.messages = []
+        self.stats = {"turns": 0, "summarized_turns": 0, "summary_calls": 0}
+        self._chain = None
+
+    # ---------- 저장 / 불러오기 ----------
+    def save(self, human, ai):
+        """이번 턴 (질문, 답변) 추가"""
+        self.messages.append(HumanMessage(content=human))
+        self.messages.append(AIMessage(content=ai))
+        self.stats["turns"] += 1
+
+    def load(self, pending=""):
+        """
+        예산에 맞춰 오래된 턴을 요약으로 접은 뒤 프롬프트용 메시지 목록 반환
+
+        Args:
+            pending (str): 이번에 보낼 질문 (예산 계산에 포함)
+
+        Returns:
+            list: [SystemMessage(요약)] + 최근 대화 메시지
+        """
+        self.enforce(count_tokens(pending, self.model) + MESSAGE_OVERHEAD if pending else 0)
+        return self.history()
+
+    def history(self):
+        """요약 + 최근 대화 (예산 확인 없이 현재 상태 그대로)"""
+        if not self.summary:
+            return list(self.messages)
+        return [SystemMessage(content=SUMMARY_HEADER + self.summary)] + self.messages
+
+    def transcript(self):
+        """요약 + 최근 대화 전체를 텍스트로 (최종 요약 등에 사용)"""
+        recent = format_transcript(self.messages)
+        if not self.summary:
+            return recent
+        return f"[이전 대화 요약]\n{self.summary}\n\n[최근 대화]\n{recent}"
+
+    def clear(self):
+        self.summary = ""
+        self.messages = []
+
+    # ---------- 예산 ----------
+    def tokens(self):
+        """지금 history() 의 토큰 수"""
+        return sum(message_tokens(m, self.model) for m in self.history())
+
+    def enforce(self, reserve=0):
+        """
+        history() + reserve 가 max_tokens 이하가 되도록 오래된 턴을 요약으로 접음
+
+        요약이 최대 길이(summary_max_tokens)까지 커진다고 보고 필요한 만큼 턴을 한 번에 떼어,
+        요약 호출은 예산을 넘을 때 한 번만 한다. 최근 min_turns 턴은 항상 원문으로 남긴다.
+        """
+        budget = self.max_tokens - reserve
+        if self.tokens() <= budget:
+            return
+
+        summary_cost = self.summary_max_tokens + count_tokens(SUMMARY_HEADER, self.model) + MESSAGE_OVERHEAD
+        recent = sum(message_tokens(m, self.model) for m in self.messages)
+        folded = []
+        while len(self.messages) > 2 * self.min_turns and recent + summary_cost > budget:
+            turn = self.messages[:2]  # (질문, 답변) 한 쌍씩
+            del self.messages[:2]
+            folded.extend(turn)
+            recent -= sum(message_tokens(m, self.model) for m in turn)
+        if folded:
+            self._fold(folded)
+
+    def _fold(self, messages):
+        """떼어낸 턴을 기존 요약에 합쳐 요약 갱신"""
+        self.summary = self._summarize(self.summary, messages)
+        self.stats["summarized_turns"] += len(messages) // 2
+        self.stats["summary_calls"] += 1
+
+    def _summarize(self, summary, messages):
+        """기존 요약 + 떼어낸 턴 → 갱신된 요약 (LLM 호출)"""
+        if self._chain is None:
+            llm = self.llm
+            if llm is None:
+                from langchain_openai import ChatOpenAI
+
+                llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+            self._chain = ChatPromptTemplate.from_template(SUMMARY_TEMPLATE) | llm | StrOutputParser()
+
+        summary = self._chain.invoke({
+            "summary": summary or "(없음)",
+            "transcript": format_transcript(messages),
+            "max_tokens": self.summary_max_tokens,
+        }, config={"metadata": {"step": "memory_summary"}})
+        # 모델이 길이를 넘겨도 예산은 지켜야 하므로 마지막에 잘라냄
+        return truncate_tokens(summary.strip(), self.summary_max_tokens, self.model)
+
+
+class BackgroundSummaryMemory(RollingMemory):
+    """
+    요약을 백그라운드 스레드에서 갱신하는 RollingMemory (사용자 턴이 요약 호출을 기다리지 않음)
+
+    ConversationSummaryMemory 나 RollingMemory 는 요약이 필요한 턴에 LLM 요약 호출이 끝나야 답변을 시작한다.
+    여기서는
+    1. 최근 min_turns 턴을 뺀 오래된 턴이 every_turns 턴 또는 every_tokens 토큰만큼 쌓이면 한 묶음으로 요약을 시작하고
+    2. 요약이 끝나기 전까지는 그 턴들을 원문 그대로 보내며
+    3. 다음 load() 때 끝난 요약이 있으면 그 버전으로 바꾼다 (요약은 한 번에 하나씩, 그동안 쌓인 턴은 다음 묶음).
+
+    토큰 상한은 max_tokens 대신 every_tokens 로 정해진다 (요약 + 대기 중인 턴 + 다음 묶음 분량).
+
+    Args:
+        llm: 요약용 채팅 모델 (None 이면 처음 요약할 때 gpt-4o-mini 생성)
+        every_turns (int): 요약을 시작할 오래된 턴 수
+        every_tokens (int): 요약을 시작할 오래된 턴의 토큰 수
+        **kwargs: RollingMemory 인자 (summary_max_tokens, min_turns, model)
+    """
+
+    def __init__(self, llm=None, every_turns=4, every_tokens=1500, **kwargs):
+        super().__init__(llm=llm, **kwargs)
+        self.every_turns = every_turns
+        self.every_tokens = every_tokens
+        self.stats["stale_loads"] = 0  # 요약이 진행 중이라 이전 버전으로 답한 횟수
+        self._executor = None
+        self._future = None
+        self._pending = 0  # 요약 중인 메시지 수 (self.messages 앞쪽)
+
+    def save(self, human, ai):
+        super().save(human, ai)
+        self._collect()
+        self._schedule()
+
+    def load(self, pending=""):
+        """끝난 요약이 있으면 반영하고 기다리지 않고 바로 [요약] + 최근 대화 반환"""
+        self._collect()
+        self._schedule()
+        if self._future is not None:
+            self.stats["stale_loads"] += 1
+        return self.history()
+
+    def wait(self, timeout=None):
+        """진행 중인 요약이 있으면 끝날 때까지 기다려 반영"""
+        self._collect(wait=True, timeout=timeout)
+        return self.summary
+
+    def flush(self, timeout=None):
+        """진행 중인 요약을 기다리고, 조건에 못 미친 오래된 턴도 모두 요약에 반영"""
+        self.wait(timeout)
+        if self._schedule(force=True):
+            self.wait(timeout)
+        return self.summary
+
+    def clear(self):
+        super().clear()
+        self._future = None  # 진행 중인 요약 결과는 버림
+        self._pending = 0
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # ---------- 백그라운드 요약 ----------
+    def _schedule(self, force=False):
+        """조건을 넘으면 오래된 턴 묶음의 요약 시작 (진행 중인 요약이 있으면 다음으로 미룸)"""
+        if self._future is not None:
+            return False
+        batch = self.messages[:max(len(self.messages) - 2 * self.min_turns, 0)]
+        if not batch:
+            return False
+        tokens = sum(message_tokens(m, self.model) for m in batch)
+        if not force and len(batch) // 2 < self.every_turns and tokens < self.every_tokens:
+            return False
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        self._pending = len(batch)
+        self._future = self._executor.submit(self._summarize, self.summary, list(batch))
+        return True
+
+    def _collect(self, wait=False, timeout=None):
+        """끝난 요약을 반영 (wait=False 면 아직 안 끝났을 때 그냥 넘어감)"""
+        if self._future is None or (not wait and not self._future.done()):
+            return
+        try:
+            summary = self._future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return
+        except Exception as e:
+            # 요약이 실패해도 턴은 원문으로 남아 있으므로 다음 턴에 다시 시도
+            print(f"⚠ 대화 요약 실패: {e}")
+        else:
+            self.summary = summary
+            del self.messages[:self._pending]
+            self.stats["summarized_turns"] += self._pending // 2
+            self.stats["summary_calls"] += 1
+        self._future = None
+        self._pending = 0
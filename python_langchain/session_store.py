@@ -0,0 +1,165 @@
+"""
+SQLite 기반 세션별 대화 기록 저장소 (RunnableWithMessageHistory 용)
+
+chatbot6.get_session_history 는 ChatMessageHistory 를 st.session_state.store 에 두어서
+- 앱을 재시작하면 기록이 사라지고, 다른 워커(프로세스)에서는 보이지 않았으며
+- 사이드바 user_id 대신 고정된 SESSION_ID = "K" 하나만 써서 모든 사용자가 같은 기록을 공유했고
+- 메모리 안의 기록이 끝없이 커졌다.
+
+여기서는
+1. 메시지를 SQLite 테이블에 한 줄씩 추가만 함 (append-only, WAL 모드라 여러 프로세스가 같이 사용)
+2. 세션 기록을 처음 읽을 때 최근 max_messages 개만 불러옴 (lazy load)
+3. 자주 쓰는 세션 max_sessions 개만 프로세스 메모리에 두고 나머지는 LRU 로 내보냄
+   → 메모리 사용량 상한 = max_sessions × max_messages 메시지
+
+사용 예시:
+    store = SQLiteHistoryStore("chat_history.db")
+    chain_with_history = RunnableWithMessageHistory(chain, store.get, input_messages_key="input",
+                                                    history_messages_key="history")
+    chain_with_history.invoke({"input": "안녕"}, config={"configurable": {"session_id": user_id}})
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+
+class SQLiteChatHistory(BaseChatMessageHistory):
+    """
+    세션 하나의 대화 기록 (최근 max_messages 개만 메모리에 보관)
+
+    다른 워커가 같은 세션에 메시지를 추가했으면 다음 읽기 때 마지막 id 를 비교해 다시 불러온다.
+    """
+
+    def __init__(self, store, session_id, max_messages):
+        self.store = store
+        self.session_id = session_id
+        self.max_messages = max_messages
+        self._messages = None  # 처음 읽을 때까지 불러오지 않음
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, messages):
+        """최근 max_messages 개만, 앞쪽이 AI 답변으로 시작하면 짝이 맞도록 한 개 더 버림"""
+        messages = messages[-self.max_messages:]
+        while messages and messages[0].type != "human":
+            messages = messages[1:]
+        return messages
+
+    @property
+    def messages(self):
+        with self._lock:
+            last_id = self.store.last_id(self.session_id)
+            if self._messages is None or last_id != self._last_id:
+                self._messages = self._trim(self.store.load(self.session_id, self.max_messages))
+                self._last_id = last_id
+            return list(self._messages)
+
+    def add_messages(self, messages):
+        """메시지 추가 (DB 에 바로 기록, 메모리 창은 최근 max_messages 개로 유지)"""
+        messages = list(messages)
+        with self._lock:
+            stale = self._messages is None or self.store.last_id(self.session_id) != self._last_id
+            self._last_id = self.store.append(self.session_id, messages)
+            if stale:
+                # 다른 워커의 추가분이 있거나 아직 안 읽었으면 다음 읽기 때 다시 불러옴
+                self._messages = None
+            else:
+                self._messages = self._trim(self._messages + messages)
+
+    def clear(self):
+        with self._lock:
+            self.store.delete(self.session_id)
+            self._messages = []
+            self._last_id = 0
+
+
+class SQLiteHistoryStore:
+    """
+    세션 id → SQLiteChatHistory (최근 사용한 max_sessions 개만 메모리에 유지)
+
+    Args:
+        path (str): SQLite 파일 경로
+        max_sessions (int): 메모리에 둘 세션 수 (넘으면 가장 오래 안 쓴 세션부터 내보냄)
+        max_messages (int): 세션마다 불러올/보관할 최근 메시지 수
+    """
+
+    def __init__(self, path, max_sessions=256, max_messages=40):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # 읽기와 쓰기가 서로 막지 않음 (여러 워커)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, ts REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+        self._conn.commit()
+        self.stats = {"hits": 0, "loads": 0, "evictions": 0}
+
+    def get(self, session_id):
+        """세션 기록 (RunnableWithMessageHistory 의 get_session_history 로 바로 사용)"""
+        with self._lock:
+            history = self._sessions.get(session_id)
+            if history is not None:
+                self._sessions.move_to_end(session_id)
+                self.stats["hits"] += 1
+                return history
+            history = SQLiteChatHistory(self, session_id, self.max_messages)
+            self._sessions[session_id] = history
+            self.stats["loads"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)  # 내용은 이미 DB 에 있으므로 버리기만 함
+                self.stats["evictions"] += 1
+            return history
+
+    def __call__(self, session_id):
+        return self.get(session_id)
+
+    # ---------- DB ----------
+    def last_id(self, session_id):
+        """세션의 마지막 메시지 id (없으면 0), 인덱스만 읽음"""
+        with self._db_lock:
+            row = self._conn.execute("SELECT MAX(id) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] or 0
+
+    def load(self, session_id, limit):
+        """세션의 최근 limit 개 메시지 (오래된 것부터)"""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT data FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?", (session_id, limit)
+            ).fetchall()
+        return messages_from_dict([json.loads(data) for (data,) in reversed(rows)])
+
+    def append(self, session_id, messages):
+        """메시지 추가 (한 트랜잭션), 마지막으로 추가한 id 반환"""
+        now = time.time()
+        last = 0
+        with self._db_lock, self._conn:
+            for message in messages:
+                cursor = self._conn.execute(
+                    "INSERT INTO messages (session_id, ts, data) VALUES (?, ?, ?)",
+                    (session_id, now, json.dumps(message_to_dict(message), ensure_ascii=False)),
+                )
+                last = cursor.lastrowid
+        return last or self.last_id(session_id)
+
+    def delete(self, session_id):
+        with self._db_lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def sessions(self):
+        """저장된 세션 id 와 메시지 수"""
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT session_id, COUNT(*) FROM messages GROUP BY session_id ORDER BY MAX(id) DESC"
+            ).fetchall()
@@ -0,0 +1,208 @@
+"""
+코퍼스별 샤드 인덱스 + 병렬 팬아웃 검색
+
+ragChat.init_rag 는 서울 도시계획(data.pdf)과 OneNYC 2050 계획을 하나의 컬렉션에 합쳐서
+- 모든 질문이 두 문서를 전부 검색하고
+- 문서 하나만 바뀌어도 둘 다 다시 임베딩한다.
+
+여기서는 코퍼스마다 별도 Chroma 컬렉션(샤드)을 두고
+1. 파일 지문(크기+수정시각)이 바뀐 샤드만 다시 구축
+2. 라우터가 질문과 관련 없다고 판단한 샤드는 건너뜀
+3. 남은 샤드를 스레드로 동시에 검색하고 점수순으로 상위 k 개를 합침
+
+사용 예시:
+    index = ShardedIndex([
+        CorpusShard("seoul", ["data.pdf"], keywords=["서울", "seoul"]),
+        CorpusShard("nyc", ["OneNYC_2050_Strategic_Plan.pdf"], keywords=["뉴욕", "nyc", "new york"]),
+    ], embeddings)
+    index.build()
+    retriever = index.as_retriever(k=3)
+"""
+
+# pip install langchain-chroma langchain-community pymupdf
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_chroma import Chroma
+from langchain_community.document_loaders import PyMuPDFLoader
+from langchain_core.runnables import RunnableLambda
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+MANIFEST_FILE = "shard_manifest.json"
+
+
+class CorpusShard:
+    """
+    코퍼스 하나(= 샤드 하나)의 설정
+
+    Args:
+        name (str): 샤드 이름 (컬렉션 이름/폴더 이름으로 사용)
+        files (list): 이 샤드에 들어갈 PDF 파일 경로
+        keywords (list): 라우터가 이 샤드를 고를 때 쓰는 키워드 (소문자 비교)
+        chunk_size (int), chunk_overlap (int): 분할 설정
+    """
+
+    def __init__(self, name, files, keywords=None, chunk_size=1000, chunk_overlap=100):
+        self.name = name
+        self.files = list(files)
+        self.keywords = [kw.lower() for kw in (keywords or [])]
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.store = None  # build() 후 Chroma 벡터스토어
+
+    def fingerprint(self):
+        """파일 경로/크기/수정시각 + 분할 설정으로 만든 지문 (바뀌면 재구축)"""
+        h = hashlib.sha256(f"{self.chunk_size}:{self.chunk_overlap}".encode())
+        for f in sorted(self.files):
+            if os.path.exists(f):
+                stat = os.stat(f)
+                h.update(f"{f}:{stat.st_size}:{int(stat.st_mtime)}".encode())
+            else:
+                h.update(f"{f}:missing".encode())
+        return h.hexdigest()
+
+    def load_splits(self):
+        """샤드 파일을 읽어 청크로 분할"""
+        docs = []
+        for f in self.files:
+            if os.path.exists(f):
+                # PyMuPDFLoader는 한글 인식률이 매우 높습니다
+                docs.extend(PyMuPDFLoader(f).load())
+        for doc in docs:
+            doc.metadata["shard"] = self.name
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, add_start_index=True
+        )
+        return splitter.split_documents(docs)
+
+
+def keyword_router(query, shards):
+    """
+    키워드 기반 라우터
+
+    질문에 특정 샤드의 키워드가 들어 있으면 그 샤드들만, 아무 키워드도 없으면 전체 샤드를 반환.
+    (어느 쪽인지 모를 때는 빠뜨리지 않도록 모두 검색)
+    """
+    q = query.lower()
+    matched = [s for s in shards if any(kw in q for kw in s.keywords)]
+    return matched or list(shards)
+
+
+class ShardedIndex:
+    """
+    샤드별 Chroma 컬렉션을 묶어서 하나의 검색기처럼 사용
+
+    Args:
+        shards (list): CorpusShard 리스트
+        embeddings: LangChain 임베딩 모델
+        base_directory (str): 샤드 폴더들의 상위 폴더 (샤드마다 하위 폴더 사용)
+        router (callable): (query, shards) → 검색할 샤드 리스트
+        max_workers (int): 동시 검색 스레드 수
+    """
+
+    def __init__(self, shards, embeddings, base_directory="./chroma_shards", router=keyword_router, max_workers=4):
+        self.shards = {s.name: s for s in shards}
+        self.embeddings = embeddings
+        self.base_directory = base_directory
+        self.router = router
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    # ---------------- 구축 ----------------
+    def _shard_dir(self, shard):
+        return os.path.join(self.base_directory, shard.name)
+
+    def _read_manifest(self, shard):
+        path = os.path.join(self._shard_dir(shard), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self, shard, manifest):
+        with open(os.path.join(self._shard_dir(shard), MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    def _open_store(self, shard):
+        return Chroma(
+            collection_name=shard.name,
+            embedding_function=self.embeddings,
+            persist_directory=self._shard_dir(shard),
+            collection_metadata={"hnsw:space": "cosine"},  # 점수를 코사인 유사도로 해석하기 위함
+        )
+
+    def build(self, names=None, force=False):
+        """
+        샤드 구축/로드 (지문이 같으면 기존 컬렉션 재사용)
+
+        Args:
+            names (list): 대상 샤드 이름 (None 이면 전체)
+            force (bool): 지문과 상관없이 재구축
+
+        Returns:
+            list: 이번에 재구축한 샤드 이름
+        """
+        rebuilt = []
+        for name in names or list(self.shards):
+            shard = self.shards[name]
+            os.makedirs(self._shard_dir(shard), exist_ok=True)
+            fingerprint = shard.fingerprint()
+            store = self._open_store(shard)
+
+            if not force and self._read_manifest(shard).get("fingerprint") == fingerprint:
+                print(f"✓ 샤드 '{name}' 변경 없음, 기존 인덱스 사용")
+                shard.store = store
+                continue
+
+            # 변경된 샤드만 컬렉션을 비우고 다시 임베딩
+            store.delete_collection()
+            store = self._open_store(shard)
+            splits = shard.load_splits()
+            if splits:
+                store.add_documents(splits)
+            self._write_manifest(shard, {"fingerprint": fingerprint, "chunks": len(splits), "files": shard.files})
+            shard.store = store
+            rebuilt.append(name)
+            print(f"✓ 샤드 '{name}' 재구축 완료 ({len(splits)}개 청크)")
+        return rebuilt
+
+    def available(self):
+        """구축되어 검색 가능한 샤드"""
+        return [s for s in self.shards.values() if s.store is not None]
+
+    # ---------------- 검색 ----------------
+    def search_with_scores(self, query, k=3):
+        """
+        관련 샤드에 병렬로 질의하고 상위 k 개를 합쳐서 반환
+
+        질문 임베딩은 한 번만 계산해서 모든 샤드가 공유한다.
+
+        Returns:
+            list: (Document, score) 리스트, score 는 코사인 유사도
+        """
+        targets = self.router(query, self.available())
+        if not targets:
+            return []
+
+        vector = self.embeddings.embed_query(query)
+
+        def search(shard):
+            # cosine 공간의 Chroma 거리 = 1 - 코사인 유사도
+            results = shard.store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+            return [(doc, 1.0 - distance) for doc, distance in results]
+
+        merged = []
+        for results in self.pool.map(search, targets):
+            merged.extend(results)
+        merged.sort(key=lambda pair: pair[1], reverse=True)
+        return merged[:k]
+
+    def search(self, query, k=3):
+        """점수 없이 문서만 반환"""
+        return [doc for doc, _ in self.search_with_scores(query, k=k)]
+
+    def as_retriever(self, k=3):
+        """retriever.invoke(query) 로 쓸 수 있는 Runnable 반환"""
+        return RunnableLambda(lambda query: self.search(query, k=k))
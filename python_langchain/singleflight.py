@@ -0,0 +1,178 @@
+"""
+동일 요청 합치기 (singleflight)
+
+여러 사용자가 gamebot.py 사이드바의 같은 버튼("Tick Rate (틱레이트)")을 동시에 누르면
+똑같은 chain.invoke 가 N 번 나가서 같은 답을 N 번 생성했다.
+
+같은 (모델, 파라미터, 메시지) 요청이 이미 진행 중이면 새로 호출하지 않고
+진행 중인 한 번의 응답을 모든 대기자에게 나눠 준다.
+- 스트리밍: 먼저 도착한 요청(리더)이 받은 토큰 조각을 버퍼에 쌓고,
+  나중에 합류한 요청은 버퍼 처음부터 따라 읽은 뒤 이어지는 토큰을 같이 받음
+- 완료된 요청은 목록에서 빠짐 (결과 캐시가 아니라 "진행 중" 요청만 합침)
+- 업스트림 오류는 모든 대기자에게 그대로 전달
+
+사용 예시:
+    coalesced = CoalescingChatModel(llm)
+    chain = prompt | coalesced.as_runnable() | StrOutputParser()
+    for token in chain.stream({"question": q}): ...
+"""
+
+import functools
+import hashlib
+import json
+import operator
+import threading
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableGenerator
+
+
+class _Flight:
+    """진행 중인 요청 하나의 토큰 버퍼"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def push(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """버퍼 처음부터 끝까지 읽고, 완료될 때까지 새 조각을 기다리며 전달"""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+                new = self.chunks[index:]
+                finished, error = self.done, self.error
+            for chunk in new:
+                yield chunk
+            index += len(new)
+            if finished and index >= len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+
+class SingleFlight:
+    """키별로 진행 중인 요청을 하나로 합치는 관리자 (스레드 안전)"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.stats = {"upstream_calls": 0, "coalesced": 0}
+
+    def stream(self, key, start):
+        """
+        key 가 같은 진행 중 요청이 있으면 합류, 없으면 start() 로 새 업스트림 스트림 시작
+
+        업스트림은 별도 스레드에서 끝까지 읽으므로, 먼저 온 사용자가 화면을 떠나도
+        나중에 합류한 사용자는 끝까지 응답을 받는다.
+
+        Args:
+            key (str): 요청 키
+            start: () → 조각 iterator
+
+        Yields:
+            업스트림 조각
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats["upstream_calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if leader:
+            threading.Thread(target=self._run, args=(key, flight, start), daemon=True).start()
+        yield from flight.subscribe()
+
+    def _run(self, key, flight, start):
+        try:
+            for chunk in start():
+                flight.push(chunk)
+        except Exception as error:
+            flight.finish(error)
+        else:
+            flight.finish()
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def in_flight(self):
+        """현재 진행 중인 요청 수"""
+        with self._lock:
+            return len(self._flights)
+
+
+# =================================================================
+# 채팅 모델 앞단
+# =================================================================
+def to_messages(value):
+    """PromptValue / 문자열 / 메시지 리스트 → 메시지 리스트"""
+    if hasattr(value, "to_messages"):
+        return value.to_messages()
+    if isinstance(value, str):
+        return [HumanMessage(content=value)]
+    return list(value)
+
+
+def request_key(llm, messages):
+    """모델 + 호출 파라미터 + 메시지 내용 해시"""
+    params = getattr(llm, "_identifying_params", {}) or {}
+    payload = {
+        "params": params,
+        "messages": [(m.type, m.content, getattr(m, "tool_calls", None) or None) for m in messages],
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CoalescingChatModel:
+    """
+    같은 요청이 진행 중이면 업스트림 호출 하나를 공유하는 채팅 모델 래퍼
+
+    invoke 와 stream 모두 업스트림은 llm.stream 으로 호출하므로,
+    일반 호출과 스트리밍 호출이 같은 요청이면 서로 합쳐진다.
+
+    Args:
+        llm: 채팅 모델 (ChatOpenAI 등)
+        flight (SingleFlight): 공유 관리자 (여러 세션이 같은 객체를 써야 합쳐짐)
+    """
+
+    def __init__(self, llm, flight=None):
+        self.llm = llm
+        self.flight = flight or SingleFlight()
+
+    def stream(self, value):
+        messages = to_messages(value)
+        key = request_key(self.llm, messages)
+        yield from self.flight.stream(key, lambda: self.llm.stream(messages))
+
+    def invoke(self, value):
+        return functools.reduce(operator.add, self.stream(value))
+
+    def _transform(self, inputs):
+        # 프롬프트는 PromptValue 하나를 통째로 넘김 (마지막 값 사용)
+        value = None
+        for value in inputs:
+            pass
+        yield from self.stream(value)
+
+    def as_runnable(self):
+        """prompt | coalesced.as_runnable() | parser 로 쓸 수 있는 Runnable (invoke / stream 지원)"""
+        return RunnableGenerator(self._transform)
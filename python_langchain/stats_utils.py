@@ -0,0 +1,17 @@
+"""
+측정 결과 집계용 공통 함수
+
+vector_bench.py / batch_qa.py / telemetry.py 가 같이 쓴다.
+(무거운 모듈을 import 하지 않도록 표준 라이브러리만 사용)
+"""
+
+import math
+
+
+def percentile(values, p, default=0.0):
+    """p 백분위수 (nearest-rank 방식), 값이 없으면 default"""
+    if not values:
+        return default
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[rank]
@@ -18,10 +18,14 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from resilience import ResilientLLM, DeadlineExceeded, deadline_scope
 
 # 환경 변수 로드
 load_dotenv()
 
+AGENT_DEADLINE = 60  # 질문 하나에 대한 Agent 전체 마감시간 (초)
+LLM_TIMEOUT = 20  # LLM 호출 한 번의 최대 시간 (초)
+
 def main():
     """
     반복추론이 가능한 agent 구현 및 실행
@@ -33,8 +37,8 @@ def main():
         print('# api key none. plz check your api key')
         return
 
-    # 모델 생성
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    # 모델 생성 (재시도는 ResilientLLM 이 마감시간 안에서 하므로 클라이언트 자체 재시도는 끔)
+    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, max_retries=0)
 
     # Tavily 검색 도구 생성 (오타 수정: TavilySearchResults)
     search_tool = TavilySearchResults(
@@ -50,8 +54,8 @@ def main():
     tools = [search_tool]
     tool_dict = {search_tool.name: search_tool}
 
-    # llm 모델에 도구 바인딩
-    llm_with_tools = llm.bind_tools(tools)
+    # llm 모델에 도구 바인딩 + 호출별 타임아웃 / 재시도 / 헤징
+    llm_with_tools = ResilientLLM(llm.bind_tools(tools), timeout=LLM_TIMEOUT)
 
     # 질문 리스트
     questions = [
@@ -67,6 +71,8 @@ def main():
         run_agent(q, llm, llm_with_tools, tool_dict, max_iteration=5)
         print('-'*50)
 
+    print(f"# {llm_with_tools.format_stats()}")
+
 def run_agent(question, llm, llm_with_tools, tool_dict, max_iteration=5):
     """
     Agent 반복 추론 루프 (실제 동작 로직)
@@ -93,41 +99,43 @@ def run_agent(question, llm, llm_with_tools, tool_dict, max_iteration=5):
 
     iteration_count = 0
 
-    for i in range(max_iteration):
-        iteration_count += 1  # 루프 시작하자마자 1부터 카운트!
-        response = llm_with_tools.invoke(messages)
-
-        
-    # 2. (생략되었던 부분) 루프 구현
-    for i in range(max_iteration):
-        # LLM에게 현재 상황 판단 요청
-        response = llm_with_tools.invoke(messages)
-        messages.append(response)
-
-        # 도구를 안 써도 된다면(최종 답변 완료) 종료
-        if not response.tool_calls:
-            print(f"A : {response.content}")
-            break
-
-        # 도구를 써야 한다면(추가 정보 필요) 실행
-        for tool_call in response.tool_calls:
-            print(f"[시스템] 도구 호출 중: {tool_call['name']}...")
+    # 2. 루프 구현 (LLM 호출과 재시도는 모두 AGENT_DEADLINE 안에서)
+    try:
+        with deadline_scope(AGENT_DEADLINE) as deadline:
+            for i in range(max_iteration):
+                iteration_count += 1  # 루프 시작하자마자 1부터 카운트!
+                # 도구 실행으로 시간을 다 썼으면 LLM 을 부르지 않음
+                deadline.check()
+                # LLM에게 현재 상황 판단 요청
+                response = llm_with_tools.invoke(messages)
+                messages.append(response)
+
+                # 도구를 안 써도 된다면(최종 답변 완료) 종료
+                if not response.tool_calls:
+                    print(f"A : {response.content}")
+                    break
+
+                # 도구를 써야 한다면(추가 정보 필요) 실행
+                for tool_call in response.tool_calls:
+                    print(f"[시스템] 도구 호출 중: {tool_call['name']}...")
             
-            # 도구 이름에 맞는 함수 찾아 실행
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            actual_tool = tool_dict[tool_name]
+                    # 도구 이름에 맞는 함수 찾아 실행
+                    tool_name = tool_call["name"]
+                    tool_args = tool_call["args"]
+                    actual_tool = tool_dict[tool_name]
             
-            # 검색 결과 얻기
-            observation = actual_tool.invoke(tool_args)
+                    # 검색 결과 얻기
+                    observation = actual_tool.invoke(tool_args)
             
-            # 검색 결과를 메시지 기록에 추가 (그래야 AI가 읽고 다음 판단을 함)
-            messages.append(ToolMessage(
-                content=str(observation),
-                tool_call_id=tool_call["id"]
-            ))
-
-            print(f"💡 이 답변을 위해 총 {iteration_count}번의 추론(루프)을 거쳤습니다.")
+                    # 검색 결과를 메시지 기록에 추가 (그래야 AI가 읽고 다음 판단을 함)
+                    messages.append(ToolMessage(
+                        content=str(observation),
+                        tool_call_id=tool_call["id"]
+                    ))
+
+                    print(f"💡 이 답변을 위해 총 {iteration_count}번의 추론(루프)을 거쳤습니다.")
+    except DeadlineExceeded:
+        print(f"⏱ {AGENT_DEADLINE}초 안에 답변을 완성하지 못했습니다. 잠시 후 다시 시도해주세요.")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -10,10 +10,35 @@ from langchain_openai import ChatOpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
+from prompt_cache import PromptCacheHandler
+from telemetry import TelemetryHandler, open_sink, summarize, format_report
 
 # .env 파일에서 환경 변수 로드
 load_dotenv()
 
+# LLM / 도구 호출 기록 (python telemetry.py telemetry.jsonl 로 단계/모델별 p50/p95/p99 확인)
+TELEMETRY_PATH = os.path.join(os.path.dirname(__file__), "telemetry.jsonl")
+
+# Agent 시스템 지시문 (모든 질문/반복에서 똑같이 맨 앞에 오도록 고정 → 프롬프트 캐시)
+AGENT_SYSTEM_PROMPT = """당신은 검색과 계산을 수행할 수 있는 AI Agent입니다.
+
+        사용 가능한 도구:
+        1. tavily_search_results_json: 최신 정보를 웹에서 검색합니다.
+        2. python_calculator: 수학 계산을 수행합니다.
+
+        주요 역할:
+        - 질문을 분석하여 필요한 도구를 선택합니다.
+        - 검색이 필요하면 검색 도구를, 계산이 필요하면 계산기를 사용합니다.
+        - 여러 도구를 순차적으로 조합하여 복잡한 문제를 해결합니다.
+        - 한국어로 답변합니다.
+
+        도구 사용 전략:
+        - 최신 정보나 실시간 데이터가 필요하면 검색 도구를 사용하세요.
+        - 숫자 계산이 필요하면 계산기 도구를 사용하세요.
+        - 검색 결과의 숫자를 계산해야 한다면 검색 후 계산기를 사용하세요.
+        - 한 번에 하나씩 단계적으로 처리하세요.
+        - 충분한 정보와 계산이 완료되면 최종 답변을 작성하세요."""
+
 
 # 커스텀 도구 정의: Python 계산기
 @tool
@@ -59,11 +84,14 @@ def main():
     
     print(" # API 키 로드 완료\n")
     
-    # 1. LLM 모델 초기화
+    # 1. LLM 모델 초기화 (호출별 프롬프트 캐시 적중 토큰 + 토큰/지연/재시도 기록)
+    cache_stats = PromptCacheHandler()
+    telemetry = TelemetryHandler(open_sink(TELEMETRY_PATH))
     llm = ChatOpenAI(
         model="gpt-4o-mini",
         temperature=0,
-        api_key=openai_api_key
+        api_key=openai_api_key,
+        callbacks=[cache_stats, telemetry]
     )
     print(" # OpenAI LLM 초기화 완료")
     
@@ -110,11 +138,15 @@ def main():
         print(f"질문: {question}")
         print(f"{'='*70}\n")
         
-        run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7)
+        run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7, telemetry=telemetry)
         print("\n" + "="*70 + "\n")
+    
+    print(f" # 프롬프트 캐시: {cache_stats.format_summary()}")
+    print(" # 이번 실행 단계별 기록:")
+    print(format_report(summarize(telemetry.records)))
 
 
-def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7):
+def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7, telemetry=None):
     """다중 도구를 사용하는 Agent 반복 추론 루프
     
     이 함수는 여러 도구 중 상황에 맞는 도구를 선택하고 조합하는 방법을 보여줍니다.
@@ -125,28 +157,13 @@ def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7)
         llm_with_tools (ChatOpenAI): 도구가 바인딩된 LLM
         tools (dict): 사용 가능한 도구 딕셔너리
         max_iterations (int): 최대 반복 횟수
+        telemetry (TelemetryHandler): 주면 도구 실행 시간도 기록
     """
     
     # 메시지 히스토리 초기화
+    # [도구 스키마 + 고정 시스템 지시문] 이 항상 앞부분, 질문/도구 결과는 뒤에만 추가됨
     messages = [
-        SystemMessage(content="""당신은 검색과 계산을 수행할 수 있는 AI Agent입니다.
-
-        사용 가능한 도구:
-        1. tavily_search_results_json: 최신 정보를 웹에서 검색합니다.
-        2. python_calculator: 수학 계산을 수행합니다.
-
-        주요 역할:
-        - 질문을 분석하여 필요한 도구를 선택합니다.
-        - 검색이 필요하면 검색 도구를, 계산이 필요하면 계산기를 사용합니다.
-        - 여러 도구를 순차적으로 조합하여 복잡한 문제를 해결합니다.
-        - 한국어로 답변합니다.
-
-        도구 사용 전략:
-        - 최신 정보나 실시간 데이터가 필요하면 검색 도구를 사용하세요.
-        - 숫자 계산이 필요하면 계산기 도구를 사용하세요.
-        - 검색 결과의 숫자를 계산해야 한다면 검색 후 계산기를 사용하세요.
-        - 한 번에 하나씩 단계적으로 처리하세요.
-        - 충분한 정보와 계산이 완료되면 최종 답변을 작성하세요."""),
+        SystemMessage(content=AGENT_SYSTEM_PROMPT),
         HumanMessage(content=question)
     ]
     
@@ -156,7 +173,7 @@ def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7)
         print("-" * 70)
         
         # Step 1: LLM에게 다음 행동 결정 요청
-        ai_msg = llm_with_tools.invoke(messages)
+        ai_msg = llm_with_tools.invoke(messages, config={"metadata": {"step": "agent"}})
         messages.append(ai_msg)
         
         # Step 2: 도구 호출이 있는지 확인
@@ -181,7 +198,9 @@ def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7)
                 # 도구 실행
                 if tool_name in tools:
                     try:
-                        tool_output = tools[tool_name].invoke(tool_args)
+                        tool_output = tools[tool_name].invoke(
+                            tool_args, config={"callbacks": [telemetry] if telemetry else []}
+                        )
                         
                         # 결과 요약 출력
                         if tool_name == "tavily_search_results_json":
@@ -229,9 +248,11 @@ def run_multi_tool_agent(question, llm, llm_with_tools, tools, max_iterations=7)
     print(f"\n  # 최대 반복 횟수({max_iterations})에 도달했습니다.")
     print("마지막 상태로 답변을 생성합니다.\n")
     
-    final_msg = llm.invoke(messages + [
+    # 도구 스키마를 뺀 llm 으로 부르면 앞부분이 달라져 캐시가 깨지므로,
+    # 같은 도구 목록을 유지한 채 도구 호출만 막음
+    final_msg = llm_with_tools.bind(tool_choice="none").invoke(messages + [
         HumanMessage(content="지금까지 수집하고 계산한 정보를 바탕으로 최종 답변을 작성해주세요.")
-    ])
+    ], config={"metadata": {"step": "final_answer"}})
     
     print("="*70)
     print(" # 최종 답변 (강제):")
@@ -0,0 +1,388 @@
+"""
+LLM / 도구 호출 텔레메트리 (토큰, 첫 토큰 시간, 지연, 재시도, 비용)
+
+어디서 시간이 걸리고 토큰이 쓰이는지 알 수 있는 건 run_multi_tool_agent / search_and_answer 의
+print 문뿐이었다. 여기서는 LangChain 콜백으로 호출마다 아래 값을 기록해 로컬 파일에 쌓고,
+단계(step) · 모델별 p50/p95/p99 리포트를 만든다.
+
+기록 필드:
+    ts, kind(llm/tool/step), step, model, prompt_tokens, completion_tokens, cached_tokens,
+    ttft(스트리밍 첫 토큰까지 초), latency, retries, hedged, error, cost(달러 추정)
+
+단계 이름은 config metadata 의 "step" (하위 호출로 상속됨) → 가장 가까운 이름 있는 상위 체인(run_name,
+핸들러를 체인 config 로 넘긴 경우만 보임) → "llm" 순서로 정한다.
+    chain.with_config(metadata={"step": "answer"})
+    llm.invoke(messages, config={"metadata": {"step": "agent"}})
+
+저장소:
+    JsonlSink  : telemetry.jsonl, 크기가 넘으면 telemetry.jsonl.1 ... 로 돌려가며 보관
+    SQLiteSink : telemetry.db, 최근 max_rows 행만 유지
+
+사용 예시:
+    telemetry = TelemetryHandler(open_sink("telemetry.jsonl"))
+    llm = ChatOpenAI(model="gpt-4o-mini", callbacks=[telemetry], stream_usage=True)
+    ...
+    python telemetry.py telemetry.jsonl          # 리포트
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from prompt_cache import cached_tokens
+from stats_utils import percentile
+
+# 100만 토큰당 달러 (입력, 출력), 캐시된 입력은 입력 가격의 절반
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+FIELDS = ["ts", "kind", "step", "model", "prompt_tokens", "completion_tokens", "cached_tokens",
+          "ttft", "latency", "retries", "hedged", "error", "cost"]
+COLUMN_TYPES = {"kind": "TEXT", "step": "TEXT", "model": "TEXT", "error": "TEXT", "prompt_tokens": "INTEGER",
+                "completion_tokens": "INTEGER", "cached_tokens": "INTEGER", "retries": "INTEGER",
+                "hedged": "INTEGER"}
+
+# 단계 이름으로 쓰기엔 의미 없는 기본 Runnable 이름
+GENERIC_NAMES = {"RunnableSequence", "RunnableParallel", "RunnableLambda", "RunnableGenerator",
+                 "RunnablePassthrough", "RunnableAssign", "RunnableBinding", "ChatPromptTemplate",
+                 "StrOutputParser", "_transform", "_atransform", "run", "arun", "invoke"}
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached=0):
+    """모델 가격표로 예상 비용 (모르는 모델은 None)"""
+    prices = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda x: -len(x[0]))
+                   if model and model.startswith(name)), None)
+    if prices is None:
+        return None
+    input_price, output_price = prices
+    uncached = prompt_tokens - cached
+    return (uncached * input_price + cached * input_price / 2 + completion_tokens * output_price) / 1_000_000
+
+
+# =================================================================
+# 저장소
+# =================================================================
+class JsonlSink:
+    """
+    한 줄에 기록 하나씩 쓰는 JSONL 파일 (크기 기준 회전)
+
+    Args:
+        path (str): 파일 경로
+        max_bytes (int): 이 크기를 넘으면 path.1 로 밀어내고 새 파일 시작
+        backups (int): 보관할 이전 파일 수 (path.1 ~ path.N)
+    """
+
+    def __init__(self, path, max_bytes=5_000_000, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    def _rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def read(self):
+        """보관 파일(오래된 것부터) + 현재 파일의 모든 기록"""
+        paths = [f"{self.path}.{index}" for index in range(self.backups, 0, -1)] + [self.path]
+        records = []
+        with self._lock:
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    records.extend(json.loads(line) for line in f if line.strip())
+        return records
+
+
+class SQLiteSink:
+    """
+    SQLite 테이블 하나에 기록 (최근 max_rows 행만 유지)
+
+    Args:
+        path (str): DB 파일 경로
+        max_rows (int): 보관할 최대 행 수 (넘치면 오래된 행부터 삭제)
+    """
+
+    def __init__(self, path, max_rows=100_000):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ", ".join(f"{name} {COLUMN_TYPES.get(name, 'REAL')}" for name in FIELDS)
+        self._conn.execute(f"CREATE TABLE IF NOT EXISTS llm_calls (id INTEGER PRIMARY KEY, {columns})")
+        self._conn.commit()
+
+    def write(self, record):
+        values = [record.get(name) for name in FIELDS]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO llm_calls ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})", values)
+            self._writes += 1
+            if self._writes % 1000 == 0:  # 가끔만 오래된 행 정리
+                self._conn.execute("DELETE FROM llm_calls WHERE id <= (SELECT MAX(id) FROM llm_calls) - ?",
+                                   (self.max_rows,))
+            self._conn.commit()
+
+    def read(self):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(FIELDS)} FROM llm_calls ORDER BY id").fetchall()
+        records = [dict(zip(FIELDS, row)) for row in rows]
+        for record in records:
+            record["hedged"] = bool(record["hedged"])
+        return records
+
+
+def open_sink(path, **kwargs):
+    """확장자가 .db / .sqlite 면 SQLiteSink, 아니면 JsonlSink"""
+    if path.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteSink(path, **kwargs)
+    return JsonlSink(path, **kwargs)
+
+
+# =================================================================
+# 콜백
+# =================================================================
+class TelemetryHandler(BaseCallbackHandler):
+    """
+    LLM / 도구 호출마다 기록 하나를 sink 에 씀
+
+    ChatOpenAI(callbacks=[handler]) 처럼 모델에 붙이거나 invoke 의 config callbacks 로 넘긴다.
+    스트리밍 호출의 토큰 수는 ChatOpenAI(stream_usage=True) 여야 들어옴.
+
+    Args:
+        sink: write(record) 를 가진 저장소 (JsonlSink / SQLiteSink), None 이면 메모리에만 보관
+        max_records (int): 메모리에 보관할 최근 기록 수
+    """
+
+    def __init__(self, sink=None, max_records=1000):
+        self.sink = sink
+        self.max_records = max_records
+        self.records = []
+        self._runs = {}  # run_id → 진행 중 호출 정보
+        self._chains = {}  # run_id → (이름, 상위 run_id)
+        self._lock = threading.Lock()
+
+    # ---------- 단계 이름 ----------
+    def _step(self, parent_run_id, metadata):
+        if (metadata or {}).get("step"):
+            return metadata["step"]
+        run_id = parent_run_id
+        while run_id is not None and run_id in self._chains:
+            name, run_id = self._chains[run_id]
+            if name and name not in GENERIC_NAMES:
+                return name
+        return None
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        self._chains[run_id] = (name, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._chains.pop(run_id, None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._chains.pop(run_id, None)
+
+    # ---------- LLM ----------
+    def _start(self, run_id, parent_run_id, metadata, model, kind, name=None):
+        metadata = metadata or {}
+        hedged = bool(metadata.get("hedge", False))
+        self._runs[run_id] = {
+            "started": time.perf_counter(),
+            "first_token": None,
+            "kind": kind,
+            "step": self._step(parent_run_id, metadata) or name or kind,
+            "model": model,
+            # attempt 는 누적 번호(0, 1, 2...)이므로 이 호출이 재시도인지만 1/0 으로 기록
+            # (같은 attempt 의 헤지 호출은 재시도가 아님 → summarize 합계가 실제 재시도 수와 같아짐)
+            "retries": 1 if metadata.get("attempt", 0) > 0 and not hedged else 0,
+            "hedged": hedged,
+        }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = (metadata or {}).get("ls_model_name") or params.get("model") or params.get("model_name")
+        self._start(run_id, parent_run_id, metadata, model, "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, parent_run_id, metadata, params.get("model_name") or params.get("model"), "llm")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["first_token"] is None:
+            run["first_token"] = time.perf_counter()
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None:
+            run["retries"] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        message = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                break
+            break
+        prompt, cached = cached_tokens(message, response.llm_output)
+        usage = getattr(message, "usage_metadata", None) or {}
+        completion = usage.get("output_tokens")
+        if completion is None:
+            completion = ((response.llm_output or {}).get("token_usage") or {}).get("completion_tokens", 0)
+        model = ((getattr(message, "response_metadata", None) or {}).get("model_name")
+                 or (response.llm_output or {}).get("model_name") or run["model"])
+        self._finish(run, model=model, prompt_tokens=prompt, completion_tokens=completion,
+                     cached_tokens=cached, cost=estimate_cost(model, prompt, completion, cached))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._finish(run, error=f"{type(error).__name__}: {error}"[:300])
+
+    # ---------- 도구 ----------
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        self._start(run_id, parent_run_id, metadata, None, "tool", name=f"tool:{name}")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._finish(run)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            self._finish(run, error=f"{type(error).__name__}: {error}"[:300])
+
+    # ---------- 기록 ----------
+    def _finish(self, run, model=None, prompt_tokens=0, completion_tokens=0, cached_tokens=0,
+                cost=None, error=None):
+        now = time.perf_counter()
+        self.write({
+            "ts": time.time(),
+            "kind": run["kind"],
+            "step": run["step"],
+            "model": model or run["model"],
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens,
+            "ttft": run["first_token"] - run["started"] if run["first_token"] else None,
+            "latency": now - run["started"],
+            "retries": run["retries"],
+            "hedged": run["hedged"],
+            "error": error,
+            "cost": cost,
+        })
+
+    def log(self, step, latency, **fields):
+        """콜백이 없는 구간(검색 등)의 소요 시간을 직접 기록"""
+        record = dict.fromkeys(FIELDS)
+        record.update(ts=time.time(), kind="step", step=step, latency=latency, prompt_tokens=0,
+                      completion_tokens=0, cached_tokens=0, retries=0, hedged=False)
+        record.update(fields)
+        self.write(record)
+
+    def write(self, record):
+        with self._lock:
+            self.records.append(record)
+            del self.records[:-self.max_records]
+        if self.sink is not None:
+            self.sink.write(record)
+
+
+# =================================================================
+# 리포트
+# =================================================================
+def summarize(records, by=("step", "model")):
+    """
+    기록을 by 필드 조합별로 묶어 지연/토큰/비용 요약
+
+    Returns:
+        list: [{'key', 'calls', 'errors', 'latency_p50/p95/p99', 'ttft_p50/p95/p99',
+                'prompt_tokens', 'completion_tokens', 'cached_tokens', 'retries', 'hedged', 'cost'}]
+              호출 수가 많은 순
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record.get(name) for name in by), []).append(record)
+
+    rows = []
+    for key, group in groups.items():
+        ok = [r for r in group if not r.get("error")]
+        latencies = [r["latency"] for r in ok if r.get("latency") is not None]
+        ttfts = [r["ttft"] for r in ok if r.get("ttft") is not None]
+        row = {"key": dict(zip(by, key)), "calls": len(group), "errors": len(group) - len(ok)}
+        for p in (50, 95, 99):
+            row[f"latency_p{p}"] = percentile(latencies, p, default=None)
+            row[f"ttft_p{p}"] = percentile(ttfts, p, default=None)
+        for name in ("prompt_tokens", "completion_tokens", "cached_tokens", "retries"):
+            row[name] = sum(r.get(name) or 0 for r in group)
+        row["hedged"] = sum(1 for r in group if r.get("hedged"))
+        row["cost"] = sum(r.get("cost") or 0 for r in group)
+        rows.append(row)
+    return sorted(rows, key=lambda row: -row["calls"])
+
+
+def format_report(rows):
+    """summarize() 결과를 표 문자열로"""
+    def sec(value):
+        return f"{value:6.2f}" if value is not None else "     -"
+
+    lines = [f"{'그룹':<36} {'호출':>5} {'오류':>4} {'p50':>6} {'p95':>6} {'p99':>6} "
+             f"{'TTFTp50':>7} {'TTFTp95':>7} {'입력':>8} {'캐시':>7} {'출력':>7} {'재시도':>5} {'비용($)':>9}"]
+    for row in rows:
+        key = " / ".join(str(value) for value in row["key"].values() if value is not None) or "-"
+        lines.append(
+            f"{key[:36]:<36} {row['calls']:>5} {row['errors']:>4} {sec(row['latency_p50'])} "
+            f"{sec(row['latency_p95'])} {sec(row['latency_p99'])} {sec(row['ttft_p50']):>7} "
+            f"{sec(row['ttft_p95']):>7} {row['prompt_tokens']:>8} {row['cached_tokens']:>7} "
+            f"{row['completion_tokens']:>7} {row['retries']:>5} {row['cost']:>9.5f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="텔레메트리 기록 요약 (단계/모델별 p50/p95/p99)")
+    parser.add_argument("path", help="telemetry.jsonl 또는 telemetry.db")
+    parser.add_argument("--by", nargs="+", default=["step", "model"], choices=["step", "model", "kind"],
+                        help="묶을 필드")
+    parser.add_argument("--since", type=float, default=None, help="최근 N 시간 기록만")
+    args = parser.parse_args()
+
+    records = open_sink(args.path).read()
+    if args.since is not None:
+        cutoff = time.time() - args.since * 3600
+        records = [r for r in records if (r.get("ts") or 0) >= cutoff]
+    print(f"기록 {len(records)}개 ({args.path})\n")
+    print(format_report(summarize(records, by=args.by)))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,13 @@ import os
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+from rolling_memory import RollingMemory
 
 load_dotenv()
 
-# 1. 기억을 담을 리스트 (이게 AI의 뇌입니다)
-chat_history = []
+# 1. 기억을 담을 메모리 (이게 AI의 뇌입니다)
+# 최근 대화는 그대로, 2000 토큰을 넘는 오래된 대화는 요약으로 접어서 보관
+memory = RollingMemory(max_tokens=2000)
 
 # 2. 템플릿에 '이전 대화 내용' 자리를 만들어줍니다 (history 부분)
 template = ChatPromptTemplate.from_messages([
@@ -25,12 +26,11 @@ while True:
     if user_q == "그만": break
     
     # 3. 템플릿에 현재 질문과 이전 대화 내역(history)을 함께 전달
-    final_prompt = template.invoke({"history": chat_history, "question": user_q})
+    final_prompt = template.invoke({"history": memory.load(user_q), "question": user_q})
     
     response = chat.invoke(final_prompt)
     
     # 4. 대화 내역 업데이트 (나의 질문과 AI의 답변을 저장)
-    chat_history.append(HumanMessage(content=user_q))
-    chat_history.append(AIMessage(content=response.content))
+    memory.save(user_q, response.content)
     
     print(f"🤖 [요리사 AI]:\n{response.content}\n")
\ No newline at end of file
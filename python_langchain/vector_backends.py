@@ -0,0 +1,428 @@
+"""
+벡터스토어 백엔드 레지스트리
+Chroma, Pinecone(로컬 대체), 인메모리 스토어를 하나의 인터페이스로 다루기 위한 모듈
+
+- ragmenu2.py / rag4_multimodal.py 는 Pinecone, ragChat.py 는 Chroma 를 서로 다른 코드로 사용함
+- 여기서는 세 저장소 모두 같은 메서드(add / query / count / reset)로 접근한다
+- 벤치마크(vector_bench.py)와 이후 검색 기능들이 이 인터페이스를 공유한다
+
+사용 예시:
+    backend = get_backend("memory")
+    backend.add(ids, vectors, texts, metadatas)
+    results = backend.query(query_vector, k=3)   # [(Document, score), ...]
+"""
+
+# pip install numpy chromadb langchain-core
+
+import json
+import uuid
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+# =================================================================
+# 백엔드 레지스트리
+# =================================================================
+BACKENDS = {}  # 이름 → 백엔드 클래스
+
+
+def register_backend(name):
+    """백엔드 클래스를 이름으로 등록하는 데코레이터"""
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def get_backend(name, **kwargs):
+    """
+    이름으로 백엔드 인스턴스 생성
+
+    Args:
+        name (str): 등록된 백엔드 이름 ('chroma', 'pinecone-local', 'memory')
+        **kwargs: 백엔드 생성자에 그대로 전달
+
+    Returns:
+        VectorBackend: 백엔드 인스턴스
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 백엔드: {name} (사용 가능: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+
+# =================================================================
+# 공통 유틸리티
+# =================================================================
+def normalize(vectors):
+    """코사인 유사도 계산을 위해 벡터를 단위 길이로 정규화"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0  # 0 벡터 나눗셈 방지
+    return vectors / norms
+
+
+def match_filter(metadata, flt):
+    """
+    Pinecone 스타일 메타데이터 필터 평가
+
+    지원 연산자: $eq, $ne, $gt, $gte, $lt, $lte, $in, $nin, $and, $or
+    {"source": "restaurant_wine.txt"} 처럼 값만 주면 $eq 로 처리한다.
+
+    Args:
+        metadata (dict): 문서 메타데이터
+        flt (dict): 필터 조건 (None 이면 항상 통과)
+
+    Returns:
+        bool: 조건 만족 여부
+    """
+    if not flt:
+        return True
+
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(match_filter(metadata, sub) for sub in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_filter(metadata, sub) for sub in cond):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+
+        for op, target in cond.items():
+            if op == "$eq" and value != target:
+                return False
+            if op == "$ne" and value == target:
+                return False
+            if op == "$in" and value not in target:
+                return False
+            if op == "$nin" and value in target:
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if op == "$gt" and not value > target:
+                    return False
+                if op == "$gte" and not value >= target:
+                    return False
+                if op == "$lt" and not value < target:
+                    return False
+                if op == "$lte" and not value <= target:
+                    return False
+    return True
+
+
+class VectorBackend:
+    """
+    벡터스토어 백엔드 공통 인터페이스
+
+    모든 백엔드는 미리 계산된 임베딩 벡터를 받는다.
+    (임베딩 비용을 저장소 성능 측정에서 분리하기 위함)
+    """
+
+    name = None
+
+    def add(self, ids, vectors, texts, metadatas=None):
+        """벡터와 원문, 메타데이터 저장"""
+        raise NotImplementedError
+
+    def query(self, vector, k=4, filter=None):
+        """
+        유사도 검색
+
+        Returns:
+            list: (Document, score) 튜플 리스트, score 는 코사인 유사도 (높을수록 유사)
+        """
+        raise NotImplementedError
+
+    def query_with_vectors(self, vector, k=4, filter=None):
+        """
+        query() 와 같지만 결과 벡터도 함께 반환 (MMR 등 후보 간 유사도 계산용)
+
+        Returns:
+            tuple: ((Document, score) 리스트, 결과 벡터 행렬 (len, dim))
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """저장된 벡터 수"""
+        raise NotImplementedError
+
+    def reset(self):
+        """저장된 데이터 전체 삭제"""
+        raise NotImplementedError
+
+
+# =================================================================
+# 인메모리 백엔드 (numpy 전수 검색)
+# =================================================================
+@register_backend("memory")
+class MemoryBackend(VectorBackend):
+    """
+    프로세스 내부 numpy 행렬에 벡터를 보관하는 백엔드
+
+    - 정규화된 벡터 행렬 × 질의 벡터 한 번으로 전체 유사도 계산
+    - argpartition 으로 상위 k 개만 정렬 (전체 정렬 회피)
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self._chunks = []  # add() 로 들어온 벡터 묶음 (검색 시 한 번에 합침)
+        self._matrix = None
+
+    def add(self, ids, vectors, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in texts]
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        self._chunks.append(normalize(vectors))
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        """정규화된 전체 벡터 행렬 (필요할 때 한 번만 합침)"""
+        if self._matrix is None:
+            if self._chunks:
+                self._matrix = np.vstack(self._chunks)
+                self._chunks = [self._matrix]
+            else:
+                self._matrix = np.zeros((0, 0), dtype=np.float32)
+        return self._matrix
+
+    def _top_k(self, vector, k, filter):
+        """상위 k 개 행 번호와 전체 유사도 배열"""
+        matrix = self.matrix
+        if len(matrix) == 0:
+            return np.arange(0), None
+
+        scores = matrix @ normalize(vector)
+        candidates = np.arange(len(scores))
+
+        if filter:
+            mask = np.array([match_filter(m, filter) for m in self.metadatas], dtype=bool)
+            candidates = candidates[mask]
+            if len(candidates) == 0:
+                return candidates, scores
+
+        k = min(k, len(candidates))
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return top[np.argsort(-scores[top])], scores
+
+    def _results(self, top, scores):
+        return [
+            (Document(page_content=self.texts[i], metadata=dict(self.metadatas[i], id=self.ids[i])),
+             float(scores[i]))
+            for i in top
+        ]
+
+    def query(self, vector, k=4, filter=None):
+        return self._results(*self._top_k(vector, k, filter))
+
+    def query_with_vectors(self, vector, k=4, filter=None):
+        top, scores = self._top_k(vector, k, filter)
+        return self._results(top, scores), self.matrix[top]
+
+    def update(self, index, vector, text, metadata):
+        """index 번째 행을 새 벡터/원문/메타데이터로 덮어쓰기"""
+        self.matrix[index] = normalize(vector)
+        self.texts[index] = text
+        self.metadatas[index] = metadata
+
+    def count(self):
+        return len(self.ids)
+
+
+# =================================================================
+# Pinecone 로컬 대체 백엔드
+# =================================================================
+@register_backend("pinecone-local")
+class PineconeLocalBackend(VectorBackend):
+    """
+    Pinecone 인덱스 동작을 로컬에서 흉내내는 백엔드 (API 키/네트워크 불필요)
+
+    실제 Pinecone 사용 방식과 맞춘 부분:
+    - upsert 는 100개 단위 배치 (Pinecone 권장 배치 크기)
+    - 원문은 metadata['text'] 에 저장 (PineconeVectorStore 의 text_key="text")
+    - 요청/응답을 JSON 으로 직렬화해서 클라이언트 왕복 비용을 반영
+    - 검색 결과는 matches 리스트 (id, score, metadata)
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, dimension=1536, text_key="text"):
+        self.dimension = dimension
+        self.text_key = text_key
+        self.reset()
+
+    def reset(self):
+        self._store = MemoryBackend()  # 실제 저장은 인메모리 행렬 재사용
+        self._records = {}             # id → 행 번호 (upsert 덮어쓰기 판별용)
+
+    def _upsert(self, payload):
+        """Pinecone index.upsert() 흉내 (JSON 요청 본문을 받음)"""
+        vectors = json.loads(payload)["vectors"]
+        new, updates = [], []
+        for v in vectors:
+            if v["id"] in self._records:
+                updates.append(v)
+            else:
+                self._records[v["id"]] = len(self._records)
+                new.append(v)
+        if new:
+            self._store.add(
+                [v["id"] for v in new],
+                [v["values"] for v in new],
+                [v["metadata"].get(self.text_key, "") for v in new],
+                [v["metadata"] for v in new],
+            )
+        for v in updates:
+            # 같은 id 는 덮어쓰기 (Pinecone upsert 동작)
+            self._store.update(self._records[v["id"]], v["values"], v["metadata"].get(self.text_key, ""), v["metadata"])
+        return json.dumps({"upserted_count": len(vectors)})
+
+    def _query(self, payload):
+        """Pinecone index.query() 흉내"""
+        request = json.loads(payload)
+        results = self._store.query(request["vector"], k=request["top_k"], filter=request.get("filter"))
+        matches = []
+        for doc, score in results:
+            row = self._records[doc.metadata["id"]]
+            match = {"id": doc.metadata["id"], "score": score, "metadata": self._store.metadatas[row]}
+            if request.get("include_values"):
+                match["values"] = self._store.matrix[row].tolist()
+            matches.append(match)
+        return json.dumps({"matches": matches})
+
+    def add(self, ids, vectors, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in texts]
+        for start in range(0, len(ids), self.BATCH_SIZE):
+            end = start + self.BATCH_SIZE
+            batch = [
+                {
+                    "id": ids[i],
+                    "values": [float(x) for x in vectors[i]],
+                    "metadata": dict(metadatas[i], **{self.text_key: texts[i]}),
+                }
+                for i in range(start, min(end, len(ids)))
+            ]
+            self._upsert(json.dumps({"vectors": batch}))
+
+    def _request(self, vector, k, filter, include_values):
+        payload = json.dumps({
+            "vector": [float(x) for x in vector],
+            "top_k": k,
+            "include_metadata": True,
+            "include_values": include_values,
+            "filter": filter,
+        })
+        return json.loads(self._query(payload))["matches"]
+
+    def _to_document(self, match):
+        metadata = dict(match["metadata"])
+        text = metadata.pop(self.text_key, "")
+        metadata["id"] = match["id"]
+        return Document(page_content=text, metadata=metadata), match["score"]
+
+    def query(self, vector, k=4, filter=None):
+        return [self._to_document(match) for match in self._request(vector, k, filter, False)]
+
+    def query_with_vectors(self, vector, k=4, filter=None):
+        matches = self._request(vector, k, filter, True)
+        vectors = np.array([match["values"] for match in matches], dtype=np.float32)
+        return [self._to_document(match) for match in matches], vectors
+
+    def count(self):
+        return len(self._records)
+
+
+# =================================================================
+# Chroma 백엔드
+# =================================================================
+@register_backend("chroma")
+class ChromaBackend(VectorBackend):
+    """
+    chromadb 컬렉션 백엔드 (HNSW, 코사인 거리)
+
+    Args:
+        persist_directory (str): 저장 폴더, None 이면 메모리에서만 동작
+        collection_name (str): 컬렉션 이름
+    """
+
+    MAX_BATCH = 5000  # chromadb 한 번에 넣을 수 있는 최대 개수(약 5461)보다 작게
+
+    def __init__(self, persist_directory=None, collection_name="benchmark"):
+        import chromadb  # Chroma 를 쓸 때만 필요
+
+        if persist_directory:
+            self.client = chromadb.PersistentClient(path=persist_directory)
+        else:
+            self.client = chromadb.EphemeralClient()
+        self.collection_name = collection_name
+        self.collection = self.client.get_or_create_collection(
+            collection_name, metadata={"hnsw:space": "cosine"}
+        )
+
+    def reset(self):
+        self.client.delete_collection(self.collection_name)
+        self.collection = self.client.get_or_create_collection(
+            self.collection_name, metadata={"hnsw:space": "cosine"}
+        )
+
+    def add(self, ids, vectors, texts, metadatas=None):
+        # chromadb 는 빈 메타데이터 딕셔너리를 허용하지 않음
+        metadatas = [m or {"source": "unknown"} for m in (metadatas or [None] * len(texts))]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        for start in range(0, len(ids), self.MAX_BATCH):
+            end = start + self.MAX_BATCH
+            self.collection.add(
+                ids=list(ids[start:end]),
+                embeddings=vectors[start:end].tolist(),
+                documents=list(texts[start:end]),
+                metadatas=list(metadatas[start:end]),
+            )
+
+    def _request(self, vector, k, filter, include):
+        where = None
+        if filter:
+            # Chroma 는 조건이 2개 이상이면 $and 로 묶어야 함
+            where = filter if len(filter) == 1 else {"$and": [{key: value} for key, value in filter.items()]}
+
+        return self.collection.query(
+            query_embeddings=[np.asarray(vector, dtype=np.float32).tolist()],
+            n_results=k,
+            where=where,
+            include=include,
+        )
+
+    def _to_results(self, result):
+        return [
+            (Document(page_content=text, metadata=dict(metadata or {}, id=doc_id)), 1.0 - distance)
+            for doc_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    def query(self, vector, k=4, filter=None):
+        return self._to_results(self._request(vector, k, filter, ["documents", "metadatas", "distances"]))
+
+    def query_with_vectors(self, vector, k=4, filter=None):
+        result = self._request(vector, k, filter, ["documents", "metadatas", "distances", "embeddings"])
+        return self._to_results(result), np.asarray(result["embeddings"][0], dtype=np.float32)
+
+    def count(self):
+        return self.collection.count()
+
+
+def new_ids(n):
+    """백엔드에 넣을 고유 id 생성"""
+    return [str(uuid.uuid4()) for _ in range(n)]
@@ -0,0 +1,194 @@
+"""
+벡터스토어 백엔드 벤치마크
+같은 청크 세트를 Chroma / Pinecone(로컬 대체) / 인메모리 백엔드에 넣고 성능을 비교
+
+측정 항목:
+1. 적재 속도 (청크/초)
+2. 단일 질의 지연시간 p50 / p99 (ms)
+3. 동시 질의 처리량 (QPS, 스레드 N개)
+4. 프로세스 메모리 사용량 (RSS, MB)
+
+실행 예시:
+    python vector_bench.py                              # 기본: 가짜 임베딩, 모든 백엔드
+    python vector_bench.py --backends memory,chroma --scale 50 --concurrency 16
+    python vector_bench.py --embeddings openai          # 실제 OpenAI 임베딩 사용 (비용 발생)
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from doc_loader import load_documents, split_document
+from stats_utils import percentile
+from vector_backends import BACKENDS, get_backend, new_ids
+
+load_dotenv()
+
+
+# =================================================================
+# 측정 유틸리티
+# =================================================================
+def current_rss_mb():
+    """
+    현재 프로세스 RSS (MB)
+
+    리눅스는 /proc 에서 읽고, 그 외에는 psutil → resource(최대 RSS) 순으로 대체.
+    resource 는 POSIX 전용이라 윈도우에서도 import 되도록 여기서만 가져온다.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return float("nan")
+
+
+def get_embeddings(kind, dimension):
+    """벤치마크용 임베딩 모델 (fake: 오프라인 결정적 벡터, openai: text-embedding-3-small)"""
+    if kind == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return OpenAIEmbeddings(model="text-embedding-3-small", dimensions=dimension)
+
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=dimension)
+
+
+# =================================================================
+# 벤치마크 본체
+# =================================================================
+def load_chunk_set(data_dir, scale):
+    """data 폴더 텍스트를 청크로 나누고 scale 배로 복제 (복제본은 출처에 #번호 부여)"""
+    splits = split_document(load_documents(data_dir))
+    texts, metadatas = [], []
+    for copy in range(scale):
+        for doc in splits:
+            texts.append(doc.page_content if copy == 0 else f"{doc.page_content}\n#{copy}")
+            metadatas.append({"source": doc.metadata.get("source", "unknown"), "copy": copy})
+    return texts, metadatas
+
+
+def bench_backend(name, vectors, texts, metadatas, query_vectors, k, concurrency):
+    """
+    백엔드 하나에 대해 적재/지연시간/처리량/메모리 측정
+
+    Returns:
+        dict: 측정 결과
+    """
+    gc.collect()
+    rss_before = current_rss_mb()
+    backend = get_backend(name)
+
+    # 1. 적재
+    ids = new_ids(len(texts))
+    start = time.perf_counter()
+    backend.add(ids, vectors, texts, metadatas)
+    ingest_sec = time.perf_counter() - start
+
+    # 2. 순차 질의 지연시간 (첫 질의는 워밍업으로 제외)
+    backend.query(query_vectors[0], k=k)
+    latencies = []
+    for qv in query_vectors:
+        t0 = time.perf_counter()
+        backend.query(qv, k=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    # 3. 동시 질의 처리량
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(lambda qv: backend.query(qv, k=k), query_vectors))
+        qps = len(query_vectors) / (time.perf_counter() - t0)
+
+    result = {
+        "backend": name,
+        "chunks": backend.count(),
+        "ingest_per_sec": len(texts) / ingest_sec if ingest_sec else float("inf"),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "qps": qps,
+        "rss_mb": current_rss_mb(),
+        "rss_delta_mb": current_rss_mb() - rss_before,
+    }
+    del backend
+    return result
+
+
+def print_report(results, concurrency):
+    """결과 표 출력"""
+    print("\n" + "=" * 78)
+    print(f"{'backend':<16}{'chunks':>8}{'ingest/s':>12}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{f'QPS@{concurrency}':>10}{'RSS MB':>12}")
+    print("=" * 78)
+    for r in results:
+        print(f"{r['backend']:<16}{r['chunks']:>8}{r['ingest_per_sec']:>12.0f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['qps']:>10.0f}{r['rss_mb']:>7.0f} (+{r['rss_delta_mb']:.0f})")
+    print("=" * 78)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벡터스토어 백엔드 처리량/지연시간 벤치마크")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="쉼표로 구분한 백엔드 이름")
+    parser.add_argument("--data-dir", default="data", help="텍스트 데이터 폴더")
+    parser.add_argument("--scale", type=int, default=20, help="청크 세트 복제 배수 (코퍼스 크기 조절)")
+    parser.add_argument("--queries", type=int, default=200, help="측정할 질의 수")
+    parser.add_argument("--k", type=int, default=3, help="검색할 문서 수")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 질의 스레드 수")
+    parser.add_argument("--dimension", type=int, default=1536, help="임베딩 차원")
+    parser.add_argument("--embeddings", choices=["fake", "openai"], default="fake", help="임베딩 종류")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    # 1. 청크 세트 준비 (모든 백엔드가 같은 데이터 사용)
+    texts, metadatas = load_chunk_set(args.data_dir, args.scale)
+    if not texts:
+        print("❌ 로드된 문서가 없습니다. data 폴더를 확인하세요.")
+        return
+
+    # 2. 임베딩은 한 번만 계산해서 모든 백엔드에 공유 (저장소 성능만 비교)
+    embeddings = get_embeddings(args.embeddings, args.dimension)
+    print(f"임베딩 생성 중... ({len(texts)}개 청크, {args.embeddings})")
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+    query_texts = [t[:80] for t in random.sample(texts, min(args.queries, len(texts)))]
+    query_vectors = np.asarray(embeddings.embed_documents(query_texts), dtype=np.float32)
+    print(f"✓ 준비 완료: 청크 {len(texts)}개, 질의 {len(query_texts)}개\n")
+
+    # 3. 백엔드별 측정
+    results = []
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        print(f"▶ {name} 측정 중...")
+        try:
+            results.append(bench_backend(name, vectors, texts, metadatas, query_vectors, args.k, args.concurrency))
+        except Exception as e:
+            print(f"✗ {name} 측정 실패: {e}")
+
+    print_report(results, args.concurrency)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✓ 결과 저장: {os.path.abspath(args.json)}")
+
+
+if __name__ == "__main__":
+    main()
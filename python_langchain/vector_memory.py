@@ -0,0 +1,149 @@
+"""
+벡터 검색 기반 장기 대화 메모리 (관련 있는 이전 턴 + 최근 대화)
+
+memory1.py 의 ConversationBufferMemory 는 모든 대화를 매 턴 다시 보내서 점점 느려지고,
+ConversationBufferWindowMemory(k=1) 는 크기는 일정하지만 "내 이름이 뭐라고 했지?" 처럼
+오래전 내용을 물으면 이미 잊어버린다. memory3-1.py 의 독서 코치도 턴이 길어질수록 같은 문제가 생긴다.
+
+여기서는
+1. 최근 recent_turns 턴은 원문 그대로 두고
+2. 창에서 밀려난 턴은 (질문 + 답변) 하나를 문서로 임베딩해 세션 전용 인메모리 벡터 인덱스에 넣고
+3. 매 질문마다 질문과 비슷한 이전 턴 k 개만 찾아 시스템 메시지로 붙인다.
+   → 프롬프트 크기는 대화 길이와 상관없이 (k + recent_turns) 턴 분량으로 일정
+
+세션마다 VectorMemory 를 하나씩 만든다 (인덱스가 세션별로 분리됨).
+summary 에 rolling_memory.BackgroundSummaryMemory 를 주면 인덱스로 옮긴 턴을 묶어서
+백그라운드로 요약해 두고, transcript() 가 전체 대화 대신 (요약 + 아직 요약 안 된 턴) 을 돌려준다.
+
+사용 예시:
+    memory = VectorMemory(k=3, recent_turns=2)
+    history = memory.load(user_input)           # [관련 이전 대화] + 최근 대화
+    response = chain.invoke({"input": user_input, "history": history})
+    memory.save(user_input, response.content)
+"""
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from context_packer import DEFAULT_MODEL, truncate_tokens
+from rolling_memory import format_transcript
+from vector_backends import MemoryBackend
+
+RECALL_HEADER = "관련 있는 이전 대화 (질문과 비슷한 과거 턴만 골라 옴):\n"
+
+
+class VectorMemory:
+    """
+    최근 대화는 원문, 오래된 대화는 벡터 인덱스에서 관련 턴만 꺼내 쓰는 대화 메모리
+
+    Args:
+        embeddings: LangChain 임베딩 모델 (None 이면 처음 쓸 때 text-embedding-3-small 생성)
+        k (int): 질문마다 꺼낼 이전 턴 수
+        recent_turns (int): 원문으로 유지할 최근 턴 수
+        turn_max_tokens (int): 꺼낸 턴 하나의 최대 토큰 수 (넘으면 잘라냄)
+        min_score (float): 꺼낼 최소 코사인 유사도
+        model (str): 토큰 계산용 모델 이름
+        summary: 인덱스로 옮긴 턴을 넘겨받아 요약할 메모리 (BackgroundSummaryMemory, 없으면 요약 안 함)
+    """
+
+    def __init__(self, embeddings=None, k=3, recent_turns=2, turn_max_tokens=300, min_score=0.2,
+                 model=DEFAULT_MODEL, summary=None):
+        self.embeddings = embeddings
+        self.summary = summary
+        self.k = k
+        self.recent_turns = recent_turns
+        self.turn_max_tokens = turn_max_tokens
+        self.min_score = min_score
+        self.model = model
+        self.index = MemoryBackend()
+        self.messages = []
+        self.recalled = []  # 마지막 load() 에서 꺼낸 이전 턴 (확인용)
+        self.stats = {"turns": 0, "indexed_turns": 0, "recalls": 0}
+
+    def _embeddings(self):
+        if self.embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+
+            self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        return self.embeddings
+
+    # ---------- 저장 / 불러오기 ----------
+    def save(self, human, ai):
+        """이번 턴 (질문, 답변) 추가, 창을 넘는 오래된 턴은 인덱스로 옮김"""
+        self.messages.append(HumanMessage(content=human))
+        self.messages.append(AIMessage(content=ai))
+        self.stats["turns"] += 1
+
+        evicted = []
+        while len(self.messages) > 2 * self.recent_turns:
+            evicted.append(self.messages[:2])
+            del self.messages[:2]
+        if evicted:
+            self._index(evicted)
+            if self.summary is not None:
+                # 요약 쪽은 every_turns 만큼 쌓일 때마다 백그라운드로 한 번에 요약 (여기서는 기다리지 않음)
+                for human_message, ai_message in evicted:
+                    self.summary.save(human_message.content, ai_message.content)
+
+    def _index(self, turns):
+        """(질문, 답변) 쌍들을 한 번의 임베딩 호출로 인덱스에 추가"""
+        start = self.index.count()
+        texts = [format_transcript(turn) for turn in turns]
+        vectors = self._embeddings().embed_documents(texts)
+        ids = [f"turn-{start + i}" for i in range(len(texts))]
+        self.index.add(ids, vectors, texts, [{"turn": start + i} for i in range(len(texts))])
+        self.stats["indexed_turns"] += len(texts)
+
+    def recall(self, query):
+        """질문과 비슷한 이전 턴 (대화 순서대로)"""
+        if not query or self.index.count() == 0:
+            return []
+        results = self.index.query(self._embeddings().embed_query(query), k=self.k)
+        docs = [doc for doc, score in results if score >= self.min_score]
+        self.stats["recalls"] += 1
+        return sorted(docs, key=lambda doc: doc.metadata["turn"])
+
+    def load(self, query=""):
+        """
+        이번 질문에 맞춰 프롬프트용 메시지 목록 반환
+
+        Args:
+            query (str): 이번에 보낼 질문 (관련 이전 턴 검색에 사용)
+
+        Returns:
+            list: [SystemMessage(관련 이전 대화)] + 최근 대화 메시지
+        """
+        self.recalled = self.recall(query)
+        if not self.recalled:
+            return list(self.messages)
+        recalled = "\n\n".join(
+            truncate_tokens(doc.page_content, self.turn_max_tokens, self.model) for doc in self.recalled
+        )
+        return [SystemMessage(content=RECALL_HEADER + recalled)] + self.messages
+
+    def history(self):
+        """최근 대화 (검색 없이 현재 창 그대로)"""
+        return list(self.messages)
+
+    def transcript(self):
+        """
+        이전 대화 + 최근 대화를 텍스트로 (최종 요약 등에 사용)
+
+        summary 가 있으면 이미 끝난 요약 버전 + 아직 요약 안 된 턴만, 없으면 인덱스에 옮긴 턴 전체
+        """
+        if self.summary is not None:
+            self.summary.wait(timeout=0)  # 진행 중인 요약은 기다리지 않음
+            earlier = [self.summary.transcript()]
+        else:
+            earlier = self.index.texts
+        return "\n".join(text for text in earlier + [format_transcript(self.messages)] if text)
+
+    def clear(self):
+        self.index.reset()
+        self.messages = []
+        self.recalled = []
+        if self.summary is not None:
+            self.summary.clear()
+
+    def close(self):
+        if self.summary is not None:
+            self.summary.close()